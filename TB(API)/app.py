@@ -7,7 +7,11 @@ def app_start():
         "src.app:app",  
         host=cfg.get_env_config(Constants.HOSTNAME),
         port=int(cfg.get_env_config(Constants.PORT)),
-        reload=True
+        reload=True,
+        ws=Constants.WS_IMPLEMENTATION,
+        ws_per_message_deflate=cfg.get_value_config_or_default(
+            Constants.WEBSOCKET, Constants.WS_PER_MESSAGE_DEFLATE, Constants.YES
+        ).lower() == Constants.YES,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+"""
+Measures websocket frame cost for broadcast events.
+
+Reports, for a burst of typical send_message_ws broadcast events:
+    - frames per event with and without coalescing
+    - permessage-deflate compression ratio (with and without context takeover)
+
+Run from the project root:
+    python benchmarks/ws_frame_benchmark.py
+"""
+import asyncio
+import json
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.constants.constants import Constants
+from src.utils.web_socket_utils import ConnectionManager
+
+EVENT_COUNT = 200
+EVENT_GAP_SECONDS = 0.001
+COALESCE_WINDOWS_MS = [0, 2, 5, 10]
+
+
+class RecordingWebSocket:
+    """Stand-in socket that keeps every frame it is asked to send."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_json(self, payload):
+        self.frames.append(json.dumps(payload, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self):
+        pass
+
+
+def build_event(index):
+    return {
+        Constants.MESSAGE_ID: 100000 + index,
+        Constants.CONVERSATION_ID: 42,
+        Constants.TEXT: f"Message number {index} in the benchmark conversation",
+        Constants.SENDER: "sender@example.com",
+        Constants.STATUS: Constants.DELIVERED,
+        Constants.SENT_AT: "2024-01-01 10:00:00",
+    }
+
+
+def deflate_size(frames, context_takeover):
+    """Size of the frames after permessage-deflate (RFC 7692) compression."""
+    total = 0
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    for frame in frames:
+        if not context_takeover:
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        data = compressor.compress(frame.encode(Constants.UTF_8_ENCODING))
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        total += len(data) - 4  # trailing 0x00 0x00 0xff 0xff is not sent
+    return total
+
+
+async def run_burst(window_ms):
+    manager = ConnectionManager()
+    manager.coalesce_window = window_ms / 1000
+    ws = RecordingWebSocket()
+    await manager.connect(42, "receiver@example.com", ws)
+
+    for index in range(EVENT_COUNT):
+        await manager.broadcast(42, build_event(index))
+        await asyncio.sleep(EVENT_GAP_SECONDS)
+    await asyncio.sleep(manager.coalesce_window + 0.05)
+    return ws.frames
+
+
+async def main():
+    print(f"{EVENT_COUNT} events, {EVENT_GAP_SECONDS * 1000:.1f} ms apart\n")
+    print(f"{'window':>8} {'frames':>7} {'frames/event':>13} {'raw bytes':>10} "
+          f"{'deflate':>8} {'ratio':>6} {'no-takeover':>12} {'ratio':>6}")
+    for window_ms in COALESCE_WINDOWS_MS:
+        frames = await run_burst(window_ms)
+        raw = sum(len(frame.encode(Constants.UTF_8_ENCODING)) for frame in frames)
+        with_takeover = deflate_size(frames, context_takeover=True)
+        without_takeover = deflate_size(frames, context_takeover=False)
+        print(f"{window_ms:>6}ms {len(frames):>7} {len(frames) / EVENT_COUNT:>13.3f} {raw:>10} "
+              f"{with_takeover:>8} {raw / with_takeover:>6.2f} {without_takeover:>12} "
+              f"{raw / without_takeover:>6.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
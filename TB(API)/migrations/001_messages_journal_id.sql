@@ -0,0 +1,5 @@
+-- Idempotency key for messages accepted through the local write-ahead journal.
+-- The journal replayer looks a message up by this id before inserting it.
+ALTER TABLE messages
+    ADD COLUMN journal_id VARCHAR(64) NULL,
+    ADD UNIQUE INDEX uq_messages_journal_id (journal_id);
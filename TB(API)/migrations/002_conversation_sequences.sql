@@ -0,0 +1,39 @@
+-- Per-conversation monotonic sequence numbers.
+-- conversation.last_seq is the allocator; messages and clears are stamped with
+-- the value allocated in their transaction, receipts with their message's seq.
+ALTER TABLE conversation
+    ADD COLUMN last_seq BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE messages
+    ADD COLUMN seq BIGINT NULL,
+    ADD INDEX ix_messages_conversation_seq (conversation_id, seq);
+
+ALTER TABLE receipts
+    ADD COLUMN updated_seq BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE conversation_cleared
+    ADD COLUMN cleared_seq BIGINT NOT NULL DEFAULT 0;
+
+-- Backfill existing history in (sent_at, message_id) order.
+UPDATE messages m
+JOIN (
+    SELECT message_id,
+           ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY sent_at, message_id) AS rn
+    FROM messages
+) numbered ON numbered.message_id = m.message_id
+SET m.seq = numbered.rn;
+
+UPDATE conversation c
+JOIN (
+    SELECT conversation_id, MAX(seq) AS max_seq
+    FROM messages
+    GROUP BY conversation_id
+) latest ON latest.conversation_id = c.conversation_id
+SET c.last_seq = latest.max_seq;
+
+UPDATE receipts r
+JOIN messages m ON m.message_id = r.message_id
+SET r.updated_seq = m.seq;
+
+ALTER TABLE messages
+    MODIFY seq BIGINT NOT NULL;
@@ -0,0 +1,47 @@
+-- Convert every timestamp column to UTC DATETIME(6).
+--
+-- Before this migration the API wrote sent_at, created_on, joined_on and
+-- updated_at as strftime strings in the API server's local time, and
+-- cleared_at as IST wall-clock time. Set @app_tz to the offset the API server
+-- ran in before applying.
+SET @app_tz = '+05:30';
+SET @ist = '+05:30';
+
+-- messages.sent_at
+ALTER TABLE messages ADD COLUMN sent_at_utc DATETIME(6) NULL;
+UPDATE messages SET sent_at_utc = CONVERT_TZ(CAST(sent_at AS DATETIME(6)), @app_tz, '+00:00');
+ALTER TABLE messages DROP COLUMN sent_at;
+ALTER TABLE messages RENAME COLUMN sent_at_utc TO sent_at;
+ALTER TABLE messages MODIFY sent_at DATETIME(6) NOT NULL;
+ALTER TABLE messages ADD INDEX ix_messages_conversation_sent_at (conversation_id, sent_at);
+
+-- receipts.updated_at
+ALTER TABLE receipts ADD COLUMN updated_at_utc DATETIME(6) NULL;
+UPDATE receipts SET updated_at_utc = CONVERT_TZ(CAST(updated_at AS DATETIME(6)), @app_tz, '+00:00');
+ALTER TABLE receipts DROP COLUMN updated_at;
+ALTER TABLE receipts RENAME COLUMN updated_at_utc TO updated_at;
+
+-- conversation.created_on
+ALTER TABLE conversation ADD COLUMN created_on_utc DATETIME(6) NULL;
+UPDATE conversation SET created_on_utc = CONVERT_TZ(CAST(created_on AS DATETIME(6)), @app_tz, '+00:00');
+ALTER TABLE conversation DROP COLUMN created_on;
+ALTER TABLE conversation RENAME COLUMN created_on_utc TO created_on;
+
+-- conversation_participants.joined_on
+ALTER TABLE conversation_participants ADD COLUMN joined_on_utc DATETIME(6) NULL;
+UPDATE conversation_participants SET joined_on_utc = CONVERT_TZ(CAST(joined_on AS DATETIME(6)), @app_tz, '+00:00');
+ALTER TABLE conversation_participants DROP COLUMN joined_on;
+ALTER TABLE conversation_participants RENAME COLUMN joined_on_utc TO joined_on;
+
+-- user.created_on
+ALTER TABLE `user` ADD COLUMN created_on_utc DATETIME(6) NULL;
+UPDATE `user` SET created_on_utc = CONVERT_TZ(CAST(created_on AS DATETIME(6)), @app_tz, '+00:00');
+ALTER TABLE `user` DROP COLUMN created_on;
+ALTER TABLE `user` RENAME COLUMN created_on_utc TO created_on;
+
+-- conversation_cleared.cleared_at (was always written in IST)
+ALTER TABLE conversation_cleared ADD COLUMN cleared_at_utc DATETIME(6) NULL;
+UPDATE conversation_cleared SET cleared_at_utc = CONVERT_TZ(CAST(cleared_at AS DATETIME(6)), @ist, '+00:00');
+ALTER TABLE conversation_cleared DROP COLUMN cleared_at;
+ALTER TABLE conversation_cleared RENAME COLUMN cleared_at_utc TO cleared_at;
+ALTER TABLE conversation_cleared MODIFY cleared_at DATETIME(6) NOT NULL;
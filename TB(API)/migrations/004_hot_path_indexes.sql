@@ -0,0 +1,16 @@
+-- Indexes for the hot predicates checked at startup (Constants.REQUIRED_INDEXES).
+-- messages(conversation_id, seq) and messages(conversation_id, sent_at) come from 002 and 003.
+ALTER TABLE receipts
+    ADD INDEX ix_receipts_uid_status_message (uid, status, message_id);
+
+ALTER TABLE conversation_participants
+    ADD INDEX ix_participants_uid_conversation (uid, conversation_id);
+
+ALTER TABLE `user`
+    ADD UNIQUE INDEX uq_user_email (email);
+
+ALTER TABLE devices
+    ADD INDEX ix_devices_uid (uid);
+
+ALTER TABLE conversation_cleared
+    ADD UNIQUE INDEX uq_cleared_uid_conversation (uid, conversation_id);
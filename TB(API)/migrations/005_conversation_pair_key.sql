@@ -0,0 +1,27 @@
+-- Canonical "min_uid:max_uid" key of private conversations, so starting a chat
+-- with someone you already talk to returns the existing conversation.
+ALTER TABLE conversation
+    ADD COLUMN pair_key VARCHAR(64) NULL;
+
+-- Backfill: the oldest private conversation of each pair keeps the key;
+-- later duplicates stay NULL so the unique index can be created.
+WITH pairs AS (
+    SELECT cp.conversation_id,
+           CONCAT(MIN(cp.uid), ':', MAX(cp.uid)) AS pair_key
+    FROM conversation_participants cp
+    JOIN conversation c ON c.conversation_id = cp.conversation_id
+    WHERE c.conversation_type = 'private'
+    GROUP BY cp.conversation_id
+    HAVING COUNT(*) = 2 AND MIN(cp.uid) <> MAX(cp.uid)
+),
+firsts AS (
+    SELECT pair_key, MIN(conversation_id) AS conversation_id
+    FROM pairs
+    GROUP BY pair_key
+)
+UPDATE conversation c
+JOIN firsts f ON f.conversation_id = c.conversation_id
+SET c.pair_key = f.pair_key;
+
+ALTER TABLE conversation
+    ADD UNIQUE INDEX uq_conversation_pair_key (pair_key);
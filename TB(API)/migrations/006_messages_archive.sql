@@ -0,0 +1,7 @@
+-- Cold storage for messages moved out of `messages` by the retention job
+-- ([ARCHIVE] section). Same columns and keys as `messages`, so rows keep their
+-- message_id and per-conversation seq; receipts of archived messages are purged.
+CREATE TABLE messages_archive LIKE messages;
+
+ALTER TABLE messages_archive
+    ADD COLUMN archived_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6);
@@ -0,0 +1,27 @@
+-- Directory of conversations for the optional [SHARDS] layer. Apply on the
+-- primary ([DATABASE]) database, which keeps users, devices and this table
+-- while conversations, participants, messages, receipts, cleared markers and
+-- the archive live on the shard databases.
+--
+-- conversation_id is allocated here so ids stay unique across shards;
+-- pair_key dedupes private chats across shards like uq_conversation_pair_key
+-- does on a single database.
+CREATE TABLE conversation_shard (
+    conversation_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    shard_index INT NOT NULL,
+    pair_key VARCHAR(64) NULL,
+    created_on DATETIME(6) NOT NULL,
+    UNIQUE INDEX uq_conversation_shard_pair_key (pair_key)
+);
+
+-- Existing conversations stay on the current database: list its DSN first in
+-- [SHARDS] DSNS and use STRATEGY = directory so they are routed to shard 0.
+-- The explicit ids also move AUTO_INCREMENT past them.
+INSERT INTO conversation_shard (conversation_id, shard_index, pair_key, created_on)
+SELECT conversation_id, 0, pair_key, created_on
+FROM conversation;
+
+-- Every shard database needs the conversation tables of migrations 001-006
+-- and a projection of the user table (uid, email, first_name, last_name with
+-- the primary's column types and keys), kept in sync by the API. A shard that
+-- points at the primary itself already has the full table and is left alone.
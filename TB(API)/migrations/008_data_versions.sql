@@ -0,0 +1,13 @@
+-- Counters behind the ETags of /user/conversations, /user/get_messages and
+-- /user/get_all_users ([ETAG] section). Apply on the primary ([DATABASE])
+-- database. Changes to conversations are versioned by conversation.last_seq;
+-- these rows cover the writes that do not allocate a sequence number:
+--   users    signups and profile updates (directory, participant names)
+--   history  archiving runs and history imports, which move or add messages
+--            without advancing last_seq
+CREATE TABLE data_versions (
+    name VARCHAR(32) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (name, version) VALUES ('users', 0), ('history', 0);
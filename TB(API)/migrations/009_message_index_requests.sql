@@ -0,0 +1,10 @@
+-- Conversations whose history was imported ([MESSAGE_INDEX] section). Apply on
+-- the primary ([DATABASE]) database. Imported messages keep their original
+-- message_id, which is usually below the ids the message index has already
+-- scanned; every worker reads the requests it has not applied yet and indexes
+-- all messages of those conversations.
+CREATE TABLE message_index_requests (
+    request_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    conversation_id BIGINT NOT NULL,
+    requested_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+);
@@ -0,0 +1,5 @@
+-- Index behind the retention cutoff of the message archiver ([ARCHIVE] section):
+-- cold messages are found with a range scan on sent_at instead of a full scan.
+-- Apply on every database holding a messages table (each shard when sharded).
+ALTER TABLE messages
+    ADD INDEX ix_messages_sent_at (sent_at);
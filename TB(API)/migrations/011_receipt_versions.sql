@@ -0,0 +1,7 @@
+-- Per-recipient receipt counters. Delivery and read updates keep the seq of
+-- their message and do not lock the conversation row; each bumps the
+-- receipt_version of the recipient's participant row instead. The ETags of
+-- /user/conversations and /user/get_messages include these counters.
+-- Apply on every database holding conversation tables (every shard when sharded).
+ALTER TABLE conversation_participants
+    ADD COLUMN receipt_version BIGINT NOT NULL DEFAULT 0;
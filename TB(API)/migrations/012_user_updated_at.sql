@@ -0,0 +1,7 @@
+-- Last change of each user row, maintained by MySQL. The user search index of
+-- every worker ([USER_SEARCH] REFRESH_MS) re-reads the users changed since its
+-- last scan, so signups and profile changes made on other workers reach it.
+-- Apply on the primary.
+ALTER TABLE user
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX ix_user_updated_at (updated_at);
@@ -1,6 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.constants.constants import Constants
+from src.utils.sql_instrumentation import sql_instrumentation
+
 app = FastAPI()
 
 # Enable CORS (same as Flask-CORS)
@@ -10,7 +13,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[Constants.ETAG_HEADER],
 )
 
+
+@app.middleware("http")
+async def sql_scope_middleware(request: Request, call_next):
+    """Attribute every SQL statement of the request to it and report the totals in headers."""
+    with sql_instrumentation.scope(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    response.headers[Constants.DB_QUERY_COUNT_HEADER] = str(stats.count)
+    response.headers[Constants.DB_TIME_HEADER] = f"{stats.total_time * 1000:.1f}"
+    return response
+
 # Import your routes
 from src.app import urls
@@ -4,6 +4,14 @@ from src.constants.constants import Constants
 from src.commons.validator import validate_db_connection
 from src.utils.traceback_utils import print_traceback
 from src.commons import fetch_response
+from src.utils.message_journal import message_journal
+from src.utils.db_utils import db_connect
+from src.utils.contact_graph import contact_graph
+from src.utils.user_search import user_search_index
+from src.utils.email_filter import email_filter
+from src.utils.message_index import message_index
+from src.utils.message_archiver import message_archiver
+from src.utils.cache_backend import cache_backends
 import sys
 from fastapi import APIRouter
 router = APIRouter()
@@ -15,12 +23,28 @@ async def lifespan(app: app):
     except Exception as e:
         print_traceback(e.__traceback__)
         sys.exit(Constants.FORCE_TERMINATE)
+    await db_connect.sync_reference_tables()
+    await contact_graph.build()
+    await user_search_index.start()
+    await email_filter.start()
+    await message_index.start()
+    await message_archiver.start()
+    await message_journal.start(fetch_response.replay_journal_record)
+    await db_connect.start_health_checks()
+    await db_connect.start_pool_maintenance()
+    await cache_backends.start()
     yield  # Application runs after this
-    # You can add shutdown logic here if needed
+    await message_journal.stop()
+    await message_index.stop()
+    await message_archiver.stop()
+    await user_search_index.stop()
+    await email_filter.stop()
+    await cache_backends.stop()
+    await db_connect.dispose()
 
 # Attach lifespan to app
 app.router.lifespan_context = lifespan
 
 # Include user routes
-app.include_router(fetch_response.router, prefix="/api", tags=["User"])
-app.include_router(router, prefix="/api", tags=["WebSocket"])
+app.include_router(fetch_response.router, prefix=Constants.API_PREFIX, tags=["User"])
+app.include_router(router, prefix=Constants.API_PREFIX, tags=["WebSocket"])
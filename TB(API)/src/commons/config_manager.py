@@ -62,5 +62,20 @@ class ReadConfigFile:
         env_config = self.obj_config[section]
         return env_config[param]
 
+    def get_value_config_or_default(self, section, param, default=None):
+        """
+
+        Arguments:
+            section -- Environment to retrieve value from
+            param -- Parameter to retrieve from Env
+            default -- Value returned when the section or parameter is missing
+
+        Returns:
+            Parameter value
+        """
+        if not self.obj_config.has_section(section):
+            return default
+        return self.obj_config[section].get(param, default)
+
 
 cfg = ReadConfigFile()
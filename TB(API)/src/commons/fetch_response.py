@@ -1,10 +1,13 @@
-import datetime
+import asyncio
+import json
 import aiohttp
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
-from sqlalchemy import and_, delete, insert, select, update, func, case
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, or_, delete, insert, select, update, func, case, literal
+from sqlalchemy.exc import IntegrityError
 from src.utils.jwt_utils import create_jwt
 from src.commons.validator import (
+    is_admin_request,
     validate_conversation_data,
     validate_jwt_data,
     validate_profile_data,
@@ -16,20 +19,75 @@ from src.commons.validator import (
 )
 from src.constants.constants import Constants
 from src.constants.global_data import GlobalData
-from src.utils.db_utils import db_connect
+from src.utils.db_utils import db_connect, is_unavailable
+from src.utils.contact_graph import contact_graph
+from src.utils.user_search import user_search_index
+from src.utils.message_index import message_index, tokenize
+from src.utils.message_archiver import message_archiver
 from src.utils.traceback_utils import print_traceback
 from src.utils.web_socket_utils import manager
+from src.utils.rate_limiter import rate_limiter
+from src.utils.message_journal import message_journal
+from src.utils.response_cache import response_cache
+from src.utils.lookup_cache import identity_cache, membership_cache
+from src.utils.etags import etags
+from src.utils.email_filter import email_filter
+from src.utils.time_utils import utc_now, to_iso, from_iso
+from src.utils.metrics import metrics
+from src.utils.sql_instrumentation import sql_instrumentation
+from src.utils.query_budget import BudgetedRoute
 from src.commons.email_auth import pin_generator, send_email
 from src.utils.encryption_utils import decrypt
 from src.utils.pwd_utils import create_password
 from src.utils.send_notifcation import send_device_notification
 
-router = APIRouter()
+router = APIRouter(route_class=BudgetedRoute)
 from src.utils.logger import Logger
 
 logger = Logger.get_logger()
 
 
+def _like_pattern(text: str, prefix_only: bool = True) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+
+def _wants_directory_paging(input_params: dict) -> bool:
+    return any(
+        input_params.get(key) is not None for key in Constants.DIRECTORY_PAGING_PARAMS
+    )
+
+
+async def _directory_response(input_params: dict, requester_email: str, exclude_uids=None):
+    """
+    Paged or streamed user directory.
+
+    With `stream` true the whole directory after `cursor` is sent as NDJSON,
+    one user object per line, read through a server-side cursor. Otherwise one
+    page of at most `limit` users after `cursor` is returned together with
+    `next_cursor` (null on the last page).
+    """
+    cursor = input_params.get(Constants.CURSOR)
+
+    if input_params.get(Constants.STREAM):
+        async def ndjson():
+            async for user in db_connect.stream_directory(requester_email, exclude_uids, cursor):
+                yield json.dumps(user) + "\n"
+
+        return StreamingResponse(ndjson(), media_type=Constants.NDJSON_MEDIA_TYPE)
+
+    limit = min(int(input_params.get(Constants.LIMIT) or Constants.DEFAULT_PAGE_SIZE), Constants.MAX_PAGE_SIZE)
+    users_dict, next_cursor = await db_connect.get_directory_page(
+        requester_email, exclude_uids, after_email=cursor, limit=max(limit, 1)
+    )
+    response = Constants.RESPONSE_TEMPLATE.copy()
+    response[Constants.USERS_STRING] = users_dict
+    response[Constants.NEXT_CURSOR] = next_cursor
+    response[Constants.MESSAGE_KEY] = Constants.SUCCESS_CODE
+    response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
+    return JSONResponse(content=response, status_code=Constants.SUCCESS_CODE)
+
+
 @router.post("/user/get_direct_users")
 async def get_direct_users(request: Request):
     """
@@ -37,22 +95,38 @@ async def get_direct_users(request: Request):
 
     Expected request JSON keys:
         - Constants.JWT_PARAM_EMAIL (email of requester)
+        - Optional Constants.CURSOR / Constants.LIMIT / Constants.STREAM for
+          keyset paging or an NDJSON stream (see `_directory_response`)
 
     Success: returns a JSON response containing the users list under
     `Constants.USERS_STRING` and a `Constants.SUCCESS_CODE` status.
+    An unknown requester gets `Constants.USER_EXISTENCE_ERROR`.
     Errors: validates JWT and will return error messages/status codes
     from `GlobalData.STATUS_CODE` / `Constants.APPLICATION_ERROR_MESSAGE` on exception.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
     try:
         input_params = await request.json()
-        validate_jwt_data(input_params)
+        validate_jwt_data(input_params, optional=Constants.DIRECTORY_PAGING_PARAMS)
 
         requester_email = input_params[Constants.JWT_PARAM_EMAIL].lower()
 
-        await db_connect.get_data(Constants.USER_TABLE, email=requester_email)
+        user = await db_connect.get_data(Constants.USER_TABLE, email=requester_email)
+        if not user:
+            # Without a uid there are no partners to leave out: never fall through to the whole directory.
+            response[Constants.MESSAGE_KEY] = Constants.USER_NOT_FOUND_MESSAGE.format(requester_email)
+            response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+            return JSONResponse(
+                content=response, status_code=response[Constants.STATUS_CODE_KEY]
+            )
+
+        # Users I haven't chatted with = directory minus my contact-graph partners.
+        partner_uids = await contact_graph.partners(user[Constants.UID])
+
+        if _wants_directory_paging(input_params):
+            return await _directory_response(input_params, requester_email, exclude_uids=partner_uids)
 
-        users_dict = await db_connect.get_user_data(current_user_email=requester_email)
+        users_dict = await db_connect.get_all_user_data(exclude_email=requester_email, exclude_uids=partner_uids)
         print(users_dict)
         response[Constants.USERS_STRING] = users_dict
         response[Constants.MESSAGE_KEY] = Constants.SUCCESS_CODE
@@ -76,21 +150,38 @@ async def get_all_users(request: Request):
 
     Expected request JSON keys:
         - Constants.JWT_PARAM_EMAIL (email of requester)
+        - Optional Constants.CURSOR / Constants.LIMIT / Constants.STREAM for
+          keyset paging or an NDJSON stream (see `_directory_response`)
 
     Success: returns a JSON response containing all users under
-    `Constants.USERS_STRING` with a success status code.
+    `Constants.USERS_STRING` with a success status code. The unpaged list
+    carries an ETag; a request whose If-None-Match holds it gets 304.
     Errors: will propagate validation errors or internal server errors.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
+    etag = None
     try:
         input_params = await request.json()
-        validate_jwt_data(input_params)
+        validate_jwt_data(input_params, optional=Constants.DIRECTORY_PAGING_PARAMS)
 
         requester_email = input_params[Constants.JWT_PARAM_EMAIL].lower()
 
         await db_connect.get_data(Constants.USER_TABLE, email=requester_email)
 
-        users_dict = await db_connect.get_all_user_data(exclude_email=requester_email)
+        if _wants_directory_paging(input_params):
+            return await _directory_response(input_params, requester_email)
+
+        async with db_connect.read_session(requester_email) as session:
+            if etags.enabled:
+                # Same session as the users below, so the tag never runs ahead of them.
+                versions = await etags.versions(session)
+                etag = etags.make(
+                    Constants.GET_ALL_USERS_ENDPOINT, requester_email, versions.get(Constants.USERS_VERSION)
+                )
+                if etags.matches(request, etag):
+                    return etags.not_modified(Constants.GET_ALL_USERS_ENDPOINT, etag)
+
+            users_dict = await db_connect.get_all_user_data(exclude_email=requester_email, session=session)
 
         response[Constants.USERS_STRING] = users_dict
         response[Constants.MESSAGE_KEY] = Constants.SUCCESS_CODE
@@ -102,6 +193,228 @@ async def get_all_users(request: Request):
         response[Constants.MESSAGE_KEY] = Constants.APPLICATION_ERROR_MESSAGE
         GlobalData.STATUS_CODE = Constants.INTERNAL_SERVER
 
+    return JSONResponse(
+        content=response,
+        status_code=response[Constants.STATUS_CODE_KEY],
+        headers={Constants.ETAG_HEADER: etag}
+        if etag and response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE
+        else None,
+    )
+
+
+@router.post("/user/search_users")
+async def search_users(request: Request):
+    """
+    Prefix / fuzzy search over user emails and names.
+
+    Expected request JSON keys:
+        - Constants.JWT_PARAM_EMAIL (email of requester, left out of the results)
+        - Constants.SEARCH_QUERY (search text)
+        - Constants.LIMIT (optional, default Constants.DEFAULT_SEARCH_RESULTS)
+
+    Success: returns the best matches under `Constants.USERS_STRING`, answered
+    from the in-memory index; until it is built, a prefix query on MySQL is used.
+    """
+    response = Constants.RESPONSE_TEMPLATE.copy()
+    try:
+        input_params = await request.json()
+        validate_jwt_data(input_params, optional=Constants.SEARCH_PARAMS)
+
+        requester_email = input_params[Constants.JWT_PARAM_EMAIL].lower()
+        query = str(input_params.get(Constants.SEARCH_QUERY, "")).strip().lower()
+        limit = min(
+            max(int(input_params.get(Constants.LIMIT) or Constants.DEFAULT_SEARCH_RESULTS), 1),
+            Constants.MAX_SEARCH_RESULTS,
+        )
+
+        if user_search_index.ready:
+            users = user_search_index.search(query, limit, exclude=requester_email)
+        elif query:
+            users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+            pattern = _like_pattern(query)
+            async with db_connect.read_session(requester_email) as session:
+                rows = (
+                    await session.execute(
+                        select(users_model.email, users_model.first_name, users_model.last_name)
+                        .where(
+                            or_(
+                                users_model.email.like(pattern),
+                                users_model.first_name.like(pattern),
+                                users_model.last_name.like(pattern),
+                            )
+                        )
+                        .where(users_model.email != requester_email)
+                        .order_by(users_model.email)
+                        .limit(limit)
+                    )
+                ).all()
+            users = [
+                {Constants.EMAIL: email, "first_name": fn, "last_name": ln}
+                for email, fn, ln in rows
+            ]
+        else:
+            users = []
+
+        response[Constants.USERS_STRING] = users
+        response[Constants.MESSAGE_KEY] = Constants.USER_SEARCH_SUCCESS_MESSAGE
+        response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
+
+    except Exception as e:
+        print_traceback(e)
+        response[Constants.STATUS_CODE_KEY] = GlobalData.STATUS_CODE
+        response[Constants.MESSAGE_KEY] = Constants.APPLICATION_ERROR_MESSAGE
+        GlobalData.STATUS_CODE = Constants.INTERNAL_SERVER
+
+    return JSONResponse(
+        content=response, status_code=response[Constants.STATUS_CODE_KEY]
+    )
+
+
+@router.post("/user/search_messages")
+async def search_messages(request: Request):
+    """
+    Full-text search over the messages of the requester's conversations.
+
+    Expected request JSON keys:
+        - Constants.JWT_PARAM_EMAIL (requester email)
+        - Constants.SEARCH_QUERY (search text; every word must match)
+        - Constants.CONVERSATION_ID (optional, restricts the search to one conversation)
+        - Constants.LIMIT (optional, default Constants.DEFAULT_SEARCH_RESULTS)
+
+    Success: returns matching messages, newest first, under
+    `Constants.MESSAGES_STRING_LOWER`. Only conversations the requester belongs
+    to are searched and messages before their `clear_chat` are left out.
+    Candidates come from the local inverted index; until it is ready, a LIKE
+    query on MySQL is used.
+    """
+    response = Constants.RESPONSE_TEMPLATE.copy()
+    try:
+        input_params = await request.json()
+        validate_jwt_data(input_params, optional=Constants.MESSAGE_SEARCH_PARAMS)
+
+        requester_email = input_params[Constants.JWT_PARAM_EMAIL].lower()
+        query = str(input_params.get(Constants.SEARCH_QUERY, ""))
+        only_conversation = input_params.get(Constants.CONVERSATION_ID)
+        limit = min(
+            max(int(input_params.get(Constants.LIMIT) or Constants.DEFAULT_SEARCH_RESULTS), 1),
+            Constants.MAX_SEARCH_RESULTS,
+        )
+
+        users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        conv_part_model = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+        msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+        cleared_model = await db_connect.set_up_table(Constants.CONVERSATION_CLEARED_TABLE)
+
+        # The index can be ahead of the replicas, so rows are read from the primary.
+        async with db_connect.session(Constants.POOL_READ) as session:
+            requester_uid = await identity_cache.uid(session, requester_email)
+            if not requester_uid:
+                response[Constants.MESSAGE_KEY] = Constants.USER_EXISTENCE_ERROR_MESSAGE
+                response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+                return JSONResponse(
+                    content=response, status_code=response[Constants.STATUS_CODE_KEY]
+                )
+
+        # Every shard searches the requester's conversations placed on it;
+        # the pages are merged newest first.
+        async def shard_search(shard):
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                membership = select(conv_part_model.conversation_id).where(
+                    conv_part_model.uid == requester_uid
+                )
+                if only_conversation is not None:
+                    membership = membership.where(
+                        conv_part_model.conversation_id == int(only_conversation)
+                    )
+                conversation_ids = (await session.scalars(membership)).all()
+
+                def visible_messages(model):
+                    return (
+                        select(
+                            model.message_id,
+                            model.conversation_id,
+                            model.body,
+                            model.sent_at,
+                            model.seq,
+                            users_model.email,
+                        )
+                        .join(users_model, users_model.uid == model.uid)
+                        .outerjoin(
+                            cleared_model,
+                            and_(
+                                cleared_model.conversation_id == model.conversation_id,
+                                cleared_model.uid == requester_uid,
+                            ),
+                        )
+                        .where(
+                            or_(
+                                cleared_model.cleared_at.is_(None),
+                                model.sent_at > cleared_model.cleared_at,
+                            )
+                        )
+                        .order_by(model.message_id.desc())
+                    )
+
+                terms = tokenize(query) if conversation_ids else set()
+                rows = []
+                models = [msg_model]
+                if terms and message_archiver.enabled:
+                    models.append(await db_connect.set_up_table(Constants.MESSAGES_ARCHIVE_TABLE))
+                if terms and message_index.ready:
+                    candidate_ids = await message_index.search(query, conversation_ids)
+                    # Cleared messages are dropped by the query, so walk the
+                    # candidates newest first until the page is full.
+                    for start in range(0, len(candidate_ids), Constants.STREAM_BATCH_SIZE):
+                        batch = candidate_ids[start:start + Constants.STREAM_BATCH_SIZE]
+                        found = []
+                        for model in models:
+                            found += (
+                                await session.execute(
+                                    visible_messages(model)
+                                    .where(model.message_id.in_(batch))
+                                    .limit(limit - len(rows))
+                                )
+                            ).all()
+                        found.sort(key=lambda row: row.message_id, reverse=True)
+                        rows += found[:limit - len(rows)]
+                        if len(rows) >= limit:
+                            break
+                elif terms:
+                    # Same rows as the index would find, archived ones included.
+                    for model in models:
+                        fallback = visible_messages(model).where(model.conversation_id.in_(conversation_ids))
+                        for term in terms:
+                            fallback = fallback.where(model.body.like(_like_pattern(term, prefix_only=False)))
+                        rows += (await session.execute(fallback.limit(limit))).all()
+                    rows = sorted(rows, key=lambda row: row.message_id, reverse=True)[:limit]
+            return rows
+
+        rows = sorted(
+            (row for shard_rows in await db_connect.gather_shards(shard_search) for row in shard_rows),
+            key=lambda row: (row.sent_at, row.message_id),
+            reverse=True,
+        )[:limit]
+
+        response[Constants.MESSAGES_STRING_LOWER] = [
+            {
+                Constants.MESSAGE_ID: message_id,
+                Constants.CONVERSATION_ID: conversation_id,
+                Constants.TEXT: body,
+                Constants.SENDER: sender_email,
+                Constants.SENT_AT: to_iso(sent_at),
+                Constants.SEQ: seq,
+            }
+            for message_id, conversation_id, body, sent_at, seq, sender_email in rows
+        ]
+        response[Constants.MESSAGE_KEY] = Constants.MESSAGE_SEARCH_SUCCESS_MESSAGE
+        response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
+
+    except Exception as e:
+        print_traceback(e)
+        response[Constants.STATUS_CODE_KEY] = GlobalData.STATUS_CODE
+        response[Constants.MESSAGE_KEY] = Constants.APPLICATION_ERROR_MESSAGE
+        GlobalData.STATUS_CODE = Constants.INTERNAL_SERVER
+
     return JSONResponse(
         content=response, status_code=response[Constants.STATUS_CODE_KEY]
     )
@@ -119,7 +432,9 @@ async def start_conversation(request: Request):
         - Constants.CONVERSATION_TYPE (Constants.GROUP or Constants.PRIVATE)
 
     Success: creates conversation(s) and participants entries and returns
-    created conversation ids under `Constants.CONVERSATION_ID` with a success code.
+    the conversation ids under `Constants.CONVERSATION_ID` with a success code.
+    A private chat that already exists for a pair is returned instead of
+    being created again.
     Errors: validates input and returns appropriate error messages/status codes.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
@@ -146,112 +461,222 @@ async def start_conversation(request: Request):
                 content=response, status_code=response[Constants.STATUS_CODE_KEY]
             )
 
-        now = datetime.datetime.now().strftime(Constants.DATETIME_FORMAT)
-        user_model = db_connect.models[Constants.USER_TABLE]
+        now = utc_now()
+        user_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        conversation_model = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
+        participants_model = await db_connect.set_up_table(
+            Constants.CONVERSATION_PARTICIPANTS_TABLE
+        )
 
-        async with db_connect.AsyncSessionLocal() as session:
-            creator_uid = await session.scalar(
-                select(user_model.uid).where(user_model.email == creator_email)
+        async def create_conversations(session):
+            """
+            Resolve every email with one IN query, then create the conversation
+            rows and all participant rows with bulk inserts. Private chats are
+            keyed by their (min uid, max uid) pair so an existing one is reused.
+            Returns (creator_uid, participant_uids, conversation_ids) or None
+            when the creator is unknown.
+            """
+            uid_by_email = dict(
+                (
+                    await session.execute(
+                        select(user_model.email, user_model.uid).where(
+                            user_model.email.in_({creator_email, *participant_emails})
+                        )
+                    )
+                ).all()
             )
-
+            creator_uid = uid_by_email.get(creator_email)
             if not creator_uid:
-                response[
-                    Constants.MESSAGE_KEY
-                ] = Constants.USER_NOT_FOUND_MESSAGE.format(creator_email)
-                response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
-                return JSONResponse(
-                    content=response, status_code=response[Constants.STATUS_CODE_KEY]
-                )
-
-            participant_uids = []
-            for email in participant_emails:
-                uid = await session.scalar(
-                    select(user_model.uid).where(user_model.email == email)
+                return None
+            participant_uids = list(
+                dict.fromkeys(
+                    uid_by_email[email]
+                    for email in participant_emails
+                    if email in uid_by_email and uid_by_email[email] != creator_uid
                 )
-                if uid:
-                    participant_uids.append(uid)
-
+            )
             if not participant_uids:
-                response[
-                    Constants.MESSAGE_KEY
-                ] = Constants.CONVERSATION_PARTICIPANTS_ERROR
-                response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
-                return JSONResponse(
-                    content=response, status_code=response[Constants.STATUS_CODE_KEY]
-                )
-
-        conversation_model = db_connect.models[Constants.CONVERSATION_TABLE]
-        participants_model = db_connect.models[
-            Constants.CONVERSATION_PARTICIPANTS_TABLE
-        ]
-
-        created_conversation_ids = []
-
-        async with db_connect.AsyncSessionLocal() as session:
-            async with session.begin():
-                if conversation_type == Constants.GROUP:
-                    new_conversation = conversation_model(
+                return creator_uid, [], []
+            if db_connect.shards:
+                # The conversation rows go to the shards, see create_on_shards.
+                return creator_uid, participant_uids, None
+
+            if conversation_type == Constants.GROUP:
+                result = await session.execute(
+                    insert(conversation_model).values(
                         conversation_name=conversation_name,
                         conversation_type=Constants.GROUP,
                         created_by=creator_uid,
                         created_on=now,
                     )
-                    session.add(new_conversation)
-                    await session.flush()
-
-                    conversation_id = new_conversation.conversation_id
-                    created_conversation_ids.append(conversation_id)
-
-                    session.add_all(
+                )
+                conversation_id = result.inserted_primary_key[0]
+                await session.execute(
+                    insert(participants_model).values(
                         [
-                            participants_model(
-                                conversation_id=conversation_id,
-                                uid=creator_uid,
-                                joined_on=now,
-                                role=Constants.ADMIN,
-                            ),
+                            dict(conversation_id=conversation_id, uid=creator_uid,
+                                 joined_on=now, role=Constants.ADMIN),
                             *[
-                                participants_model(
-                                    conversation_id=conversation_id,
-                                    uid=uid,
-                                    joined_on=now,
-                                    role=Constants.MEMBER,
-                                )
+                                dict(conversation_id=conversation_id, uid=uid,
+                                     joined_on=now, role=Constants.MEMBER)
                                 for uid in participant_uids
                             ],
                         ]
                     )
+                )
+                return creator_uid, participant_uids, [conversation_id]
 
-                else:
-                    for uid in participant_uids:
-                        new_conversation = conversation_model(
+            pair_keys = {
+                uid: Constants.PAIR_KEY_FORMAT.format(min(creator_uid, uid), max(creator_uid, uid))
+                for uid in participant_uids
+            }
+
+            async def ids_by_pair_key():
+                return dict(
+                    (
+                        await session.execute(
+                            select(conversation_model.pair_key, conversation_model.conversation_id)
+                            .where(conversation_model.pair_key.in_(pair_keys.values()))
+                        )
+                    ).all()
+                )
+
+            existing = await ids_by_pair_key()
+            new_uids = [uid for uid in participant_uids if pair_keys[uid] not in existing]
+
+            if new_uids:
+                await session.execute(
+                    insert(conversation_model).values(
+                        [
+                            dict(
+                                conversation_name=conversation_name,
+                                conversation_type=Constants.PRIVATE,
+                                created_by=creator_uid,
+                                created_on=now,
+                                pair_key=pair_keys[uid],
+                            )
+                            for uid in new_uids
+                        ]
+                    )
+                )
+                existing = await ids_by_pair_key()
+                await session.execute(
+                    insert(participants_model).values(
+                        [
+                            row
+                            for uid in new_uids
+                            for row in (
+                                dict(conversation_id=existing[pair_keys[uid]], uid=creator_uid,
+                                     joined_on=now, role=Constants.ADMIN),
+                                dict(conversation_id=existing[pair_keys[uid]], uid=uid,
+                                     joined_on=now, role=Constants.MEMBER),
+                            )
+                        ]
+                    )
+                )
+
+            return creator_uid, participant_uids, [existing[pair_keys[uid]] for uid in participant_uids]
+
+        async def create_on_shards(creator_uid, participant_uids):
+            """
+            Sharded variant of the inserts above: each conversation id (and the
+            pair key of a private chat) is registered in the global directory,
+            then the conversation and its participants are written to its shard.
+            The shard write is skipped when the rows exist, so a chat left
+            without rows by a failed request is completed by the next one.
+            """
+            if conversation_type == Constants.GROUP:
+                members_by_pair_key = {None: participant_uids}
+            else:
+                members_by_pair_key = {
+                    Constants.PAIR_KEY_FORMAT.format(min(creator_uid, uid), max(creator_uid, uid)): [uid]
+                    for uid in participant_uids
+                }
+
+            conversation_ids = []
+            for pair_key, member_uids in members_by_pair_key.items():
+                conversation_id = await db_connect.register_conversation(pair_key)
+                exists_query = select(conversation_model.conversation_id).where(
+                    conversation_model.conversation_id == conversation_id
+                )
+
+                async def create(session, conversation_id=conversation_id, pair_key=pair_key,
+                                 member_uids=member_uids):
+                    if await session.scalar(exists_query) is not None:
+                        return
+                    await session.execute(
+                        insert(conversation_model).values(
+                            conversation_id=conversation_id,
                             conversation_name=conversation_name,
-                            conversation_type=Constants.PRIVATE,
+                            conversation_type=Constants.GROUP if pair_key is None else Constants.PRIVATE,
                             created_by=creator_uid,
                             created_on=now,
+                            pair_key=pair_key,
                         )
-                        session.add(new_conversation)
-                        await session.flush()
-
-                        conversation_id = new_conversation.conversation_id
-                        created_conversation_ids.append(conversation_id)
-
-                        session.add_all(
+                    )
+                    await session.execute(
+                        insert(participants_model).values(
                             [
-                                participants_model(
-                                    conversation_id=conversation_id,
-                                    uid=creator_uid,
-                                    joined_on=now,
-                                    role=Constants.ADMIN,
-                                ),
-                                participants_model(
-                                    conversation_id=conversation_id,
-                                    uid=uid,
-                                    joined_on=now,
-                                    role=Constants.MEMBER,
-                                ),
+                                dict(conversation_id=conversation_id, uid=creator_uid,
+                                     joined_on=now, role=Constants.ADMIN),
+                                *[
+                                    dict(conversation_id=conversation_id, uid=uid,
+                                         joined_on=now, role=Constants.MEMBER)
+                                    for uid in member_uids
+                                ],
                             ]
                         )
+                    )
+
+                shard = await db_connect.conversation_shard(conversation_id)
+                try:
+                    await db_connect.run_transaction(create, Constants.POOL_WRITE, shard=shard)
+                except IntegrityError:
+                    # Fine if a concurrent request for the same pair wrote the rows.
+                    async with db_connect.session(shard=shard) as session:
+                        if await session.scalar(exists_query) is None:
+                            raise
+                conversation_ids.append(conversation_id)
+            return conversation_ids
+
+        try:
+            created = await db_connect.run_transaction(create_conversations)
+        except IntegrityError:
+            # A concurrent request created the same private chat first; the
+            # second pass finds it through its pair key.
+            created = await db_connect.run_transaction(create_conversations)
+
+        if created is None:
+            response[
+                Constants.MESSAGE_KEY
+            ] = Constants.USER_NOT_FOUND_MESSAGE.format(creator_email)
+            response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+            return JSONResponse(
+                content=response, status_code=response[Constants.STATUS_CODE_KEY]
+            )
+
+        creator_uid, participant_uids, created_conversation_ids = created
+        if not participant_uids:
+            response[
+                Constants.MESSAGE_KEY
+            ] = Constants.CONVERSATION_PARTICIPANTS_ERROR
+            response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+            return JSONResponse(
+                content=response, status_code=response[Constants.STATUS_CODE_KEY]
+            )
+        if created_conversation_ids is None:
+            created_conversation_ids = await create_on_shards(creator_uid, participant_uids)
+
+        if conversation_type != Constants.GROUP:
+            for uid in participant_uids:
+                await contact_graph.add_pair(creator_uid, uid)
+
+        for email in [creator_email, *participant_emails]:
+            db_connect.mark_write(email)
+        await response_cache.invalidate(
+            *(Constants.CACHE_TAG_CONVERSATION.format(cid) for cid in created_conversation_ids)
+        )
+        await membership_cache.invalidate(*created_conversation_ids)
 
         response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
         response[Constants.MESSAGE_KEY] = Constants.CONVERSATION_SUCCESS_MESSAGE
@@ -275,7 +700,9 @@ async def get_user_conversations(request: Request):
     Expected request JSON keys:
         - Constants.JWT_PARAM_EMAIL (email of requester)
 
-    Success: returns a list under `Constants.CONVERSATIONS_STRING_LOWER` and a success status.
+    Success: returns a list under `Constants.CONVERSATIONS_STRING_LOWER` and a success status,
+    with an ETag built from the count, summed `last_seq` and the user's receipt counters of their conversations;
+    a request whose If-None-Match holds it gets 304 before the inbox is read.
     Errors: returns user existence errors or internal server errors.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
@@ -304,7 +731,7 @@ async def get_user_conversations(request: Request):
             Constants.CONVERSATION_CLEARED_TABLE
         )
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(Constants.POOL_READ) as session:
             uid = await session.scalar(
                 select(users_model.uid).where(users_model.email == user_email)
             )
@@ -316,113 +743,161 @@ async def get_user_conversations(request: Request):
                         Constants.MESSAGE_KEY: Constants.USER_EXISTENCE_ERROR_MESSAGE,
                     },
                 )
-
-            conv_query = (
-                select(
-                    conv_model.conversation_id,
-                    conv_model.conversation_name,
-                    conv_model.conversation_type,
-                )
-                .join(
-                    conv_participants_model,
-                    conv_model.conversation_id
-                    == conv_participants_model.conversation_id,
-                )
-                .where(conv_participants_model.uid == uid)
+            if etags.enabled:
+                versions = await etags.versions(session)
+
+        etag = None
+        if etags.enabled:
+            # last_seq and receipt_version only grow, so (count, sums) changes
+            # with every message, clear, own receipt update and new conversation
+            # of the user.
+            async def shard_version(shard):
+                async with db_connect.session(Constants.POOL_READ, shard) as session:
+                    count, total, receipts = (
+                        await session.execute(
+                            select(
+                                func.count(),
+                                func.coalesce(func.sum(conv_model.last_seq), 0),
+                                func.coalesce(func.sum(conv_participants_model.receipt_version), 0),
+                            )
+                            .select_from(conv_model)
+                            .join(
+                                conv_participants_model,
+                                conv_model.conversation_id
+                                == conv_participants_model.conversation_id,
+                            )
+                            .where(conv_participants_model.uid == uid)
+                        )
+                    ).one()
+                    return int(count), int(total), int(receipts)
+
+            etag = etags.make(
+                Constants.CONVERSATIONS_ENDPOINT,
+                uid,
+                versions.get(Constants.USERS_VERSION),
+                versions.get(Constants.HISTORY_VERSION),
+                *await db_connect.gather_shards(shard_version),
             )
-
-            conversations = (await session.execute(conv_query)).all()
-            results = []
-
-            for conv_id, name, conv_type in conversations:
-                participants_query = (
+            if etags.matches(request, etag):
+                return etags.not_modified(Constants.CONVERSATIONS_ENDPOINT, etag)
+
+        # The user lives on the primary; each shard answers for the
+        # conversations placed on it and the inboxes are concatenated.
+        async def shard_inbox(shard):
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                conv_query = (
                     select(
-                        users_model.uid,
-                        users_model.first_name,
-                        users_model.last_name,
-                        users_model.email,
+                        conv_model.conversation_id,
+                        conv_model.conversation_name,
+                        conv_model.conversation_type,
                     )
                     .join(
                         conv_participants_model,
-                        users_model.uid == conv_participants_model.uid,
+                        conv_model.conversation_id
+                        == conv_participants_model.conversation_id,
                     )
-                    .where(conv_participants_model.conversation_id == conv_id)
+                    .where(conv_participants_model.uid == uid)
                 )
-                participant_rows = (await session.execute(participants_query)).all()
-                participants = [
-                    {
-                        Constants.UID: p_uid,
-                        Constants.FIRST_NAME: fn,
-                        Constants.LAST_NAME: ln,
-                        Constants.EMAIL: em,
-                    }
-                    for p_uid, fn, ln, em in participant_rows
-                ]
-
-                if (
-                    conv_type == Constants.PRIVATE
-                    and (not name or name.strip() == "")
-                    and len(participants) == 2
-                ):
-                    sorted_names = sorted(
-                        [
-                            f"{p[Constants.FIRST_NAME]} {p[Constants.LAST_NAME]}".strip()
-                            for p in participants
-                        ]
-                    )
-                    name = f"{sorted_names[0]} & {sorted_names[1]}"
 
-                cleared_at = await session.scalar(
-                    select(cleared_model.cleared_at)
-                    .where(cleared_model.uid == uid)
-                    .where(cleared_model.conversation_id == conv_id)
-                )
+                conversations = (await session.execute(conv_query)).all()
+                results = []
 
-                last_msg_query = select(
-                    msg_model.body, msg_model.sent_at, msg_model.uid
-                ).where(msg_model.conversation_id == conv_id)
-                if cleared_at:
-                    last_msg_query = last_msg_query.where(
-                        msg_model.sent_at > cleared_at
+                for conv_id, name, conv_type in conversations:
+                    participants_query = (
+                        select(
+                            users_model.uid,
+                            users_model.first_name,
+                            users_model.last_name,
+                            users_model.email,
+                        )
+                        .join(
+                            conv_participants_model,
+                            users_model.uid == conv_participants_model.uid,
+                        )
+                        .where(conv_participants_model.conversation_id == conv_id)
                     )
-                last_msg_query = last_msg_query.order_by(
-                    msg_model.sent_at.desc()
-                ).limit(1)
-
-                last_msg = (await session.execute(last_msg_query)).first()
+                    participant_rows = (await session.execute(participants_query)).all()
+                    participants = [
+                        {
+                            Constants.UID: p_uid,
+                            Constants.FIRST_NAME: fn,
+                            Constants.LAST_NAME: ln,
+                            Constants.EMAIL: em,
+                        }
+                        for p_uid, fn, ln, em in participant_rows
+                    ]
+
+                    if (
+                        conv_type == Constants.PRIVATE
+                        and (not name or name.strip() == "")
+                        and len(participants) == 2
+                    ):
+                        sorted_names = sorted(
+                            [
+                                f"{p[Constants.FIRST_NAME]} {p[Constants.LAST_NAME]}".strip()
+                                for p in participants
+                            ]
+                        )
+                        name = f"{sorted_names[0]} & {sorted_names[1]}"
 
-                if last_msg:
-                    last_message = {
-                        Constants.TEXT: last_msg[0],
-                        Constants.CREATED_AT: str(last_msg[1]),
-                        Constants.SENT_BY_ME: last_msg[2] == uid,
-                    }
-                else:
-                    last_message = None
-
-                unread_query = (
-                    select(receipts_model.message_id)
-                    .join(msg_model, receipts_model.message_id == msg_model.message_id)
-                    .where(msg_model.conversation_id == conv_id)
-                    .where(receipts_model.uid == uid)
-                    .where(receipts_model.status != Constants.READ)
-                    .where(msg_model.uid != uid)
-                )
-                if cleared_at:
-                    unread_query = unread_query.where(msg_model.sent_at > cleared_at)
+                    cleared_at = await session.scalar(
+                        select(cleared_model.cleared_at)
+                        .where(cleared_model.uid == uid)
+                        .where(cleared_model.conversation_id == conv_id)
+                    )
 
-                unread_count = len((await session.scalars(unread_query)).all())
+                    last_msg_query = select(
+                        msg_model.body, msg_model.sent_at, msg_model.uid
+                    ).where(msg_model.conversation_id == conv_id)
+                    if cleared_at:
+                        last_msg_query = last_msg_query.where(
+                            msg_model.sent_at > cleared_at
+                        )
+                    last_msg_query = last_msg_query.order_by(
+                        msg_model.sent_at.desc()
+                    ).limit(1)
+
+                    last_msg = (await session.execute(last_msg_query)).first()
+
+                    if last_msg:
+                        last_message = {
+                            Constants.TEXT: last_msg[0],
+                            Constants.CREATED_AT: to_iso(last_msg[1]),
+                            Constants.SENT_BY_ME: last_msg[2] == uid,
+                        }
+                    else:
+                        last_message = None
+
+                    unread_query = (
+                        select(receipts_model.message_id)
+                        .join(msg_model, receipts_model.message_id == msg_model.message_id)
+                        .where(msg_model.conversation_id == conv_id)
+                        .where(receipts_model.uid == uid)
+                        .where(receipts_model.status != Constants.READ)
+                        .where(msg_model.uid != uid)
+                    )
+                    if cleared_at:
+                        unread_query = unread_query.where(msg_model.sent_at > cleared_at)
+
+                    unread_count = len((await session.scalars(unread_query)).all())
+
+                    results.append(
+                        {
+                            Constants.CONVERSATION_ID: conv_id,
+                            Constants.CONVERSATION_NAME: name,
+                            Constants.CONVERSATION_TYPE: conv_type,
+                            Constants.LAST_MESSAGE: last_message,
+                            Constants.UNREAD_COUNT: unread_count,
+                            Constants.PARTICIPANTS: participants,
+                        }
+                    )
+            return results
 
-                results.append(
-                    {
-                        Constants.CONVERSATION_ID: conv_id,
-                        Constants.CONVERSATION_NAME: name,
-                        Constants.CONVERSATION_TYPE: conv_type,
-                        Constants.LAST_MESSAGE: last_message,
-                        Constants.UNREAD_COUNT: unread_count,
-                        Constants.PARTICIPANTS: participants,
-                    }
-                )
+        results = [
+            conversation
+            for shard_results in await db_connect.gather_shards(shard_inbox)
+            for conversation in shard_results
+        ]
 
         return JSONResponse(
             status_code=Constants.SUCCESS_CODE,
@@ -431,6 +906,7 @@ async def get_user_conversations(request: Request):
                 Constants.MESSAGE_KEY: Constants.CONVERSATION_FETCH_SUCCESS_MESSAGE,
                 Constants.CONVERSATIONS_STRING_LOWER: results,
             },
+            headers={Constants.ETAG_HEADER: etag} if etag else None,
         )
 
     except Exception as e:
@@ -444,6 +920,372 @@ async def get_user_conversations(request: Request):
         )
 
 
+async def _bump_receipt_versions(session, conversation_id, uids):
+    """
+    Advance the receipt counter of each recipient in `uids`, which the ETags
+    include. Only the recipients' participant rows are locked, never the
+    conversation row that sends allocate their seq from.
+    """
+    conv_participants_model = await db_connect.set_up_table(
+        Constants.CONVERSATION_PARTICIPANTS_TABLE
+    )
+    await session.execute(
+        update(conv_participants_model)
+        .where(conv_participants_model.conversation_id == conversation_id)
+        .where(conv_participants_model.uid.in_(uids))
+        .values(receipt_version=conv_participants_model.receipt_version + 1)
+    )
+
+
+async def _mark_receipts_delivered(session, conversation_id, message_ids, uids, now):
+    """
+    Move still-`sent` receipts of `uids` for `message_ids` to delivered in one statement.
+    Receipts keep the sequence number of their message, so a delivery does not
+    allocate one (and lock the conversation row).
+    """
+    receipt_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+    result = await session.execute(
+        update(receipt_model)
+        .where(receipt_model.message_id.in_(message_ids))
+        .where(receipt_model.uid.in_(uids))
+        .where(receipt_model.status == Constants.SENT)
+        .values(status=Constants.DELIVERED, updated_at=now)
+    )
+    if result.rowcount:
+        await _bump_receipt_versions(session, conversation_id, uids)
+
+
+@db_connect.transactional(Constants.POOL_WRITE, sharded=True)
+async def _persist_message(session, conversation_id, sender_email, message_text, now, journal_id=None):
+    """
+    Insert a message and its `sent` receipts in one transaction on the
+    conversation's shard (retried on deadlock / lock wait timeout; callers do
+    not pass the session).
+
+    When a journal id is given and a message with that id already exists, the
+    stored message is returned instead, which keeps journal replays idempotent.
+
+    Returns:
+        (message_id, participant_rows) where participant_rows are (uid, email)
+        pairs for every participant other than the sender.
+    """
+    msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+    receipt_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+
+    sender_uid = await identity_cache.uid(session, sender_email)
+
+    participant_rows = [
+        (uid, email)
+        for uid, email in await membership_cache.participants(session, conversation_id)
+        if uid != sender_uid
+    ]
+
+    if journal_id:
+        existing_id = await session.scalar(
+            select(msg_model.message_id).where(msg_model.journal_id == journal_id)
+        )
+        if existing_id:
+            return existing_id, participant_rows
+
+    seq = await db_connect.allocate_sequence(session, conversation_id)
+    values = dict(
+        conversation_id=conversation_id,
+        uid=sender_uid,
+        body=message_text,
+        sent_at=now,
+        seq=seq,
+    )
+    if journal_id:
+        values[Constants.JOURNAL_ID] = journal_id
+    new_msg = msg_model(**values)
+    session.add(new_msg)
+    await session.flush()
+    message_id = new_msg.message_id
+
+    session.add_all(
+        [
+            receipt_model(
+                message_id=message_id,
+                uid=uid,
+                status=Constants.SENT,
+                updated_at=now,
+                updated_seq=seq,
+            )
+            for uid, _ in participant_rows
+        ]
+    )
+
+    return message_id, participant_rows
+
+
+async def _broadcast_new_message(
+    conversation_id, message_id, sender_email, message_text, now, participant_rows, provisional_id=None
+):
+    """Broadcast a stored message and mark the receipts of the sockets it reached as delivered."""
+    event = {
+        Constants.MESSAGE_ID: message_id,
+        Constants.CONVERSATION_ID: conversation_id,
+        Constants.TEXT: message_text,
+        Constants.SENDER: sender_email,
+        Constants.STATUS: Constants.DELIVERED,
+        Constants.SENT_AT: to_iso(now),
+    }
+    if provisional_id:
+        event[Constants.PROVISIONAL_ID] = provisional_id
+
+    delivered_emails = await manager.broadcast(
+        conversation_id, event, exclude_email=sender_email
+    )
+    uid_by_email = {p_email: uid for uid, p_email in participant_rows}
+    delivered_uids = [uid_by_email[e] for e in delivered_emails if e in uid_by_email]
+
+    if delivered_uids:
+        await db_connect.run_transaction(
+            lambda session: _mark_receipts_delivered(
+                session, conversation_id, [message_id], delivered_uids, now
+            ),
+            Constants.POOL_WRITE,
+            label="_mark_receipts_delivered",
+            shard=await db_connect.conversation_shard(conversation_id),
+        )
+    return delivered_uids
+
+
+async def _notify_participants(sender_email, participant_uids, message_text):
+    """Push a notification to every registered device of the given participants."""
+    if not participant_uids:
+        return
+
+    users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+    devices_model = await db_connect.set_up_table(Constants.DEVICES_TABLE)
+
+    async with db_connect.session(Constants.POOL_WRITE) as session:
+        sender_name = sender_email.split("@")[0].capitalize()
+        try:
+            sender_first_name = await session.scalar(
+                select(users_model.first_name).where(users_model.email == sender_email)
+            )
+            if sender_first_name:
+                sender_name = sender_first_name
+            logger.info(f"Sender first name fetched: {sender_name}")
+        except Exception as e:
+            logger.error(f"Failed to fetch sender first name for {sender_email}: {e}")
+
+        devices = (
+            await session.execute(
+                select(devices_model.uid, devices_model.device_id).where(
+                    devices_model.uid.in_(participant_uids)
+                )
+            )
+        ).all()
+
+    for uid, device_id in devices:
+        try:
+            await send_device_notification(
+                device_id,
+                title=f"New Message from {sender_name}",
+                body=message_text,
+            )
+            logger.info(f"Notification sent to device={device_id} for user_uid={uid}")
+        except Exception as notify_err:
+            logger.error(
+                f"Failed to send notification to device={device_id}: {notify_err}"
+            )
+
+
+async def replay_journal_record(record: dict):
+    """
+    Apply one journaled message to the database (idempotent on its journal id),
+    then broadcast it so clients can swap the provisional id for the real one.
+    """
+    conversation_id = record[Constants.CONVERSATION_ID]
+    sender_email = record[Constants.SENDER]
+    message_text = record[Constants.BODY]
+    sent_at = from_iso(record[Constants.SENT_AT])
+    journal_id = record[Constants.JOURNAL_ID]
+
+    message_id, participant_rows = await _persist_message(
+        conversation_id, sender_email, message_text, sent_at, journal_id
+    )
+    logger.info(f"Journal replay - {journal_id} stored as message {message_id}")
+    message_index.add(
+        conversation_id, message_id, message_text, await db_connect.conversation_shard(conversation_id)
+    )
+
+    delivered_uids = await _broadcast_new_message(
+        conversation_id,
+        message_id,
+        sender_email,
+        message_text,
+        sent_at,
+        participant_rows,
+        provisional_id=journal_id,
+    )
+    await manager.send_personal(
+        conversation_id,
+        sender_email,
+        {
+            Constants.MESSAGE_ID: message_id,
+            Constants.PROVISIONAL_ID: journal_id,
+            Constants.CONVERSATION_ID: conversation_id,
+            Constants.STATUS: Constants.DELIVERED if delivered_uids else Constants.SENT,
+        },
+    )
+    await _notify_participants(
+        sender_email, [uid for uid, _ in participant_rows], message_text
+    )
+
+
+async def _deliver_pending_on_attach(conversation_id: int, email: str):
+    """
+    Mark everything still `sent` to `email` in the conversation as delivered now
+    that their socket is attached, and tell the senders with one status event.
+    """
+    users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+    msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+    receipt_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+
+    async def deliver_pending(session):
+        uid = await session.scalar(
+            select(users_model.uid).where(users_model.email == email)
+        )
+        if not uid:
+            return []
+
+        pending_ids = (
+            await session.scalars(
+                select(receipt_model.message_id)
+                .join(msg_model, receipt_model.message_id == msg_model.message_id)
+                .where(msg_model.conversation_id == conversation_id)
+                .where(receipt_model.uid == uid)
+                .where(receipt_model.status == Constants.SENT)
+            )
+        ).all()
+        if pending_ids:
+            await _mark_receipts_delivered(
+                session, conversation_id, pending_ids, [uid], utc_now()
+            )
+        return pending_ids
+
+    pending_ids = await db_connect.run_transaction(
+        deliver_pending, Constants.POOL_WRITE, shard=await db_connect.conversation_shard(conversation_id)
+    )
+    if not pending_ids:
+        return
+
+    logger.info(
+        f"Marked {len(pending_ids)} messages delivered to {email} in convo={conversation_id}"
+    )
+    await manager.broadcast(
+        conversation_id,
+        {
+            Constants.MESSAGE_IDS: list(pending_ids),
+            Constants.CONVERSATION_ID: conversation_id,
+            Constants.RECIPIENT: email,
+            Constants.STATUS: Constants.DELIVERED,
+        },
+        exclude_email=email,
+    )
+
+
+async def _handle_ws_message(websocket: WebSocket, conversation_id: int, sender_email: str, data: dict):
+    """Persist, acknowledge, broadcast and notify one message received on the socket."""
+    logger.debug(
+        f"Received message from {sender_email} in convo={conversation_id}: {data}"
+    )
+    message_text = data.get(Constants.BODY, "")
+    if not message_text:
+        await websocket.send_json(
+            {
+                Constants.STATUS_CODE_KEY: Constants.BAD_REQUEST,
+                Constants.MESSAGE_KEY: Constants.MISSING_MESSAGE_FIELDS_MESSAGE,
+            }
+        )
+        logger.warning(f"Empty message received from {sender_email}")
+        return
+
+    now = utc_now()
+    journal_id = message_journal.new_id() if message_journal.enabled else None
+
+    try:
+        persist = _persist_message(
+            conversation_id, sender_email, message_text, now, journal_id
+        )
+        if message_journal.enabled:
+            message_id, participant_rows = await asyncio.wait_for(
+                persist, timeout=message_journal.db_timeout
+            )
+        else:
+            message_id, participant_rows = await persist
+    except Exception as e:
+        # Rejected writes (unknown conversation, constraint violations, bugs)
+        # would fail again on replay; only stalls and outages are journaled.
+        if not message_journal.enabled or not is_unavailable(e):
+            raise
+        logger.warning(
+            f"DB write stalled for convo={conversation_id}, journaling {journal_id}: {e!r}"
+        )
+        await message_journal.append(
+            {
+                Constants.JOURNAL_ID: journal_id,
+                Constants.CONVERSATION_ID: conversation_id,
+                Constants.SENDER: sender_email,
+                Constants.BODY: message_text,
+                Constants.SENT_AT: to_iso(now),
+            }
+        )
+        await websocket.send_json(
+            {
+                Constants.MESSAGE_ID: None,
+                Constants.PROVISIONAL_ID: journal_id,
+                Constants.CONVERSATION_ID: conversation_id,
+                Constants.TEXT: message_text,
+                Constants.SENDER: sender_email,
+                Constants.STATUS: Constants.SENT,
+                Constants.SENT_AT: to_iso(now),
+            }
+        )
+        return
+
+    logger.info(
+        f"Message saved - id={message_id}, convo={conversation_id}, user={sender_email}"
+    )
+    message_index.add(
+        conversation_id, message_id, message_text, await db_connect.conversation_shard(conversation_id)
+    )
+
+    ack_message = {
+        Constants.MESSAGE_ID: message_id,
+        Constants.CONVERSATION_ID: conversation_id,
+        Constants.TEXT: message_text,
+        Constants.SENDER: sender_email,
+        Constants.STATUS: Constants.SENT,
+        Constants.SENT_AT: to_iso(now),
+    }
+    await websocket.send_json(ack_message)
+    logger.debug(f"Sent ack to sender {sender_email}: SENT")
+
+    delivered_uids = await _broadcast_new_message(
+        conversation_id, message_id, sender_email, message_text, now, participant_rows
+    )
+
+    if delivered_uids:
+        ack_message[Constants.STATUS] = Constants.DELIVERED
+        await websocket.send_json(ack_message)
+        logger.info(
+            f"Delivery confirmed to sender {sender_email} (status → delivered)"
+        )
+    else:
+        logger.info(
+            f"No active receivers in convo={conversation_id}. "
+            f"Message stays SENT for sender {sender_email}."
+        )
+
+    await _notify_participants(
+        sender_email, [uid for uid, _ in participant_rows], message_text
+    )
+
+
 @router.websocket("/user/send_message_ws/{conversation_id}/{email}")
 async def send_message_ws(websocket: WebSocket, conversation_id: int, email: str):
     """
@@ -456,8 +1298,10 @@ async def send_message_ws(websocket: WebSocket, conversation_id: int, email: str
     Message payload (JSON) should include:
         - Constants.BODY (message text)
 
-    Behavior: saves message, creates delivery receipts, broadcasts to participants,
+    Behavior: saves message, creates `sent` receipts, broadcasts to participants,
     sends push notifications to registered devices, and acknowledges to the sender.
+    Receipts move to delivered in bulk when the broadcast reaches a recipient's
+    socket, or when the recipient attaches their own socket to the conversation.
     """
 
     await websocket.accept()
@@ -465,9 +1309,22 @@ async def send_message_ws(websocket: WebSocket, conversation_id: int, email: str
 
     logger.info(f"WebSocket CONNECT - convo={conversation_id}, user={sender_email}")
     await manager.connect(conversation_id, sender_email, websocket)
+    connection_key = id(websocket)
+    rate_limiter.register(connection_key, sender_email)
 
     try:
+        try:
+            await _deliver_pending_on_attach(conversation_id, sender_email)
+        except Exception as e:
+            logger.error(
+                f"Failed to mark pending messages delivered for {sender_email}: {e}"
+            )
+
         while True:
+            if rate_limiter.pause_on_limit:
+                # Backpressure: leave unread frames in the socket until tokens refill.
+                await rate_limiter.wait_for_token(connection_key, sender_email)
+
             try:
                 data = await websocket.receive_json()
             except WebSocketDisconnect:
@@ -479,147 +1336,83 @@ async def send_message_ws(websocket: WebSocket, conversation_id: int, email: str
                 logger.warning(f"WebSocket JSON error (ignored) - {e}")
                 continue
 
-            logger.debug(
-                f"Received message from {sender_email} in convo={conversation_id}: {data}"
-            )
-            message_text = data.get(Constants.BODY, "")
-            if not message_text:
-                await websocket.send_json(
-                    {
-                        Constants.STATUS_CODE_KEY: Constants.BAD_REQUEST,
-                        Constants.MESSAGE_KEY: Constants.MISSING_MESSAGE_FIELDS_MESSAGE,
-                    }
-                )
-                logger.warning(f"Empty message received from {sender_email}")
-                continue
-
-            users_model = await db_connect.set_up_table(Constants.USER_TABLE)
-            msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
-            receipt_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
-            conv_part_model = await db_connect.set_up_table(
-                Constants.CONVERSATION_PARTICIPANTS_TABLE
-            )
-            devices_model = await db_connect.set_up_table("devices")
-
-            async with db_connect.AsyncSessionLocal() as session:
-                sender_uid = await session.scalar(
-                    select(users_model.uid).where(users_model.email == sender_email)
-                )
-
-                now = datetime.datetime.now().strftime(Constants.DATETIME_FORMAT)
-
-                new_msg = msg_model(
-                    conversation_id=conversation_id,
-                    uid=sender_uid,
-                    body=message_text,
-                    sent_at=now,
-                )
-                session.add(new_msg)
-                await session.flush()
-                message_id = new_msg.message_id
-                logger.info(
-                    f"Message saved - id={message_id}, convo={conversation_id}, user={sender_email}"
-                )
-
-                participant_uids = (
-                    await session.scalars(
-                        select(conv_part_model.uid)
-                        .where(conv_part_model.conversation_id == conversation_id)
-                        .where(conv_part_model.uid != sender_uid)
+            if not rate_limiter.pause_on_limit:
+                retry_after = rate_limiter.acquire(connection_key, sender_email)
+                if retry_after:
+                    metrics.incr(Constants.METRIC_RATE_LIMIT_THROTTLED)
+                    await websocket.send_json(
+                        {
+                            Constants.STATUS_CODE_KEY: Constants.RATE_LIMIT_ERROR,
+                            Constants.MESSAGE_KEY: Constants.RATE_LIMIT_ERROR_MESSAGE,
+                            Constants.RETRY_AFTER_MS: int(retry_after * 1000),
+                        }
                     )
-                ).all()
-
-                for uid in participant_uids:
-                    session.add(
-                        receipt_model(
-                            message_id=message_id,
-                            uid=uid,
-                            status="delivered",
-                            updated_at=now,
-                        )
-                    )
-
-                await session.commit()
-
-                sender_name = sender_email.split("@")[0].capitalize()
-                try:
-                    result = await session.execute(
-                        select(users_model.first_name).where(
-                            users_model.email == sender_email
-                        )
-                    )
-                    sender_first_name = result.scalar_one_or_none()
-                    if sender_first_name:
-                        sender_name = sender_first_name
-                    logger.info(f"Sender first name fetched: {sender_name}")
-                except Exception as e:
-                    logger.error(
-                        f"Failed to fetch sender first name for {sender_email}: {e}"
-                    )
-
-                for uid in participant_uids:
-                    device_ids = await session.scalars(
-                        select(devices_model.device_id).where(devices_model.uid == uid)
+                    logger.warning(
+                        f"Rate limited {sender_email} in convo={conversation_id}, retry in {retry_after:.3f}s"
                     )
-                    for device_id in device_ids:
-                        try:
-                            await send_device_notification(
-                                device_id,
-                                title=f"New Message from {sender_name}",
-                                body=message_text,
-                            )
-                            logger.info(
-                                f"Notification sent to device={device_id} for user_uid={uid}"
-                            )
-                        except Exception as notify_err:
-                            logger.error(
-                                f"Failed to send notification to device={device_id}: {notify_err}"
-                            )
-
-            ack_message = {
-                Constants.MESSAGE_ID: message_id,
-                Constants.CONVERSATION_ID: conversation_id,
-                Constants.TEXT: message_text,
-                Constants.SENDER: sender_email,
-                Constants.STATUS: Constants.SENT,
-                Constants.SENT_AT: now,
-            }
-            await websocket.send_json(ack_message)
-            logger.debug(f"Sent ack to sender {sender_email}: SENT")
-
-            delivered_to_someone = await manager.broadcast(
-                conversation_id,
-                {
-                    Constants.MESSAGE_ID: message_id,
-                    Constants.CONVERSATION_ID: conversation_id,
-                    Constants.TEXT: message_text,
-                    Constants.SENDER: sender_email,
-                    Constants.STATUS: Constants.DELIVERED,
-                    Constants.SENT_AT: now,
-                },
-            )
+                    continue
 
-            if delivered_to_someone:
-                ack_message[Constants.STATUS] = Constants.DELIVERED
-                await websocket.send_json(ack_message)
-                logger.info(
-                    f"Delivery confirmed to sender {sender_email} (status → delivered)"
-                )
-            else:
-                logger.info(
-                    f"No active receivers in convo={conversation_id}. "
-                    f"Message stays SENT for sender {sender_email}."
-                )
+            with sql_instrumentation.scope(Constants.WS_SEND_MESSAGE_SCOPE):
+                await _handle_ws_message(websocket, conversation_id, sender_email, data)
 
     except Exception as e:
         logger.exception(
             f"Unexpected error in WebSocket convo={conversation_id}, user={sender_email}"
         )
     finally:
+        rate_limiter.release(connection_key, sender_email)
         await manager.disconnect(conversation_id, sender_email)
         logger.info(f"WebSocket CLOSED - convo={conversation_id}, user={sender_email}")
 
 
+async def _message_page(session, live_query, msg_model, users_model, conversation_id, cleared_at, cursor, limit):
+    """
+    Up to `limit + 1` messages with seq below `cursor`, newest first.
+
+    Live rows come first; the archive is read only when it holds messages of
+    the conversation at or above the oldest live row of the page (or the live
+    rows ran out), so paging crosses into archived history transparently.
+    """
+    newest_first = (msg_model.seq.desc(), msg_model.message_id.desc())
+    query = live_query.order_by(None).order_by(*newest_first).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(msg_model.seq < int(cursor))
+    rows = (await session.execute(query)).all()
+
+    if not message_archiver.enabled:
+        return rows
+    archive_model = await db_connect.set_up_table(Constants.MESSAGES_ARCHIVE_TABLE)
+    archived_max_seq = await session.scalar(
+        select(func.max(archive_model.seq)).where(archive_model.conversation_id == conversation_id)
+    )
+    if archived_max_seq is None or (len(rows) > limit and rows[-1].seq > archived_max_seq):
+        return rows
+
+    archive_query = (
+        select(
+            archive_model.message_id,
+            archive_model.body,
+            archive_model.uid,
+            archive_model.sent_at,
+            archive_model.seq,
+            users_model.email,
+            users_model.first_name,
+            literal(Constants.ARCHIVED).label(Constants.STATUS),
+        )
+        .join(users_model, users_model.uid == archive_model.uid)
+        .where(archive_model.conversation_id == conversation_id)
+        .order_by(archive_model.seq.desc(), archive_model.message_id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        archive_query = archive_query.where(archive_model.seq < int(cursor))
+    if cleared_at:
+        archive_query = archive_query.where(archive_model.sent_at > cleared_at)
+    metrics.incr(Constants.METRIC_ARCHIVE_READS)
+    archived = (await session.execute(archive_query)).all()
+    return sorted(rows + archived, key=lambda row: (row.seq, row.message_id), reverse=True)[:limit + 1]
+
+
 @router.post("/user/get_messages")
 async def get_messages(request: Request):
     """
@@ -628,15 +1421,29 @@ async def get_messages(request: Request):
     Expected request JSON keys:
         - Constants.JWT_PARAM_EMAIL (requester email)
         - Constants.MESSAGE_CONVERSATION_ID (conversation id)
+        - Constants.CURSOR (optional, return messages with seq below this one)
+        - Constants.LIMIT (optional, page size, default Constants.DEFAULT_MESSAGE_PAGE_SIZE)
 
     Success: returns messages list and message metadata; marks status fields as appropriate.
+    With cursor or limit, returns the newest page below the cursor plus
+    `Constants.NEXT_CURSOR`, reading archived messages once the page reaches them.
+    The response carries an ETag built from the conversation's `last_seq` and
+    its participants' receipt counters; a request whose If-None-Match holds it
+    gets 304 before the messages are read.
     Errors: returns bad request when parameters are missing or user is not participant.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
+    etag = None
     try:
         data = await request.json()
         reader_email = data.get(Constants.JWT_PARAM_EMAIL, "").lower()
         conversation_id = data.get(Constants.MESSAGE_CONVERSATION_ID)
+        paged = any(data.get(key) is not None for key in (Constants.CURSOR, Constants.LIMIT))
+        cursor = data.get(Constants.CURSOR)
+        limit = min(
+            max(int(data.get(Constants.LIMIT) or Constants.DEFAULT_MESSAGE_PAGE_SIZE), 1),
+            Constants.MAX_PAGE_SIZE,
+        )
 
         if not reader_email or not conversation_id:
             response[
@@ -648,7 +1455,8 @@ async def get_messages(request: Request):
             )
 
         users_model = await db_connect.set_up_table(Constants.USER_TABLE)
-        conv_part_model = await db_connect.set_up_table(
+        conv_model = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
+        conv_participants_model = await db_connect.set_up_table(
             Constants.CONVERSATION_PARTICIPANTS_TABLE
         )
         msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
@@ -657,10 +1465,12 @@ async def get_messages(request: Request):
             Constants.CONVERSATION_CLEARED_TABLE
         )
 
-        async with db_connect.AsyncSessionLocal() as session:
-            reader_uid = await session.scalar(
-                select(users_model.uid).where(users_model.email == reader_email)
-            )
+        # Versions are read before any data, so the tag never runs ahead of it.
+        versions = await etags.versions() if etags.enabled else None
+
+        shard = await db_connect.conversation_shard(conversation_id)
+        async with db_connect.session(shard=shard) as session:
+            reader_uid = await identity_cache.uid(session, reader_email)
             if not reader_uid:
                 response[Constants.MESSAGE_KEY] = Constants.USER_EXISTENCE_ERROR_MESSAGE
                 response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
@@ -668,18 +1478,38 @@ async def get_messages(request: Request):
                     content=response, status_code=response[Constants.STATUS_CODE_KEY]
                 )
 
-            is_participant = await session.scalar(
-                select(conv_part_model.uid)
-                .where(conv_part_model.conversation_id == conversation_id)
-                .where(conv_part_model.uid == reader_uid)
-            )
-            if not is_participant:
+            participants = await membership_cache.participants(session, conversation_id)
+            if not any(uid == reader_uid for uid, _ in participants):
                 response[Constants.MESSAGE_KEY] = Constants.USER_NOT_PART_OF_THIS_CONVO
                 response[Constants.STATUS_CODE_KEY] = Constants.BAD_REQUEST
                 return JSONResponse(
                     content=response, status_code=response[Constants.STATUS_CODE_KEY]
                 )
 
+            if etags.enabled:
+                # Every message and clear of the conversation allocates a seq;
+                # receipt updates bump their recipient's receipt_version.
+                last_seq = await session.scalar(
+                    select(conv_model.last_seq).where(conv_model.conversation_id == conversation_id)
+                )
+                receipt_versions = await session.scalar(
+                    select(func.coalesce(func.sum(conv_participants_model.receipt_version), 0))
+                    .where(conv_participants_model.conversation_id == conversation_id)
+                )
+                etag = etags.make(
+                    Constants.GET_MESSAGES_ENDPOINT,
+                    reader_uid,
+                    int(conversation_id),
+                    last_seq,
+                    int(receipt_versions),
+                    versions.get(Constants.USERS_VERSION),
+                    versions.get(Constants.HISTORY_VERSION),
+                    cursor if paged else None,
+                    limit if paged else None,
+                )
+                if etags.matches(request, etag):
+                    return etags.not_modified(Constants.GET_MESSAGES_ENDPOINT, etag)
+
             cleared_at = await session.scalar(
                 select(cleared_model.cleared_at)
                 .where(cleared_model.uid == reader_uid)
@@ -692,6 +1522,7 @@ async def get_messages(request: Request):
                     msg_model.body,
                     msg_model.uid,
                     msg_model.sent_at,
+                    msg_model.seq,
                     users_model.email,
                     users_model.first_name,
                     receipts_model.status,
@@ -705,7 +1536,7 @@ async def get_messages(request: Request):
                     ),
                 )
                 .where(msg_model.conversation_id == conversation_id)
-                .order_by(msg_model.sent_at.asc())
+                .order_by(msg_model.seq.asc(), msg_model.message_id.asc())
             )
             if cleared_at:
                 query = query.where(msg_model.sent_at > cleared_at)
@@ -713,7 +1544,14 @@ async def get_messages(request: Request):
                     f"[LOG] Messages cleared for user {reader_email} at {cleared_at} and model message {msg_model.sent_at}"
                 )
 
-            rows = (await session.execute(query)).all()
+            if paged:
+                rows = await _message_page(
+                    session, query, msg_model, users_model, conversation_id, cleared_at, cursor, limit
+                )
+                response[Constants.NEXT_CURSOR] = rows[limit - 1].seq if len(rows) > limit else None
+                rows = list(reversed(rows[:limit]))
+            else:
+                rows = (await session.execute(query)).all()
 
             messages_list = []
             for (
@@ -721,6 +1559,7 @@ async def get_messages(request: Request):
                 body,
                 sender_uid,
                 sent_at,
+                seq,
                 sender_email,
                 sender_first_name,
                 my_receipt_status,
@@ -730,7 +1569,10 @@ async def get_messages(request: Request):
                 )
                 sent_by_me = sender_uid == reader_uid
 
-                if sent_by_me:
+                if my_receipt_status == Constants.ARCHIVED:
+                    # Receipts are purged when a message is archived.
+                    status = Constants.ARCHIVED
+                elif sent_by_me:
                     worst_status = await session.scalar(
                         select(receipts_model.status)
                         .where(receipts_model.message_id == m_id)
@@ -765,7 +1607,8 @@ async def get_messages(request: Request):
                         Constants.TEXT: body,
                         Constants.SENDER: reader_email if sent_by_me else sender_email,
                         Constants.STATUS: status,
-                        Constants.SENT_AT: str(sent_at),
+                        Constants.SENT_AT: to_iso(sent_at),
+                        Constants.SEQ: seq,
                         Constants.SENT_BY_ME: bool(sent_by_me),
                         Constants.SENDER_NAME: sender_name,
                     }
@@ -782,7 +1625,11 @@ async def get_messages(request: Request):
         response[Constants.MESSAGE_KEY] = Constants.ERROR_FETCHING_MESSAGES
 
     return JSONResponse(
-        content=response, status_code=response[Constants.STATUS_CODE_KEY]
+        content=response,
+        status_code=response[Constants.STATUS_CODE_KEY],
+        headers={Constants.ETAG_HEADER: etag}
+        if etag and response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE
+        else None,
     )
 
 
@@ -816,20 +1663,12 @@ async def mark_messages_read(request: Request):
         msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
         receipts_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
-            uid_row = await session.execute(
-                select(users_model.uid).where(users_model.email == reader_email)
-            )
-            reader_uid = uid_row.scalar_one_or_none()
-
+        async def mark_read(session):
+            reader_uid = await identity_cache.uid(session, reader_email)
             if not reader_uid:
-                response[Constants.MESSAGE_KEY] = f"User not found: {reader_email}"
-                response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
-                return JSONResponse(
-                    content=response, status_code=response[Constants.STATUS_CODE_KEY]
-                )
+                return None, []
 
-            now = datetime.datetime.now().strftime(Constants.DATETIME_FORMAT)
+            now = utc_now()
 
             unread_messages_query = (
                 select(
@@ -846,19 +1685,38 @@ async def mark_messages_read(request: Request):
 
             unread_messages = (await session.execute(unread_messages_query)).all()
 
-        logger.info(
-            f"[DEBUG] Marking {len(unread_messages)} messages as read for {reader_email}"
+            logger.info(
+                f"[DEBUG] Marking {len(unread_messages)} messages as read for {reader_email}"
+            )
+
+            if unread_messages:
+                # Receipts keep their message's seq: only the reader's own
+                # participant row is locked, never the conversation row.
+                await session.execute(
+                    update(receipts_model)
+                    .where(receipts_model.uid == reader_uid)
+                    .where(
+                        receipts_model.message_id.in_(
+                            [msg_id for msg_id, _, _ in unread_messages]
+                        )
+                    )
+                    .values(status=Constants.READ, updated_at=now)
+                )
+                await _bump_receipt_versions(session, conversation_id, [reader_uid])
+            return reader_uid, unread_messages
+
+        reader_uid, unread_messages = await db_connect.run_transaction(
+            mark_read, shard=await db_connect.conversation_shard(conversation_id)
         )
 
-        for msg_id, sender_uid, sender_email in unread_messages:
-            await db_connect.update_data(
-                Constants.RECEIPTS_TABLE,
-                Constants.MESSAGE_ID,
-                msg_id,
-                status=Constants.READ,
-                updated_at=now,
+        if not reader_uid:
+            response[Constants.MESSAGE_KEY] = f"User not found: {reader_email}"
+            response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+            return JSONResponse(
+                content=response, status_code=response[Constants.STATUS_CODE_KEY]
             )
 
+        for msg_id, sender_uid, sender_email in unread_messages:
             await manager.broadcast(
                 conversation_id,
                 {
@@ -924,20 +1782,22 @@ async def clear_chat(request: Request):
 
         uid = user["uid"]
 
-        ist = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
-
-        cleared_at = datetime.datetime.now(ist)
+        cleared_at = utc_now()
         table_model = await db_connect.set_up_table(
             Constants.CONVERSATION_CLEARED_TABLE
         )
 
-        async with db_connect.AsyncSessionLocal() as session:
+        shard = await db_connect.conversation_shard(conversation_id)
+        async with db_connect.session(shard=shard) as session:
             async with session.begin():
+                cleared_seq = await db_connect.allocate_sequence(
+                    session, conversation_id
+                )
                 stmt = (
                     update(table_model)
                     .where(table_model.uid == uid)
                     .where(table_model.conversation_id == conversation_id)
-                    .values(cleared_at=cleared_at)
+                    .values(cleared_at=cleared_at, cleared_seq=cleared_seq)
                 )
                 result = await session.execute(stmt)
 
@@ -947,6 +1807,7 @@ async def clear_chat(request: Request):
                             uid=uid,
                             conversation_id=conversation_id,
                             cleared_at=cleared_at,
+                            cleared_seq=cleared_seq,
                         )
                     )
         print(
@@ -965,6 +1826,247 @@ async def clear_chat(request: Request):
     )
 
 
+def _parse_watermarks(watermarks):
+    """
+    {conversation_id: seq} from the request's watermarks object, or None when it
+    is not an object of numeric conversation ids mapped to non-negative integers.
+    """
+    if not isinstance(watermarks, dict):
+        return None
+    parsed = {}
+    for conv_id, seq in watermarks.items():
+        if not str(conv_id).isdigit():
+            return None
+        if isinstance(seq, bool) or not isinstance(seq, int) or seq < 0:
+            return None
+        parsed[int(conv_id)] = seq
+    return parsed
+
+
+@router.post("/user/sync")
+async def sync_changes(request: Request):
+    """
+    Return what changed in the requester's conversations since the client's watermarks.
+
+    Expected request JSON keys:
+        - Constants.JWT_PARAM_EMAIL (requester email)
+        - Constants.WATERMARKS (object mapping conversation_id -> last seen seq)
+
+    Success: for every listed conversation whose sequence moved past the watermark,
+    returns the new messages with the current receipt statuses of every message
+    past the watermark and a clear marker (when the user cleared it since), plus
+    the conversation's current `seq` to store as the next watermark. Only sends
+    and clears move the sequence; later delivery and read updates of older
+    messages arrive as websocket status events and through get_messages.
+    Conversations the client did not list come back under
+    `Constants.NEW_CONVERSATIONS` with their current sequence only.
+    Malformed watermarks get Constants.BAD_REQUEST.
+    """
+    response = Constants.RESPONSE_TEMPLATE.copy()
+    try:
+        input_params = await request.json()
+        user_email = input_params.get(Constants.JWT_PARAM_EMAIL, "").lower()
+        watermarks = _parse_watermarks(input_params.get(Constants.WATERMARKS, {}))
+
+        if not user_email or watermarks is None:
+            response[Constants.STATUS_CODE_KEY] = Constants.BAD_REQUEST
+            response[
+                Constants.MESSAGE_KEY
+            ] = Constants.INVALID_REQUEST_PARAMETERS_MESSAGE
+            return JSONResponse(
+                content=response, status_code=response[Constants.STATUS_CODE_KEY]
+            )
+
+        users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        conv_model = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
+        conv_part_model = await db_connect.set_up_table(
+            Constants.CONVERSATION_PARTICIPANTS_TABLE
+        )
+        msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+        receipts_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+        cleared_model = await db_connect.set_up_table(
+            Constants.CONVERSATION_CLEARED_TABLE
+        )
+
+        async with db_connect.AsyncSessionLocal() as session:
+            uid = await session.scalar(
+                select(users_model.uid).where(users_model.email == user_email)
+            )
+            if not uid:
+                response[Constants.STATUS_CODE_KEY] = Constants.USER_EXISTENCE_ERROR
+                response[Constants.MESSAGE_KEY] = Constants.USER_EXISTENCE_ERROR_MESSAGE
+                return JSONResponse(
+                    content=response, status_code=response[Constants.STATUS_CODE_KEY]
+                )
+
+        # Each shard reports the changes of the conversations placed on it.
+        async def shard_changes(shard):
+            async with db_connect.session(shard=shard) as session:
+                conv_rows = (
+                    await session.execute(
+                        select(
+                            conv_model.conversation_id,
+                            conv_model.last_seq,
+                            cleared_model.cleared_at,
+                            cleared_model.cleared_seq,
+                        )
+                        .join(
+                            conv_part_model,
+                            conv_part_model.conversation_id == conv_model.conversation_id,
+                        )
+                        .outerjoin(
+                            cleared_model,
+                            and_(
+                                cleared_model.conversation_id == conv_model.conversation_id,
+                                cleared_model.uid == uid,
+                            ),
+                        )
+                        .where(conv_part_model.uid == uid)
+                    )
+                ).all()
+
+                changes = {}
+                since = {}
+                new_conversations = []
+                for conv_id, last_seq, cleared_at, cleared_seq in conv_rows:
+                    last_seq = last_seq or 0
+                    if conv_id not in watermarks:
+                        new_conversations.append(
+                            {Constants.CONVERSATION_ID: conv_id, Constants.SEQ: last_seq}
+                        )
+                        continue
+                    watermark = watermarks[conv_id]
+                    if last_seq <= watermark:
+                        continue
+                    changes[conv_id] = {
+                        Constants.CONVERSATION_ID: conv_id,
+                        Constants.SEQ: last_seq,
+                        Constants.MESSAGES_STRING_LOWER: [],
+                        Constants.STATUS_CHANGES: [],
+                        Constants.CLEARED_AT: (
+                            to_iso(cleared_at)
+                            if cleared_seq and cleared_seq > watermark
+                            else None
+                        ),
+                    }
+                    since[conv_id] = (watermark, cleared_at)
+
+                if changes:
+                    message_filters = []
+                    for conv_id, (watermark, cleared_at) in since.items():
+                        condition = and_(
+                            msg_model.conversation_id == conv_id,
+                            msg_model.seq > watermark,
+                        )
+                        if cleared_at:
+                            condition = and_(condition, msg_model.sent_at > cleared_at)
+                        message_filters.append(condition)
+
+                    message_rows = (
+                        await session.execute(
+                            select(
+                                msg_model.message_id,
+                                msg_model.conversation_id,
+                                msg_model.body,
+                                msg_model.uid,
+                                msg_model.sent_at,
+                                msg_model.seq,
+                                users_model.email,
+                                users_model.first_name,
+                            )
+                            .join(users_model, users_model.uid == msg_model.uid)
+                            .where(or_(*message_filters))
+                            .order_by(msg_model.conversation_id, msg_model.seq)
+                        )
+                    ).all()
+                    for (
+                        m_id,
+                        conv_id,
+                        body,
+                        sender_uid,
+                        sent_at,
+                        seq,
+                        sender_email,
+                        sender_first_name,
+                    ) in message_rows:
+                        sent_by_me = sender_uid == uid
+                        changes[conv_id][Constants.MESSAGES_STRING_LOWER].append(
+                            {
+                                Constants.MESSAGE_ID: m_id,
+                                Constants.CONVERSATION_ID: conv_id,
+                                Constants.TEXT: body,
+                                Constants.SENDER: sender_email,
+                                Constants.SENT_AT: to_iso(sent_at),
+                                Constants.SEQ: seq,
+                                Constants.SENT_BY_ME: sent_by_me,
+                                Constants.SENDER_NAME: ""
+                                if sent_by_me
+                                else (
+                                    sender_first_name
+                                    or sender_email.split("@")[0].capitalize()
+                                ),
+                            }
+                        )
+
+                    receipt_rows = (
+                        await session.execute(
+                            select(
+                                receipts_model.message_id,
+                                msg_model.conversation_id,
+                                users_model.email,
+                                receipts_model.status,
+                                receipts_model.updated_seq,
+                            )
+                            .join(msg_model, msg_model.message_id == receipts_model.message_id)
+                            .join(users_model, users_model.uid == receipts_model.uid)
+                            .where(
+                                or_(
+                                    *[
+                                        and_(
+                                            msg_model.conversation_id == conv_id,
+                                            receipts_model.updated_seq > watermark,
+                                        )
+                                        for conv_id, (watermark, _) in since.items()
+                                    ]
+                                )
+                            )
+                            .where(
+                                or_(msg_model.uid == uid, receipts_model.uid == uid)
+                            )
+                            .order_by(receipts_model.updated_seq)
+                        )
+                    ).all()
+                    for m_id, conv_id, receipt_email, status, updated_seq in receipt_rows:
+                        changes[conv_id][Constants.STATUS_CHANGES].append(
+                            {
+                                Constants.MESSAGE_ID: m_id,
+                                Constants.EMAIL: receipt_email,
+                                Constants.STATUS: status,
+                                Constants.SEQ: updated_seq,
+                            }
+                        )
+            return changes, new_conversations
+
+        changes, new_conversations = {}, []
+        for shard_changes_found, shard_new_conversations in await db_connect.gather_shards(shard_changes):
+            changes.update(shard_changes_found)
+            new_conversations.extend(shard_new_conversations)
+
+        response[Constants.CONVERSATIONS_STRING_LOWER] = list(changes.values())
+        response[Constants.NEW_CONVERSATIONS] = new_conversations
+        response[Constants.MESSAGE_KEY] = Constants.SYNC_SUCCESS_MESSAGE
+        response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
+
+    except Exception as e:
+        print_traceback(e)
+        response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
+        response[Constants.MESSAGE_KEY] = Constants.SYNC_ERROR_MESSAGE
+
+    return JSONResponse(
+        content=response, status_code=response[Constants.STATUS_CODE_KEY]
+    )
+
+
 @router.post("/user/otp_validate")
 async def user_otp_validate(request: Request):
     """
@@ -1025,10 +2127,14 @@ async def user_forgot_pwd(request: Request):
         input_params = await request.json()
         validate_forgot_pwd_data(input_params)
 
-        user_existence = await db_connect.get_data(
-            Constants.USER_TABLE,
-            email=input_params[Constants.FORGOT_PASSWORD_PARAM_EMAIL].lower(),
-        )
+        user_existence = None
+        if email_filter.might_exist(
+            input_params[Constants.FORGOT_PASSWORD_PARAM_EMAIL], Constants.FORGOT_PASSWORD_ENDPOINT
+        ):
+            user_existence = await db_connect.get_data(
+                Constants.USER_TABLE,
+                email=input_params[Constants.FORGOT_PASSWORD_PARAM_EMAIL].lower(),
+            )
 
         if user_existence:
             otp_pin = pin_generator()
@@ -1119,10 +2225,12 @@ async def user_signin(request: Request):
         input_params = await request.json()
         validate_signin_data(input_params)
 
-        user = await db_connect.get_data(
-            Constants.USER_TABLE,
-            email=input_params[Constants.SIGNIN_PARAM_EMAIL].lower(),
-        )
+        user = None
+        if email_filter.might_exist(input_params[Constants.SIGNIN_PARAM_EMAIL], Constants.SIGNIN_ENDPOINT):
+            user = await db_connect.get_data(
+                Constants.USER_TABLE,
+                email=input_params[Constants.SIGNIN_PARAM_EMAIL].lower(),
+            )
 
         if user:
             user_hashed_pwd = create_password(
@@ -1187,7 +2295,7 @@ async def user_signup(request: Request):
                 input_params[Constants.SIGNUP_PARAM_PWD], Constants.APP_SECRET_KEY
             )
 
-            time_now = datetime.datetime.now().strftime(Constants.DATETIME_FORMAT)
+            time_now = utc_now()
 
             await db_connect.insert_data(
                 Constants.USER_TABLE,
@@ -1196,6 +2304,10 @@ async def user_signup(request: Request):
                 created_on=time_now,
             )
 
+            db_connect.mark_write(input_params[Constants.SIGNUP_PARAM_EMAIL])
+            await email_filter.add(input_params[Constants.SIGNUP_PARAM_EMAIL])
+            await user_search_index.changed(input_params[Constants.SIGNUP_PARAM_EMAIL])
+            await etags.bump(Constants.USERS_VERSION)
             response[Constants.MESSAGE_KEY] = Constants.SIGNUP_SUCCESS_CODE_MESSAGE
             response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
         else:
@@ -1239,6 +2351,17 @@ async def user_profile(request: Request):
             profile_image=input_params[Constants.PROFILE_PARAM_IMAGE],
         )
 
+        db_connect.mark_write(input_params[Constants.PROFILE_PARAM_EMAIL])
+        await response_cache.invalidate(
+            Constants.CACHE_TAG_PROFILE.format(input_params[Constants.PROFILE_PARAM_EMAIL].lower())
+        )
+        await etags.bump(Constants.USERS_VERSION)
+        await user_search_index.changed(
+            input_params[Constants.PROFILE_PARAM_EMAIL],
+            input_params[Constants.PROFILE_PARAM_FIRST_NAME],
+            input_params[Constants.PROFILE_PARAM_LAST_NAME],
+        )
+
         response[Constants.MESSAGE_KEY] = Constants.SIGNUP_SUCCESS_CODE_MESSAGE
         response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
 
@@ -1305,9 +2428,14 @@ async def fetch_profile(request: Request):
         input_params = await request.json()
         validate_jwt_data(input_params)
 
-        user = await db_connect.get_data(
-            Constants.USER_TABLE, email=input_params[Constants.JWT_PARAM_EMAIL].lower()
-        )
+        email = input_params[Constants.JWT_PARAM_EMAIL].lower()
+        cache_key = (Constants.FETCH_PROFILE_ENDPOINT, email)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        cache_token = await response_cache.token()
+
+        user = await db_connect.get_data(Constants.USER_TABLE, reader=email, email=email)
 
         if user:
             profile_data = {
@@ -1315,7 +2443,7 @@ async def fetch_profile(request: Request):
                 Constants.PROFILE_PARAM_FIRST_NAME: user["first_name"],
                 Constants.PROFILE_PARAM_LAST_NAME: user["last_name"],
                 Constants.PROFILE_PARAM_IMAGE: user["profile_image"],
-                Constants.CREATED_ON: str(user["created_on"]),
+                Constants.CREATED_ON: to_iso(user["created_on"]),
             }
 
             response[Constants.MESSAGE_KEY] = Constants.PROFILE_FETCH_SUCCESS_MESSAGE
@@ -1330,9 +2458,14 @@ async def fetch_profile(request: Request):
         response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
         response[Constants.MESSAGE_KEY] = Constants.PROFILE_FETCH_ERROR_MESSAGE
 
-    return JSONResponse(
+    json_response = JSONResponse(
         content=response, status_code=response[Constants.STATUS_CODE_KEY]
     )
+    if response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE:
+        await response_cache.put(
+            cache_key, json_response, [Constants.CACHE_TAG_PROFILE.format(email)], cache_token
+        )
+    return json_response
 
 
 @router.post("/user/add_to_favorites")
@@ -1358,7 +2491,7 @@ async def add_to_favorites(request: Request):
 
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(shard=await db_connect.conversation_shard(conv_id)) as session:
             async with session.begin():
                 stmt = (
                     update(cp)
@@ -1368,6 +2501,11 @@ async def add_to_favorites(request: Request):
                 )
                 await session.execute(stmt)
 
+        db_connect.mark_write(input_params[Constants.JWT_PARAM_EMAIL])
+        await response_cache.invalidate(
+            Constants.CACHE_TAG_USER.format(input_params[Constants.JWT_PARAM_EMAIL].lower())
+        )
+
         response[Constants.MESSAGE_KEY] = Constants.ADD_TO_FAVORITES_SUCCESS_MESSAGE
         response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
         print(response)
@@ -1403,7 +2541,7 @@ async def remove_from_favorites(request: Request):
 
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(shard=await db_connect.conversation_shard(conv_id)) as session:
             async with session.begin():
                 stmt = (
                     update(cp)
@@ -1413,6 +2551,11 @@ async def remove_from_favorites(request: Request):
                 )
                 await session.execute(stmt)
 
+        db_connect.mark_write(input_params[Constants.JWT_PARAM_EMAIL])
+        await response_cache.invalidate(
+            Constants.CACHE_TAG_USER.format(input_params[Constants.JWT_PARAM_EMAIL].lower())
+        )
+
         response[
             Constants.MESSAGE_KEY
         ] = Constants.REMOVE_FROM_FAVORITES_SUCCESS_MESSAGE
@@ -1436,10 +2579,19 @@ async def list_favorites(request: Request):
         - Constants.JWT_PARAM_EMAIL
 
     Returns: list under Constants.FAVORITES_STRING_LOWER with conversation metadata.
+    Served from the response cache until the user's favorites or pins, or the
+    profile of a listed participant, change.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
     try:
         input_params = await request.json()
+        email = input_params[Constants.JWT_PARAM_EMAIL].lower()
+        cache_key = (Constants.LIST_FAVORITES_ENDPOINT, email)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        cache_token = await response_cache.token()
+        cache_tags = [Constants.CACHE_TAG_USER.format(email)]
 
         user = await db_connect.get_data(
             Constants.USER_TABLE, email=input_params[Constants.JWT_PARAM_EMAIL].lower()
@@ -1450,47 +2602,59 @@ async def list_favorites(request: Request):
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
         users_model = await db_connect.set_up_table(Constants.USER_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
-            query = (
-                select(
-                    convo.conversation_id,
-                    convo.conversation_name,
-                    convo.conversation_type,
-                    cp.is_favorite,
-                    cp.is_pinned,
-                )
-                .join(cp, cp.conversation_id == convo.conversation_id)
-                .where(cp.uid == user_id)
-                .where(cp.is_favorite == Constants.YES)
-            )
-            favorites = (await session.execute(query)).all()
-
-            result_list = []
-            for fav in favorites:
-                participant_query = (
+        async def shard_favorites(shard):
+            async with db_connect.read_session(input_params[Constants.JWT_PARAM_EMAIL], shard) as session:
+                query = (
                     select(
-                        func.concat(
-                            users_model.first_name, " ", users_model.last_name
-                        ).label("participant_name")
+                        convo.conversation_id,
+                        convo.conversation_name,
+                        convo.conversation_type,
+                        cp.is_favorite,
+                        cp.is_pinned,
                     )
-                    .select_from(cp)
-                    .join(users_model, users_model.uid == cp.uid)
-                    .where(cp.conversation_id == fav.conversation_id)
-                    .where(cp.uid != user_id)
+                    .join(cp, cp.conversation_id == convo.conversation_id)
+                    .where(cp.uid == user_id)
+                    .where(cp.is_favorite == Constants.YES)
                 )
-                participant_res = await session.execute(participant_query)
-                participant_name = participant_res.scalar() or ""
+                favorites = (await session.execute(query)).all()
+
+                result_list = []
+                for fav in favorites:
+                    participant_query = (
+                        select(
+                            users_model.email,
+                            func.concat(
+                                users_model.first_name, " ", users_model.last_name
+                            ).label("participant_name"),
+                        )
+                        .select_from(cp)
+                        .join(users_model, users_model.uid == cp.uid)
+                        .where(cp.conversation_id == fav.conversation_id)
+                        .where(cp.uid != user_id)
+                    )
+                    participant = (await session.execute(participant_query)).first()
+                    participant_name = ""
+                    if participant is not None:
+                        participant_name = participant.participant_name or ""
+                        cache_tags.append(Constants.CACHE_TAG_PROFILE.format(participant.email))
+
+                    result_list.append(
+                        {
+                            Constants.CONVERSATION_ID: fav.conversation_id,
+                            Constants.CONVERSATION_NAME: fav.conversation_name,
+                            Constants.CONVERSATION_TYPE: fav.conversation_type,
+                            Constants.IS_FAVORITE: fav.is_favorite,
+                            Constants.IS_PINNED: fav.is_pinned,
+                            "participant_name": participant_name,
+                        }
+                    )
+            return result_list
 
-                result_list.append(
-                    {
-                        Constants.CONVERSATION_ID: fav.conversation_id,
-                        Constants.CONVERSATION_NAME: fav.conversation_name,
-                        Constants.CONVERSATION_TYPE: fav.conversation_type,
-                        Constants.IS_FAVORITE: fav.is_favorite,
-                        Constants.IS_PINNED: fav.is_pinned,
-                        "participant_name": participant_name,
-                    }
-                )
+        result_list = [
+            favorite
+            for shard_favorites_found in await db_connect.gather_shards(shard_favorites)
+            for favorite in shard_favorites_found
+        ]
 
         response[Constants.FAVORITES_STRING_LOWER] = result_list
         response[Constants.MESSAGE_KEY] = Constants.FAVORITES_FETCH_SUCCESS_MESSAGE
@@ -1501,7 +2665,10 @@ async def list_favorites(request: Request):
         response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
         response[Constants.MESSAGE_KEY] = GlobalData.STATUS_MESSAGE
 
-    return JSONResponse(content=response)
+    json_response = JSONResponse(content=response)
+    if response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE:
+        await response_cache.put(cache_key, json_response, cache_tags, cache_token)
+    return json_response
 
 
 @router.post("/user/add_to_pinned")
@@ -1527,7 +2694,7 @@ async def add_to_pinned(request: Request):
 
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(shard=await db_connect.conversation_shard(conv_id)) as session:
             async with session.begin():
                 stmt = (
                     update(cp)
@@ -1537,6 +2704,11 @@ async def add_to_pinned(request: Request):
                 )
                 await session.execute(stmt)
 
+        db_connect.mark_write(input_params[Constants.JWT_PARAM_EMAIL])
+        await response_cache.invalidate(
+            Constants.CACHE_TAG_USER.format(input_params[Constants.JWT_PARAM_EMAIL].lower())
+        )
+
         response[Constants.MESSAGE_KEY] = Constants.ADD_TO_PINNED_SUCCESS_MESSAGE
         response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
 
@@ -1571,7 +2743,7 @@ async def remove_from_pinned(request: Request):
 
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(shard=await db_connect.conversation_shard(conv_id)) as session:
             async with session.begin():
                 stmt = (
                     update(cp)
@@ -1581,6 +2753,11 @@ async def remove_from_pinned(request: Request):
                 )
                 await session.execute(stmt)
 
+        db_connect.mark_write(input_params[Constants.JWT_PARAM_EMAIL])
+        await response_cache.invalidate(
+            Constants.CACHE_TAG_USER.format(input_params[Constants.JWT_PARAM_EMAIL].lower())
+        )
+
         response[Constants.MESSAGE_KEY] = "Removed from pinned successfully"
         response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
 
@@ -1601,10 +2778,17 @@ async def list_pinned(request: Request):
         - Constants.JWT_PARAM_EMAIL
 
     Returns: list under Constants.PINNED_STRING_LOWER.
+    Served from the response cache until the user's favorites or pins change.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
     try:
         input_params = await request.json()
+        email = input_params[Constants.JWT_PARAM_EMAIL].lower()
+        cache_key = (Constants.LIST_PINNED_ENDPOINT, email)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        cache_token = await response_cache.token()
 
         user = await db_connect.get_data(
             Constants.USER_TABLE, email=input_params[Constants.JWT_PARAM_EMAIL].lower()
@@ -1614,20 +2798,24 @@ async def list_pinned(request: Request):
         convo = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
-            query = (
-                select(
-                    convo.conversation_id,
-                    convo.conversation_name,
-                    convo.conversation_type,
-                    cp.is_pinned,
-                    cp.is_favorite,
-                )
-                .join(cp, cp.conversation_id == convo.conversation_id)
-                .where(cp.uid == user_id)
-                .where(cp.is_pinned == Constants.YES)
+        query = (
+            select(
+                convo.conversation_id,
+                convo.conversation_name,
+                convo.conversation_type,
+                cp.is_pinned,
+                cp.is_favorite,
             )
-            rows = (await session.execute(query)).all()
+            .join(cp, cp.conversation_id == convo.conversation_id)
+            .where(cp.uid == user_id)
+            .where(cp.is_pinned == Constants.YES)
+        )
+
+        async def shard_pinned(shard):
+            async with db_connect.read_session(input_params[Constants.JWT_PARAM_EMAIL], shard) as session:
+                return (await session.execute(query)).all()
+
+        rows = [row for shard_rows in await db_connect.gather_shards(shard_pinned) for row in shard_rows]
 
         response[Constants.PINNED_STRING_LOWER] = [
             {
@@ -1647,7 +2835,12 @@ async def list_pinned(request: Request):
         response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
         response[Constants.MESSAGE_KEY] = GlobalData.STATUS_MESSAGE
 
-    return JSONResponse(content=response)
+    json_response = JSONResponse(content=response)
+    if response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE:
+        await response_cache.put(
+            cache_key, json_response, [Constants.CACHE_TAG_USER.format(email)], cache_token
+        )
+    return json_response
 
 
 @router.post("/user/get_group_participants")
@@ -1658,7 +2851,8 @@ async def get_group_participants(request: Request):
     Expected request JSON keys:
         - conversation_id (integer)
 
-    Returns list under key 'participants'.
+    Returns list under key 'participants'. The list is the same for every
+    requester, so it is cached per conversation.
     """
     response = Constants.RESPONSE_TEMPLATE.copy()
     try:
@@ -1674,12 +2868,19 @@ async def get_group_participants(request: Request):
                 content=response, status_code=response[Constants.STATUS_CODE_KEY]
             )
 
+        cache_key = (Constants.GROUP_PARTICIPANTS_ENDPOINT, int(conversation_id))
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        cache_token = await response_cache.token()
+
         conv_part_model = await db_connect.set_up_table(
             Constants.CONVERSATION_PARTICIPANTS_TABLE
         )
         users_model = await db_connect.set_up_table(Constants.USER_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        shard = await db_connect.conversation_shard(conversation_id)
+        async with db_connect.read_session(data.get(Constants.JWT_PARAM_EMAIL), shard) as session:
             query = (
                 select(
                     users_model.email,
@@ -1708,9 +2909,20 @@ async def get_group_participants(request: Request):
         response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
         response[Constants.MESSAGE_KEY] = "Error fetching group participants"
 
-    return JSONResponse(
+    json_response = JSONResponse(
         content=response, status_code=response[Constants.STATUS_CODE_KEY]
     )
+    if response[Constants.STATUS_CODE_KEY] == Constants.SUCCESS_CODE:
+        await response_cache.put(
+            cache_key,
+            json_response,
+            [
+                Constants.CACHE_TAG_CONVERSATION.format(int(conversation_id)),
+                *(Constants.CACHE_TAG_PROFILE.format(p["email"]) for p in participants),
+            ],
+            cache_token,
+        )
+    return json_response
 
 
 @router.post("/user/register_device")
@@ -1889,7 +3101,7 @@ async def is_favorite(request: Request):
 
         cp = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
 
-        async with db_connect.AsyncSessionLocal() as session:
+        async with db_connect.session(shard=await db_connect.conversation_shard(conversation_id)) as session:
             stmt = (
                 select(cp.is_favorite)
                 .where(cp.conversation_id == conversation_id)
@@ -1913,3 +3125,35 @@ async def is_favorite(request: Request):
         response[Constants.MESSAGE_KEY] = GlobalData.STATUS_MESSAGE
 
     return JSONResponse(content=response)
+
+
+@router.get("/admin/metrics")
+async def get_metrics(request: Request):
+    """
+    Return the in-process metrics: counters, gauges, timing summaries and the
+    current state of every connection pool (size, in-use, overflow, idle),
+    plus the size and per-endpoint hit rates of the response cache.
+    Requires `Authorization: Bearer <[ADMIN] TOKEN>`.
+    """
+    response = Constants.RESPONSE_TEMPLATE.copy()
+    if not is_admin_request(request):
+        response[Constants.STATUS_CODE_KEY] = Constants.UNAUTHORIZED
+        response[Constants.MESSAGE_KEY] = Constants.ADMIN_AUTH_ERROR_MESSAGE
+        return JSONResponse(
+            content=response, status_code=response[Constants.STATUS_CODE_KEY]
+        )
+    try:
+        response[Constants.POOLS] = db_connect.pool_status()
+        response[Constants.METRICS] = metrics.snapshot()
+        response[Constants.RESPONSE_CACHE_STATS] = response_cache.stats()
+        response[Constants.EMAIL_FILTER_STATS] = email_filter.stats()
+        response[Constants.STATUS_CODE_KEY] = Constants.SUCCESS_CODE
+        response[Constants.MESSAGE_KEY] = Constants.SUCCESS_CODE
+    except Exception as e:
+        print_traceback(e)
+        response[Constants.STATUS_CODE_KEY] = Constants.INTERNAL_SERVER
+        response[Constants.MESSAGE_KEY] = Constants.APPLICATION_ERROR_MESSAGE
+
+    return JSONResponse(
+        content=response, status_code=response[Constants.STATUS_CODE_KEY]
+    )
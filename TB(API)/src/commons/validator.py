@@ -1,4 +1,6 @@
 # validator.py
+import hmac
+
 from src.constants.constants import Constants
 from src.constants.global_data import GlobalData
 from src.exceptions.db_exception import DBException
@@ -6,6 +8,8 @@ from src.exceptions.validation_exception import ValidationException
 from src.utils.db_utils import db_connect
 from src.commons.config_manager import cfg
 from src.utils.encryption_utils import decrypt
+from src.utils.etags import etags
+from src.utils.index_advisor import verify_required_indexes
 from src.utils.logger import Logger
 
 logger = Logger.get_logger()
@@ -26,7 +30,13 @@ async def validate_db_connection():
             "conversation_participants",
             "messages",
             "receipts",
+            "conversation_cleared",
+            "devices",
         ]
+        if db_connect.shards:
+            tables_to_load.append(Constants.CONVERSATION_SHARD_TABLE)
+        if etags.enabled:
+            tables_to_load.append(Constants.DATA_VERSIONS_TABLE)
 
         for table in tables_to_load:
             try:
@@ -36,6 +46,8 @@ async def validate_db_connection():
                 logger.error(f"Failed to load table: {table} | Error: {e}")
                 raise DBException(f"Failed to load table: {table} | Error: {e}")
 
+        await verify_required_indexes()
+
         GlobalData.TABLE_NAME = local_table_name
         logger.info(f"DB validated successfully for table: {local_table_name}")
 
@@ -44,13 +56,13 @@ async def validate_db_connection():
         raise
 
 
-def validate_jwt_data(params):
-    """Validate JWT payload structure."""
+def validate_jwt_data(params, optional=()):
+    """Validate JWT payload structure; keys listed in `optional` may also be present."""
     try:
         if not isinstance(params, dict):
             raise ValidationException("Parameters payload must be a JSON object.")
 
-        if len(Constants.JWT_PARAM_LOAD) != len(params):
+        if len(Constants.JWT_PARAM_LOAD) != len(set(params) - set(optional)):
             GlobalData.STATUS_CODE = Constants.JWT_PARAM_ERROR
             raise ValidationException("Incorrect number of JWT parameters.")
 
@@ -65,6 +77,20 @@ def validate_jwt_data(params):
         )
 
 
+def is_admin_request(request) -> bool:
+    """
+    True when the request carries `Authorization: Bearer <[ADMIN] TOKEN>`.
+    Admin routes stay closed while no token is configured.
+    """
+    token = cfg.get_value_config_or_default(Constants.ADMIN_CONFIG, Constants.ADMIN_TOKEN, "")
+    if not token:
+        return False
+    header = request.headers.get(Constants.AUTHORIZATION_HEADER, "")
+    if not header.startswith(Constants.BEARER_PREFIX):
+        return False
+    return hmac.compare_digest(header[len(Constants.BEARER_PREFIX):].encode(), decrypt(token).encode())
+
+
 def validate_conversation_data(params):
     """Validate conversation creation request payload."""
     try:
@@ -28,6 +28,61 @@ class Constants:
     DB_HOST = "DB_HOST"
     DB_PORT = "DB_PORT"
     POOL_RECYCLE = "POOL_RECYCLE"
+
+    # Connection pools
+    DB_POOL = "DB_POOL"
+    DB_POOL_SECTION = "DB_POOL_{}"
+    POOL_SIZE = "POOL_SIZE"
+    MAX_OVERFLOW = "MAX_OVERFLOW"
+    POOL_TIMEOUT = "POOL_TIMEOUT"
+    DEFAULT_POOL_SIZE = 5
+    DEFAULT_MAX_OVERFLOW = 10
+    DEFAULT_POOL_TIMEOUT = 30
+    PRE_PING = "PRE_PING"
+    MIN_IDLE = "MIN_IDLE"
+    VALIDATION_INTERVAL_MS = "VALIDATION_INTERVAL_MS"
+    DEFAULT_MIN_IDLE = 2
+    DEFAULT_VALIDATION_INTERVAL_MS = 30000
+    POOL_DEFAULT = "default"
+    POOL_WRITE = "write"
+    POOL_READ = "read"
+    POOL_WORKLOADS = [POOL_DEFAULT, POOL_WRITE, POOL_READ]
+    POOL_SIZE_KEY = "size"
+    POOL_IN_USE_KEY = "in_use"
+    POOL_OVERFLOW_KEY = "overflow"
+    POOL_IDLE_KEY = "idle"
+    DEFAULT_POOL_RECYCLE = 3600
+    POOLS = "pools"
+
+    # Transaction retries
+    DB_RETRY = "DB_RETRY"
+    RETRY_MAX_ATTEMPTS = "MAX_ATTEMPTS"
+    RETRY_BASE_DELAY_MS = "BASE_DELAY_MS"
+    RETRY_MAX_DELAY_MS = "MAX_DELAY_MS"
+    DEFAULT_RETRY_MAX_ATTEMPTS = 4
+    DEFAULT_RETRY_BASE_DELAY_MS = 20
+    DEFAULT_RETRY_MAX_DELAY_MS = 500
+    # 1213: deadlock found, 1205: lock wait timeout exceeded
+    RETRYABLE_DB_ERROR_CODES = (1213, 1205)
+
+    # Read replicas
+    DB_REPLICAS = "DB_REPLICAS"
+    REPLICA_DSNS = "DSNS"
+    RECENT_WRITE_WINDOW_MS = "RECENT_WRITE_WINDOW_MS"
+    HEALTH_CHECK_INTERVAL_MS = "HEALTH_CHECK_INTERVAL_MS"
+    DEFAULT_RECENT_WRITE_WINDOW_MS = 5000
+    DEFAULT_HEALTH_CHECK_INTERVAL_MS = 5000
+    REPLICA_WORKLOAD = "replica-{}"
+
+    # Conversation shards
+    SHARDS = "SHARDS"
+    SHARD = "shard"
+    SHARD_DSNS = "DSNS"
+    SHARD_STRATEGY = "STRATEGY"
+    SHARD_STRATEGY_HASH = "hash"
+    SHARD_STRATEGY_DIRECTORY = "directory"
+    SHARD_WORKLOAD = "shard-{}"
+    METRICS = "metrics"
     POOL_PRE_PING = "pool_pre_ping"
     ROOT_DIR_PATH = os.path.abspath(os.curdir)
 
@@ -35,6 +90,353 @@ class Constants:
     DEFAULT_ENVIRONMENT = "DEFAULT"
     CONFIG_FILE_PATH = 'configuration/config.ini'
 
+    # Rate Limiting
+    RATE_LIMIT = "RATE_LIMIT"
+    RATE_LIMIT_ENABLED = "ENABLED"
+    RATE_LIMIT_CONNECTION_RATE = "CONNECTION_RATE"
+    RATE_LIMIT_CONNECTION_BURST = "CONNECTION_BURST"
+    RATE_LIMIT_USER_RATE = "USER_RATE"
+    RATE_LIMIT_USER_BURST = "USER_BURST"
+    RATE_LIMIT_ON_LIMIT = "ON_LIMIT"
+    RATE_LIMIT_MODE_THROTTLE = "throttle"
+    RATE_LIMIT_MODE_PAUSE = "pause"
+    DEFAULT_CONNECTION_RATE = 5
+    DEFAULT_CONNECTION_BURST = 10
+    DEFAULT_USER_RATE = 10
+    DEFAULT_USER_BURST = 20
+    RETRY_AFTER_MS = "retry_after_ms"
+
+    # WebSocket
+    WEBSOCKET = "WEBSOCKET"
+    WS_PER_MESSAGE_DEFLATE = "PER_MESSAGE_DEFLATE"
+    WS_COALESCE_WINDOW_MS = "COALESCE_WINDOW_MS"
+    DEFAULT_COALESCE_WINDOW_MS = 0
+    WS_COALESCE_MAX_EVENTS = 50
+    WS_SOCKET_CLOSED_MESSAGE = "Socket closed before the frame was sent"
+    WS_IMPLEMENTATION = "websockets"
+
+    # Message Journal
+    JOURNAL = "JOURNAL"
+    JOURNAL_ENABLED = "ENABLED"
+    JOURNAL_DIRECTORY = "DIRECTORY"
+    JOURNAL_SEGMENT_MAX_BYTES = "SEGMENT_MAX_BYTES"
+    JOURNAL_FSYNC_INTERVAL_MS = "FSYNC_INTERVAL_MS"
+    JOURNAL_DB_TIMEOUT_MS = "DB_TIMEOUT_MS"
+    JOURNAL_REPLAY_INTERVAL_MS = "REPLAY_INTERVAL_MS"
+    DEFAULT_JOURNAL_DIRECTORY = "journal"
+    DEFAULT_JOURNAL_SEGMENT_MAX_BYTES = 8388608
+    DEFAULT_JOURNAL_FSYNC_INTERVAL_MS = 5
+    DEFAULT_JOURNAL_DB_TIMEOUT_MS = 250
+    DEFAULT_JOURNAL_REPLAY_INTERVAL_MS = 1000
+    JOURNAL_SEGMENT_NAME = "segment-{:010d}.log"
+    JOURNAL_SEGMENT_GLOB = "segment-*.log"
+    JOURNAL_WORKER_DIR = "worker-{}"
+    JOURNAL_WORKER_GLOB = "worker-*"
+    JOURNAL_LOCK_NAME = ".lock"
+    JOURNAL_OFFSET_SUFFIX = ".offset"
+    JOURNAL_TMP_SUFFIX = ".tmp"
+    JOURNAL_DEAD_LETTER_NAME = "dead-letter.jsonl"
+    JOURNAL_RECORD = "record"
+    JOURNAL_ERROR = "error"
+    PROVISIONAL_ID_PREFIX = "p-"
+    PROVISIONAL_ID = "provisional_id"
+    JOURNAL_ID = "journal_id"
+
+    # Index Check
+    INDEX_CHECK = "INDEX_CHECK"
+    INDEX_CHECK_MODE = "MODE"
+    INDEX_CHECK_WARN = "warn"
+    INDEX_CHECK_FAIL = "fail"
+    INDEX_CHECK_OFF = "off"
+    EXPLAIN_FULL_SCAN = "ALL"
+    REQUIRED_INDEXES = [
+        ("messages", ("conversation_id", "sent_at")),
+        ("messages", ("conversation_id", "seq")),
+        ("receipts", ("uid", "status", "message_id")),
+        ("conversation_participants", ("uid", "conversation_id")),
+        ("user", ("email",)),
+        ("devices", ("uid",)),
+        ("conversation_cleared", ("uid", "conversation_id")),
+        ("conversation", ("pair_key",)),
+    ]
+
+    # User search
+    USER_SEARCH = "USER_SEARCH"
+    USER_SEARCH_ENABLED = "ENABLED"
+    USER_SEARCH_FUZZY = "FUZZY"
+    USER_SEARCH_MIN_FUZZY_SCORE = "MIN_FUZZY_SCORE"
+    USER_SEARCH_REFRESH_MS = "REFRESH_MS"
+    DEFAULT_MIN_FUZZY_SCORE = 0.5
+    DEFAULT_USER_SEARCH_REFRESH_MS = 5000
+    USER_SEARCH_NAMESPACE = "user_search"
+    USER_UPDATED_AT = "updated_at"
+    # Catch-up scans re-read users changed this many seconds before the newest
+    # updated_at seen (or, without that column, this many uids below the newest).
+    USER_SEARCH_UPDATE_OVERLAP_SECONDS = 5
+    USER_SEARCH_UID_OVERLAP = 1000
+    SEARCH_QUERY = "query"
+    DEFAULT_SEARCH_RESULTS = 20
+    MAX_SEARCH_RESULTS = 100
+    USER_SEARCH_SUCCESS_MESSAGE = "Users fetched successfully"
+
+    # Message search index
+    MESSAGE_INDEX = "MESSAGE_INDEX"
+    MESSAGE_INDEX_ENABLED = "ENABLED"
+    MESSAGE_INDEX_DIRECTORY = "DIRECTORY"
+    MESSAGE_INDEX_FLUSH_DOCS = "FLUSH_DOCS"
+    MESSAGE_INDEX_FLUSH_INTERVAL_MS = "FLUSH_INTERVAL_MS"
+    MESSAGE_INDEX_MERGE_FACTOR = "MERGE_FACTOR"
+    DEFAULT_MESSAGE_INDEX_DIRECTORY = "search_index"
+    DEFAULT_MESSAGE_INDEX_FLUSH_DOCS = 1000
+    DEFAULT_MESSAGE_INDEX_FLUSH_INTERVAL_MS = 5000
+    DEFAULT_MESSAGE_INDEX_MERGE_FACTOR = 8
+    INDEX_SEGMENT_NAME = "segment-{:010d}.idx"
+    INDEX_SEGMENT_GLOB = "segment-*.idx"
+    INDEX_SLOT_DIR = "slot-{}"
+    MESSAGE_INDEX_REQUESTS_TABLE = "message_index_requests"
+    INDEX_REQUESTS_WATERMARK = "index_requests"
+    INDEX_MESSAGE_ID_OVERLAP = 1000
+    SEGMENT_TERMS = "terms"
+    SEGMENT_SIZE = "size"
+    SEGMENT_MAX_MESSAGE_ID = "max_message_id"
+    SEGMENT_VERSION = "version"
+    SEGMENT_FORMAT_VERSION = 2
+    # A term's conversation table up to this size is read whole; larger ones
+    # are binary searched for the requester's conversations.
+    SEGMENT_TABLE_READ_BYTES = 65536
+    SEGMENT_FOOTER = "{:020d}\n"
+    SEGMENT_FOOTER_BYTES = 21
+    TMP_SUFFIX = ".tmp"
+    MIN_TOKEN_LENGTH = 2
+    MESSAGE_SEARCH_SUCCESS_MESSAGE = "Messages fetched successfully"
+
+    # Message archive
+    ARCHIVE = "ARCHIVE"
+    ARCHIVE_ENABLED = "ENABLED"
+    ARCHIVE_RETENTION_DAYS = "RETENTION_DAYS"
+    ARCHIVE_INTERVAL_MS = "INTERVAL_MS"
+    ARCHIVE_BATCH_SIZE = "BATCH_SIZE"
+    DEFAULT_ARCHIVE_RETENTION_DAYS = 365
+    DEFAULT_ARCHIVE_INTERVAL_MS = 3600000
+    DEFAULT_ARCHIVE_BATCH_SIZE = 1000
+    ARCHIVE_CLEARED_CHUNK = 100
+    ARCHIVED = "archived"
+    DEFAULT_MESSAGE_PAGE_SIZE = 50
+
+    # History export / import
+    RECORD = "record"
+    MESSAGE_RECORD = "message"
+    ARCHIVED_MESSAGE_RECORD = "archived_message"
+    RECEIPT_RECORD = "receipt"
+    DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+    # Contact graph
+    ADMIN_CONFIG = "ADMIN"
+    ADMIN_TOKEN = "TOKEN"
+    AUTHORIZATION_HEADER = "Authorization"
+    BEARER_PREFIX = "Bearer "
+
+    CONTACT_GRAPH = "CONTACT_GRAPH"
+    CONTACT_GRAPH_PRELOAD = "PRELOAD"
+    CONTACT_GRAPH_MAX_USERS = "MAX_USERS"
+    CONTACT_GRAPH_TTL_MS = "TTL_MS"
+    DEFAULT_CONTACT_GRAPH_MAX_USERS = 100000
+    DEFAULT_CONTACT_GRAPH_TTL_MS = 600000
+    CONTACT_GRAPH_NAMESPACE = "contact_graph"
+
+    # Cache backends
+    CACHE = "CACHE"
+    CACHE_BACKEND_KEY = "BACKEND"
+    CACHE_REDIS_URL = "REDIS_URL"
+    CACHE_CHANNEL = "CHANNEL"
+    CACHE_LOOKUP_MAX_BYTES = "LOOKUP_MAX_BYTES"
+    CACHE_LOOKUP_TTL_MS = "LOOKUP_TTL_MS"
+    CACHE_BACKEND_MEMORY = "memory"
+    CACHE_BACKEND_REDIS = "redis"
+    DEFAULT_CACHE_CHANNEL = "tb:cache:invalidations"
+    DEFAULT_CACHE_LOOKUP_MAX_BYTES = 4194304
+    DEFAULT_CACHE_LOOKUP_TTL_MS = 300000
+    CACHE_MAX_INVALIDATION_MARKS = 10000
+    CACHE_RESUBSCRIBE_DELAY = 1
+    # Keys of one namespace share a Redis Cluster hash tag, e.g. "tb:{response}:".
+    CACHE_REDIS_PREFIX = "tb:{{{}}}:"
+    CACHE_REDIS_ENTRY = "e:"
+    CACHE_REDIS_MARK = "m:"
+    CACHE_REDIS_TAG = "t:"
+    CACHE_REDIS_SEQUENCE = "seq"
+    CACHE_ORIGIN = "origin"
+    CACHE_NAMESPACE = "namespace"
+    CACHE_TAGS = "tags"
+    CACHE_BACKEND = "backend"
+    IDENTITY_CACHE_NAMESPACE = "identity"
+    MEMBERSHIP_CACHE_NAMESPACE = "membership"
+
+    # Response cache
+    RESPONSE_CACHE = "RESPONSE_CACHE"
+    RESPONSE_CACHE_ENABLED = "ENABLED"
+    RESPONSE_CACHE_MAX_BYTES = "MAX_BYTES"
+    RESPONSE_CACHE_TTL_MS = "TTL_MS"
+    DEFAULT_RESPONSE_CACHE_MAX_BYTES = 16777216
+    DEFAULT_RESPONSE_CACHE_TTL_MS = 60000
+    RESPONSE_CACHE_NAMESPACE = "response"
+    RESPONSE_CACHE_STATS = "response_cache"
+    CACHE_TAG_USER = "user:{}"
+    CACHE_TAG_PROFILE = "profile:{}"
+    CACHE_TAG_CONVERSATION = "conversation:{}"
+    CACHE_HITS = "hits"
+    CACHE_MISSES = "misses"
+    CACHE_HIT_RATE = "hit_rate"
+    CACHE_ENTRIES = "entries"
+    CACHE_BYTES = "bytes"
+    CACHE_ENDPOINTS = "endpoints"
+    FETCH_PROFILE_ENDPOINT = "fetch_profile"
+    LIST_FAVORITES_ENDPOINT = "list_favorites"
+    LIST_PINNED_ENDPOINT = "list_pinned"
+    GROUP_PARTICIPANTS_ENDPOINT = "get_group_participants"
+    JSON_MEDIA_TYPE = "application/json"
+
+    # Conditional responses
+    ETAG = "ETAG"
+    ETAG_ENABLED = "ENABLED"
+    DATA_VERSIONS_TABLE = "data_versions"
+    USERS_VERSION = "users"
+    HISTORY_VERSION = "history"
+    ETAG_DIGEST_SIZE = 16
+    ETAG_HEADER = "ETag"
+    IF_NONE_MATCH_HEADER = "If-None-Match"
+    ETAG_ANY = "*"
+    WEAK_ETAG_PREFIX = "W/"
+    CONVERSATIONS_ENDPOINT = "conversations"
+    GET_MESSAGES_ENDPOINT = "get_messages"
+    GET_ALL_USERS_ENDPOINT = "get_all_users"
+
+    # Email filter
+    EMAIL_FILTER = "EMAIL_FILTER"
+    EMAIL_FILTER_ENABLED = "ENABLED"
+    EMAIL_FILTER_EXPECTED_USERS = "EXPECTED_USERS"
+    EMAIL_FILTER_FALSE_POSITIVE_RATE = "FALSE_POSITIVE_RATE"
+    EMAIL_FILTER_MAX_BYTES = "MAX_BYTES"
+    EMAIL_FILTER_REFRESH_MS = "REFRESH_MS"
+    EMAIL_FILTER_SINGLE_WORKER = "SINGLE_WORKER"
+    DEFAULT_EMAIL_FILTER_EXPECTED_USERS = 1000000
+    DEFAULT_EMAIL_FILTER_FALSE_POSITIVE_RATE = 0.001
+    DEFAULT_EMAIL_FILTER_MAX_BYTES = 4194304
+    DEFAULT_EMAIL_FILTER_REFRESH_MS = 5000
+    EMAIL_FILTER_NAMESPACE = "email_filter"
+    EMAIL_FILTER_STATS = "email_filter"
+    # A rebuild sizes the filter for this many times the current user count.
+    EMAIL_FILTER_GROWTH = 2
+    # Catch-up scans re-read this many uids below the high-water mark, since a
+    # lower uid can commit after a higher one.
+    EMAIL_FILTER_UID_OVERLAP = 1000
+    EMAIL_FILTER_READY = "ready"
+    EMAIL_FILTER_USERS = "users"
+    EMAIL_FILTER_CAPACITY = "capacity"
+    EMAIL_FILTER_HASHES = "hashes"
+    EMAIL_FILTER_ESTIMATED_FPR = "estimated_false_positive_rate"
+    SIGNIN_ENDPOINT = "signin"
+    FORGOT_PASSWORD_ENDPOINT = "forgot_password"
+
+    # Query time budgets
+    QUERY_TIMEOUT = "QUERY_TIMEOUT"
+    QUERY_TIMEOUT_ENABLED = "ENABLED"
+    QUERY_TIMEOUT_DEFAULT_MS = "DEFAULT_MS"
+    QUERY_TIMEOUT_GRACE_MS = "GRACE_MS"
+    DEFAULT_QUERY_TIMEOUT_MS = 10000
+    DEFAULT_QUERY_TIMEOUT_GRACE_MS = 1000
+    # Only these read-only routes run under a budget: a KILL QUERY must never
+    # interrupt a statement of a write transaction.
+    QUERY_BUDGET_ROUTES = frozenset({
+        "/user/get_direct_users",
+        "/user/get_all_users",
+        "/user/search_users",
+        "/user/search_messages",
+        "/user/conversations",
+        "/user/get_messages",
+        "/user/sync",
+        "/user/fetch_profile",
+        "/user/list_favorites",
+        "/user/list_pinned",
+        "/user/get_group_participants",
+        "/user/is_favorite",
+    })
+    # 3024: MAX_EXECUTION_TIME exceeded, 1317: query interrupted by KILL QUERY
+    QUERY_INTERRUPTED_ERROR_CODES = (3024, 1317)
+    MYSQL_DIALECT = "mysql"
+    API_PREFIX = "/api"
+    DISCONNECT_POLL_INTERVAL = 0.1
+    ROUTE = "route"
+    BUDGET_MS = "budget_ms"
+    REASON = "reason"
+    BUDGET_EXCEEDED = "budget_exceeded"
+    CLIENT_DISCONNECTED = "client_disconnected"
+
+    # SQL Instrumentation
+    SQL_INSTRUMENTATION = "SQL_INSTRUMENTATION"
+    SQL_INSTRUMENTATION_ENABLED = "ENABLED"
+    SLOW_QUERY_MS = "SLOW_QUERY_MS"
+    N_PLUS_ONE_THRESHOLD = "N_PLUS_ONE_THRESHOLD"
+    SLOWEST_KEPT = "SLOWEST_KEPT"
+    DEFAULT_SLOW_QUERY_MS = 200
+    DEFAULT_N_PLUS_ONE_THRESHOLD = 25
+    DEFAULT_SLOWEST_KEPT = 3
+    QUERY_START_KEY = "query_start_time"
+    UNSCOPED_SQL_LABEL = "background"
+    WS_SEND_MESSAGE_SCOPE = "WS /user/send_message_ws"
+    DB_QUERY_COUNT_HEADER = "X-DB-Query-Count"
+    DB_TIME_HEADER = "X-DB-Time-Ms"
+    SLOW_QUERY_LOGGER_NAME = "slow_query"
+    SLOW_QUERY_LOG_FILE_NAME = 'tb_slow_query_log-{}.txt'
+
+    # Metrics
+    METRIC_RATE_LIMIT_CONNECTION_HITS = "rate_limit.connection_hits"
+    METRIC_RATE_LIMIT_USER_HITS = "rate_limit.user_hits"
+    METRIC_RATE_LIMIT_PAUSES = "rate_limit.pauses"
+    METRIC_RATE_LIMIT_THROTTLED = "rate_limit.throttled_frames"
+    METRIC_WS_EVENTS = "ws.events"
+    METRIC_WS_FRAMES = "ws.frames"
+    METRIC_JOURNAL_APPENDS = "journal.appends"
+    METRIC_JOURNAL_REPLAYED = "journal.replayed"
+    METRIC_JOURNAL_REPLAY_FAILURES = "journal.replay_failures"
+    METRIC_JOURNAL_DEAD_LETTERS = "journal.dead_letters"
+    METRIC_POOL_CHECKOUT_WAIT_MS = "db.pool.{}.checkout_wait_ms"
+    METRIC_POOL_GAUGE = "db.pool.{}.{}"
+    METRIC_POOL_INVALIDATED = "db.pool.{}.invalidated"
+    METRIC_TX_RETRIES = "db.tx.{}.retries"
+    METRIC_TX_RECOVERED = "db.tx.{}.recovered"
+    METRIC_TX_EXHAUSTED = "db.tx.{}.exhausted"
+    METRIC_READS_PRIMARY = "db.reads.primary"
+    METRIC_READS_REPLICA = "db.reads.replica"
+    METRIC_REPLICA_HEALTHY = "db.replica.{}.healthy"
+    METRIC_REFERENCE_SYNC_FAILURES = "db.shards.reference_write_failures"
+    METRIC_QUERY_TIMEOUTS = "sql.budget.timeouts"
+    METRIC_QUERIES_KILLED = "sql.budget.killed"
+    METRIC_QUERIES_CANCELLED = "sql.budget.cancelled"
+    METRIC_CONTACT_GRAPH_HITS = "contact_graph.hits"
+    METRIC_CONTACT_GRAPH_LOADS = "contact_graph.loads"
+    METRIC_USER_SEARCHES = "user_search.queries"
+    METRIC_MESSAGE_INDEX_ADDS = "message_index.adds"
+    METRIC_MESSAGE_INDEX_FLUSHES = "message_index.flushes"
+    METRIC_MESSAGE_INDEX_MERGES = "message_index.merges"
+    METRIC_MESSAGE_SEARCHES = "message_index.queries"
+    METRIC_ARCHIVED_MESSAGES = "archive.messages_moved"
+    METRIC_ARCHIVE_READS = "archive.reads"
+    METRIC_ARCHIVE_FAILURES = "archive.failures"
+    METRIC_CACHE_HITS = "cache.{}.hits"
+    METRIC_CACHE_MISSES = "cache.{}.misses"
+    METRIC_CACHE_ERRORS = "cache.{}.errors"
+    METRIC_CACHE_REMOTE_INVALIDATIONS = "cache.remote_invalidations"
+    METRIC_RESPONSE_CACHE_HITS = "response_cache.{}.hits"
+    METRIC_RESPONSE_CACHE_MISSES = "response_cache.{}.misses"
+    METRIC_ETAG_NOT_MODIFIED = "etag.{}.not_modified"
+    METRIC_EMAIL_FILTER_REJECTS = "email_filter.{}.rejected"
+    METRIC_EMAIL_FILTER_PASSES = "email_filter.{}.passed"
+    METRIC_EMAIL_FILTER_UNVERIFIED = "email_filter.{}.unverified"
+    METRIC_SQL_STATEMENTS = "sql.statements"
+    METRIC_SQL_SLOW_STATEMENTS = "sql.slow_statements"
+    METRIC_SQL_TIME_MS = "sql.time_ms"
+    METRIC_SQL_N_PLUS_ONE = "sql.n_plus_one_warnings"
+
     # Params
     INPUT_PARAM_LEN = 3
     CHOICES = "choices"
@@ -51,8 +453,20 @@ class Constants:
     CONVERSATION_TABLE = "conversation"
     CONVERSATION_PARTICIPANTS_TABLE = "conversation_participants"
     MESSAGE_TABLE = "messages"
+    MESSAGES_ARCHIVE_TABLE = "messages_archive"
     RECEIPTS_TABLE = "receipts"
     CONVERSATION_CLEARED_TABLE = "conversation_cleared"
+    CONVERSATION_SHARD_TABLE = "conversation_shard"
+    SHARDED_TABLES = (
+        CONVERSATION_TABLE,
+        CONVERSATION_PARTICIPANTS_TABLE,
+        MESSAGE_TABLE,
+        MESSAGES_ARCHIVE_TABLE,
+        RECEIPTS_TABLE,
+        CONVERSATION_CLEARED_TABLE,
+    )
+    # User columns copied to every shard for the conversation queries' joins
+    REFERENCE_USER_COLUMNS = ("uid", "email", "first_name", "last_name")
 
     # Signin/Signup Params
     SIGNIN_PARAM_EMAIL = "email"
@@ -128,6 +542,7 @@ class Constants:
 
     # Date/Time
     DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    ISO_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
     DOB_FORMAT = "%Y/%m/%d"
 
     # Database Column Lists
@@ -136,6 +551,16 @@ class Constants:
     LAST_NAME = "last_name"
     PASSWORD = "password"
     EMAIL = "email"
+    CURSOR = "cursor"
+    LIMIT = "limit"
+    STREAM = "stream"
+    DIRECTORY_PAGING_PARAMS = (CURSOR, LIMIT, STREAM)
+    SEARCH_PARAMS = (SEARCH_QUERY, LIMIT)
+    NEXT_CURSOR = "next_cursor"
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    STREAM_BATCH_SIZE = 500
+    NDJSON_MEDIA_TYPE = "application/x-ndjson"
     CREATED_ON = "created_on"
     PROFILE_IMAGE = "profile_image"
     AUTH_INFO = "auth_info"
@@ -145,6 +570,8 @@ class Constants:
     ]
 
     GROUP = "group"
+    PAIR_KEY = "pair_key"
+    PAIR_KEY_FORMAT = "{}:{}"
     PRIVATE = "private"
     TEXT = "text"
     CREATED_AT = "created_at"
@@ -155,8 +582,11 @@ class Constants:
     SENT = "sent"
     DELIVERED = "delivered"
     SENDER_NAME = "sender_name"
+    MESSAGE_IDS = "message_ids"
+    RECIPIENT = "recipient"
 
     CONVERSATION_ID = "conversation_id"
+    MESSAGE_SEARCH_PARAMS = (SEARCH_QUERY, CONVERSATION_ID, LIMIT)
     CONVERSATION_NAME = "conversation_name"
     CONVERSATION_TYPE = "conversation_type"
     CREATED_BY = "created_by"
@@ -174,6 +604,15 @@ class Constants:
     BODY = "body"
     SENT_AT = "sent_at"
 
+    SEQ = "seq"
+    LAST_SEQ = "last_seq"
+    UPDATED_SEQ = "updated_seq"
+    CLEARED_SEQ = "cleared_seq"
+    WATERMARKS = "watermarks"
+    STATUS_CHANGES = "status_changes"
+    MESSAGES_STRING_LOWER = "messages"
+    NEW_CONVERSATIONS = "new_conversations"
+
     MESSAGES_DATABASE_COLUMN_LIST = [
         MESSAGE_ID, MESSAGE_CONVERSATION_ID, MESSAGE_UID, BODY, SENT_AT
     ]
@@ -205,6 +644,7 @@ class Constants:
     ]
     # Success/Error Codes & Messages
     SUCCESS_CODE = 200
+    NOT_MODIFIED = 304
     INTERNAL_SERVER = 500
     DB_RETRIEVAL_ERROR = 401
     DB_CONNECTION_ERROR = 400
@@ -224,6 +664,12 @@ class Constants:
     BAD_REQUEST = 400
     JWT_PARAM_ERROR = 411
     JWT_ERROR_MESSAGE = "JWT Token Error"
+    RATE_LIMIT_ERROR = 429
+    RATE_LIMIT_ERROR_MESSAGE = "Too many messages, please slow down."
+    GATEWAY_TIMEOUT = 504
+    UNAUTHORIZED = 401
+    ADMIN_AUTH_ERROR_MESSAGE = "Admin token missing or invalid."
+    QUERY_TIMEOUT_MESSAGE = "The request exceeded its database time budget."
 
     # Success Messages
     SIGNIN_SUCCESS_CODE_MESSAGE = "User Signin successful"
@@ -259,6 +705,8 @@ class Constants:
     USER_NOT_FOUND_MESSAGE = "User with email {} not found."
     CONVERSATION_PARTICIPANTS_ERROR = "No valid participants found."
     CHAT_CLEARED_SUCCESS_MESSAGE = "Chat cleared successfully."
+    SYNC_SUCCESS_MESSAGE = "Changes fetched successfully"
+    SYNC_ERROR_MESSAGE = "Error fetching changes"
     INVALID_REQUEST_PARAMETERS_MESSAGE = "Invalid request parameters."
     ADMIN = "admin"
     MEMBER = "member"
@@ -0,0 +1,369 @@
+"""
+Storage behind the response, identity and membership caches.
+
+[CACHE] BACKEND picks where entries live:
+    memory  an LRU in process memory per worker (MemoryCacheBackend).
+    redis   a Redis server shared by every worker (RedisCacheBackend).
+
+Entries are bytes stored under a key and tagged with the data they were built
+from; `invalidate(tag)` evicts every entry carrying the tag. A reader takes a
+`token()` before running its queries and hands it to `put()`, which refuses
+the value when one of its tags was invalidated in between.
+
+With the memory backend and [CACHE] REDIS_URL set, invalidations are also
+published on the Redis channel CHANNEL, so a write handled by one worker
+evicts the entries of every worker. The redis package is only needed when
+REDIS_URL is set.
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.encryption_utils import decrypt
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = Logger.get_logger()
+
+# KEYS: entry, mark of every tag, set of every tag. ARGV: value, ttl ms, token seq, tag count.
+_PUT_SCRIPT = """
+local n = tonumber(ARGV[4])
+local token = tonumber(ARGV[3])
+for i = 1, n do
+    local mark = redis.call('GET', KEYS[1 + i])
+    if mark and tonumber(mark) > token then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+for i = 1, n do
+    redis.call('SADD', KEYS[1 + n + i], KEYS[1])
+    redis.call('PEXPIRE', KEYS[1 + n + i], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: sequence, mark of every tag, set of every tag. ARGV: mark ttl ms, tag count.
+_INVALIDATE_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local n = tonumber(ARGV[2])
+for i = 1, n do
+    redis.call('SET', KEYS[1 + i], seq, 'PX', ARGV[1])
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[1 + n + i])) do
+        redis.call('DEL', key)
+    end
+    redis.call('DEL', KEYS[1 + n + i])
+end
+return seq
+"""
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "tags")
+
+    def __init__(self, value: bytes, expires: float, tags: frozenset):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+
+
+class MemoryCacheBackend:
+    """
+    LRU of one cache in process memory, bounded by `max_bytes` of values.
+
+    Tokens are a local sequence number bumped by every invalidation; the tags
+    invalidated at each number are remembered up to a bound, past which every
+    older token is refused.
+    """
+
+    name = Constants.CACHE_BACKEND_MEMORY
+
+    def __init__(self, namespace: str, max_bytes: int, ttl: float, bus=None):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._bus = bus
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._bytes = 0
+        self._sequence = 0
+        self._invalidated_at = {}
+        self._floor = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.value)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    async def token(self):
+        with self._lock:
+            return self._sequence
+
+    async def put(self, key: str, value: bytes, tags, token):
+        if len(value) > self.max_bytes:
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if token < self._floor or any(self._invalidated_at.get(tag, -1) > token for tag in tags):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, time.monotonic() + self.ttl, tags)
+            self._bytes += len(value)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def evict(self, tags):
+        """Evict the entries of `tags` in this worker only (used for remote invalidations)."""
+        with self._lock:
+            self._sequence += 1
+            for tag in tags:
+                self._invalidated_at[tag] = self._sequence
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._drop(key)
+            # Only tokens still in flight need the per-tag marks; past a bound
+            # they are replaced by refusing every older token.
+            if len(self._invalidated_at) > Constants.CACHE_MAX_INVALIDATION_MARKS:
+                self._invalidated_at.clear()
+                self._floor = self._sequence
+
+    def clear(self):
+        """Drop every entry and refuse every token handed out so far."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._bytes = 0
+            self._sequence += 1
+            self._invalidated_at.clear()
+            self._floor = self._sequence
+
+    async def invalidate(self, *tags):
+        self.evict(tags)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, tags)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                Constants.CACHE_BACKEND: self.name,
+                Constants.CACHE_ENTRIES: len(self._entries),
+                Constants.CACHE_BYTES: self._bytes,
+            }
+
+
+class RedisCacheBackend:
+    """
+    One cache stored on a Redis server shared by every worker.
+
+    Keys of a namespace share a hash tag, so the Lua scripts that check the
+    invalidation marks and write an entry (or bump the marks and delete the
+    tagged entries) run atomically, on Redis Cluster as well. Memory is
+    bounded by the server's maxmemory policy and the TTL of every key.
+    Redis errors are logged and counted; the cache then behaves as empty.
+    """
+
+    name = Constants.CACHE_BACKEND_REDIS
+
+    def __init__(self, namespace: str, client, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._client = client
+        self._prefix = Constants.CACHE_REDIS_PREFIX.format(namespace)
+        self._put = client.register_script(_PUT_SCRIPT)
+        self._invalidate = client.register_script(_INVALIDATE_SCRIPT)
+
+    def _failed(self, operation: str, error: Exception):
+        metrics.incr(Constants.METRIC_CACHE_ERRORS.format(self.namespace))
+        logger.warning(f"Cache {self.namespace}: Redis {operation} failed: {error!r}")
+
+    def _tag_keys(self, tags) -> list:
+        return [f"{self._prefix}{Constants.CACHE_REDIS_MARK}{tag}" for tag in tags] + [
+            f"{self._prefix}{Constants.CACHE_REDIS_TAG}{tag}" for tag in tags
+        ]
+
+    async def get(self, key: str):
+        try:
+            return await self._client.get(f"{self._prefix}{Constants.CACHE_REDIS_ENTRY}{key}")
+        except Exception as e:
+            self._failed("get", e)
+            return None
+
+    async def token(self):
+        try:
+            sequence = await self._client.get(f"{self._prefix}{Constants.CACHE_REDIS_SEQUENCE}")
+        except Exception as e:
+            self._failed("token", e)
+            return None
+        # Marks expire with the entries, so a token older than the TTL is refused.
+        return int(sequence or 0), time.monotonic()
+
+    async def put(self, key: str, value: bytes, tags, token):
+        if token is None or time.monotonic() - token[1] > self.ttl:
+            return
+        tags = sorted(set(tags))
+        try:
+            await self._put(
+                keys=[f"{self._prefix}{Constants.CACHE_REDIS_ENTRY}{key}", *self._tag_keys(tags)],
+                args=[value, int(self.ttl * 1000), token[0], len(tags)],
+            )
+        except Exception as e:
+            self._failed("put", e)
+
+    async def invalidate(self, *tags):
+        tags = sorted(set(tags))
+        try:
+            await self._invalidate(
+                keys=[f"{self._prefix}{Constants.CACHE_REDIS_SEQUENCE}", *self._tag_keys(tags)],
+                args=[int(self.ttl * 1000), len(tags)],
+            )
+        except Exception as e:
+            self._failed("invalidate", e)
+
+    def stats(self) -> dict:
+        return {Constants.CACHE_BACKEND: self.name}
+
+
+class InvalidationBus:
+    """
+    Pub/sub fan-out of invalidations between the workers' memory caches.
+
+    `publish` sends (namespace, tags) on [CACHE] CHANNEL; the listener started
+    with the app evicts the tags from the local cache of that namespace,
+    skipping messages of its own worker. When the subscription drops, every
+    local cache is cleared once it is back, since invalidations may have been
+    missed in between.
+    """
+
+    def __init__(self, client, channel: str):
+        self._client = client
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._backends = {}
+        self._task = None
+
+    def register(self, backend: MemoryCacheBackend):
+        self._backends[backend.namespace] = backend
+
+    async def publish(self, namespace: str, tags):
+        message = json.dumps({
+            Constants.CACHE_ORIGIN: self.origin,
+            Constants.CACHE_NAMESPACE: namespace,
+            Constants.CACHE_TAGS: list(tags),
+        })
+        try:
+            await self._client.publish(self.channel, message)
+        except Exception as e:
+            metrics.incr(Constants.METRIC_CACHE_ERRORS.format(namespace))
+            logger.warning(f"Cache {namespace}: publishing invalidation failed: {e!r}")
+
+    def _apply(self, data):
+        message = json.loads(data)
+        if message[Constants.CACHE_ORIGIN] == self.origin:
+            return
+        backend = self._backends.get(message[Constants.CACHE_NAMESPACE])
+        if backend is not None:
+            backend.evict(message[Constants.CACHE_TAGS])
+            metrics.incr(Constants.METRIC_CACHE_REMOTE_INVALIDATIONS)
+
+    async def _listen(self):
+        reconnecting = False
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    if reconnecting:
+                        for backend in self._backends.values():
+                            backend.clear()
+                        logger.info("Cache invalidation channel resubscribed, local caches cleared")
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation channel lost, retrying: {e!r}")
+            reconnecting = True
+            await asyncio.sleep(Constants.CACHE_RESUBSCRIBE_DELAY)
+
+    async def start(self):
+        if self._task is None and self._backends:
+            self._task = asyncio.create_task(self._listen())
+            logger.info(f"Listening for cache invalidations on {self.channel}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class CacheBackends:
+    """Reads [CACHE] and hands out one backend per cache namespace."""
+
+    def __init__(self):
+        section = Constants.CACHE
+        self.backend = cfg.get_value_config_or_default(
+            section, Constants.CACHE_BACKEND_KEY, Constants.CACHE_BACKEND_MEMORY).lower()
+        redis_url = cfg.get_value_config_or_default(section, Constants.CACHE_REDIS_URL, "").strip()
+        channel = cfg.get_value_config_or_default(
+            section, Constants.CACHE_CHANNEL, Constants.DEFAULT_CACHE_CHANNEL)
+
+        self._client = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("[CACHE] REDIS_URL is set but the redis package is not installed")
+            else:
+                self._client = aioredis.from_url(decrypt(redis_url))
+        if self.backend == Constants.CACHE_BACKEND_REDIS and self._client is None:
+            logger.warning("[CACHE] BACKEND is redis without a usable REDIS_URL, using memory")
+            self.backend = Constants.CACHE_BACKEND_MEMORY
+        self.bus = InvalidationBus(self._client, channel) if self._client is not None else None
+
+    def create(self, namespace: str, max_bytes: int, ttl: float):
+        if self.backend == Constants.CACHE_BACKEND_REDIS:
+            return RedisCacheBackend(namespace, self._client, ttl)
+        backend = MemoryCacheBackend(namespace, max_bytes, ttl, self.bus)
+        if self.bus is not None:
+            self.bus.register(backend)
+        return backend
+
+    async def start(self):
+        if self.bus is not None:
+            await self.bus.start()
+
+    async def stop(self):
+        if self.bus is not None:
+            await self.bus.stop()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+cache_backends = CacheBackends()
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.cache_backend import cache_backends
+from src.utils.db_utils import db_connect
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
+class ContactGraph:
+    """
+    In-memory adjacency index: uid -> set of uids sharing a private conversation.
+
+    A user's partner set is loaded from MySQL on first use (or for everybody at
+    startup when [CONTACT_GRAPH] PRELOAD is on) and then kept current by
+    `add_pair`, which start_conversation calls for every private chat it creates.
+    At most MAX_USERS partner sets are kept (least recently used ones are
+    dropped) and each is reloaded once it is older than TTL_MS. When a Redis
+    client is configured in [CACHE], `add_pair` and `invalidate` also drop the
+    users' sets on every other worker through the cache invalidation channel;
+    without it, other workers see a new pair once the TTL has expired.
+    """
+
+    def __init__(self):
+        section = Constants.CONTACT_GRAPH
+        self.preload = (
+            cfg.get_value_config_or_default(section, Constants.CONTACT_GRAPH_PRELOAD, Constants.NO).lower()
+            == Constants.YES
+        )
+        self.max_users = int(cfg.get_value_config_or_default(
+            section, Constants.CONTACT_GRAPH_MAX_USERS, Constants.DEFAULT_CONTACT_GRAPH_MAX_USERS))
+        self.ttl = int(cfg.get_value_config_or_default(
+            section, Constants.CONTACT_GRAPH_TTL_MS, Constants.DEFAULT_CONTACT_GRAPH_TTL_MS)) / 1000
+        self.namespace = Constants.CONTACT_GRAPH_NAMESPACE
+        # uid -> (loaded at, partner uids), least recently used first.
+        self._partners = OrderedDict()
+        self._loading = {}
+        self._late_pairs = defaultdict(set)
+        self._bus = cache_backends.bus
+        if self._bus is not None:
+            self._bus.register(self)
+
+    @staticmethod
+    async def _pair_query():
+        conv = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
+        conv_part = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+        mine, theirs = aliased(conv_part), aliased(conv_part)
+        return (
+            select(mine.uid, theirs.uid)
+            .join(conv, conv.conversation_id == mine.conversation_id)
+            .join(theirs, theirs.conversation_id == mine.conversation_id)
+            .where(conv.conversation_type == Constants.PRIVATE)
+            .where(theirs.uid != mine.uid)
+        ), mine
+
+    async def _load(self, uid: int) -> set:
+        query, mine = await self._pair_query()
+
+        async def load_shard(shard):
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                rows = await session.execute(query.where(mine.uid == uid))
+                return {partner for _, partner in rows}
+
+        return set().union(*await db_connect.gather_shards(load_shard))
+
+    def _store(self, uid: int, partners: set):
+        self._partners[uid] = (time.monotonic(), partners)
+        self._partners.move_to_end(uid)
+        while len(self._partners) > self.max_users:
+            self._partners.popitem(last=False)
+
+    async def _fill(self, uid: int) -> set:
+        try:
+            partners = await self._load(uid)
+            # Only cache the result if the user was not invalidated while it loaded.
+            if self._loading.get(uid) is asyncio.current_task():
+                # Pairs added while the load was in flight may be missing from its result.
+                partners |= self._late_pairs.pop(uid, set())
+                self._store(uid, partners)
+            return partners
+        finally:
+            if self._loading.get(uid) is asyncio.current_task():
+                del self._loading[uid]
+
+    async def partners(self, uid: int) -> set:
+        """Direct-chat partners of `uid`. The returned set must not be modified."""
+        entry = self._partners.get(uid)
+        if entry is not None:
+            loaded_at, partners = entry
+            if not self.ttl or time.monotonic() - loaded_at < self.ttl:
+                self._partners.move_to_end(uid)
+                metrics.incr(Constants.METRIC_CONTACT_GRAPH_HITS)
+                return partners
+            del self._partners[uid]
+
+        # Concurrent first requests for the same user share one load.
+        if uid not in self._loading:
+            metrics.incr(Constants.METRIC_CONTACT_GRAPH_LOADS)
+            self._loading[uid] = asyncio.ensure_future(self._fill(uid))
+        return await asyncio.shield(self._loading[uid])
+
+    async def add_pair(self, uid_a: int, uid_b: int):
+        """Record a new private conversation between two users; call after it has committed."""
+        for uid, partner in ((uid_a, uid_b), (uid_b, uid_a)):
+            if uid in self._partners:
+                self._partners[uid][1].add(partner)
+            elif uid in self._loading:
+                self._late_pairs[uid].add(partner)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [uid_a, uid_b])
+
+    async def invalidate(self, *uids):
+        """Reload the partners of `uids` on next use, on every worker."""
+        self.evict(uids)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, list(uids))
+
+    # InvalidationBus listener.
+    def evict(self, uids):
+        for uid in uids:
+            self._partners.pop(uid, None)
+            self._loading.pop(uid, None)
+            self._late_pairs.pop(uid, None)
+
+    def clear(self):
+        self._partners.clear()
+        self._loading.clear()
+        self._late_pairs.clear()
+
+    async def build(self):
+        """Load the partner sets of every user with one query (PRELOAD)."""
+        if not self.preload:
+            return
+        query, _ = await self._pair_query()
+        partners = defaultdict(set)
+
+        async def load_shard(shard):
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                result = await session.stream(query.execution_options(yield_per=Constants.STREAM_BATCH_SIZE))
+                async for uid, partner in result:
+                    partners[uid].add(partner)
+
+        await db_connect.gather_shards(load_shard)
+        for uid, uids in partners.items():
+            self._store(uid, uids)
+        logger.info(f"Contact graph loaded for {len(self._partners)} of {len(partners)} users")
+
+
+contact_graph = ContactGraph()
@@ -1,9 +1,17 @@
 # db_utils.py
+import asyncio
+import functools
 import os
-from sqlalchemy import MetaData, Table, select, update
+import random
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from sqlalchemy import MetaData, Table, delete, event, insert, select, text, update
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from urllib.parse import quote_plus
 
 from src.commons.config_manager import cfg
@@ -12,52 +20,494 @@ from src.constants.global_data import GlobalData
 from src.exceptions.db_exception import DBException
 from src.utils.encryption_utils import decrypt
 from src.utils.logger import Logger
+from src.utils.metrics import metrics
+from src.utils.query_budget import query_budget
+from src.utils.sql_instrumentation import sql_instrumentation
+from src.utils.time_utils import utc_now
 
 logger = Logger.get_logger()
 Base = declarative_base()
 
 
-class AsyncDBConnect:
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    workload = Constants.POOL_DEFAULT
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe(
+                Constants.METRIC_POOL_CHECKOUT_WAIT_MS.format(self.workload),
+                (time.perf_counter() - start) * 1000,
+            )
+
+
+def _timed_pool_class(workload: str):
+    # The workload lives on the class so it survives pool.recreate() on dispose.
+    return type(f"TimedAsyncQueuePool_{workload}", (TimedAsyncQueuePool,), {"workload": workload})
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Deadlocks (1213) and lock wait timeouts (1205) are safe to replay from the start."""
+    if not isinstance(error, DBAPIError):
+        return False
+    code = getattr(error.orig, "args", (None,))[0]
+    return code in Constants.RETRYABLE_DB_ERROR_CODES
+
+
+def is_unavailable(error: Exception) -> bool:
     """
-    Async DB connection and operations for FastAPI.
-    Supports reflection of multiple tables and concurrent access.
+    The database did not answer in time or could not be reached (timeouts,
+    pool exhaustion, refused or lost connections), as opposed to a statement it
+    rejected. Only these are worth keeping and retrying once the database is back.
     """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, PoolTimeoutError)):
+        return True
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return False
 
-    def __init__(self):
-        try:
-            self.__db_param = cfg.get_env_config(Constants.DATABASE)
 
-            user = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_USER)).strip()
-            password = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_PASSWORD))
-            password_encoded = quote_plus(password)
-            host = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_HOST))
-            db_name = decrypt(cfg.get_value_config(self.__db_param, Constants.DATABASE_NAME))
-            port = int(decrypt(cfg.get_value_config(self.__db_param, Constants.DB_PORT)))
-            self.__pool_recycle = int(decrypt(cfg.get_value_config(self.__db_param, Constants.POOL_RECYCLE)))
+def _pool_options(workload: str) -> dict:
+    """
+    Pool sizing for a workload: its own [DB_POOL_<WORKLOAD>] section first,
+    then the shared [DB_POOL] section, then the built-in defaults.
+    """
+    def value(param, default):
+        shared = cfg.get_value_config_or_default(Constants.DB_POOL, param, default)
+        return int(cfg.get_value_config_or_default(Constants.DB_POOL_SECTION.format(workload.upper()), param, shared))
 
-            self.database_url = f"mysql+aiomysql://{user}:{password_encoded}@{host}:{port}/{db_name}"
+    return {
+        "pool_size": value(Constants.POOL_SIZE, Constants.DEFAULT_POOL_SIZE),
+        "max_overflow": value(Constants.MAX_OVERFLOW, Constants.DEFAULT_MAX_OVERFLOW),
+        "pool_timeout": value(Constants.POOL_TIMEOUT, Constants.DEFAULT_POOL_TIMEOUT),
+    }
 
-            logger.info(f"Initializing DB engine: user={user}, host={host}, port={port}, db={db_name}")
 
-            self.engine = create_async_engine(
-                self.database_url,
-                pool_pre_ping=True,
-                pool_recycle=self.__pool_recycle,
-                echo=False,
-            )
+class AsyncDBConnect:
+    """
+    Async DB connection and operations for FastAPI.
+    Supports reflection of multiple tables and concurrent access.
+    """
 
-            self.AsyncSessionLocal = sessionmaker(
-                bind=self.engine, class_=AsyncSession, expire_on_commit=False
-            )
+    def __init__(self, database_url: str = None, replica_urls: list = None, shard_urls: list = None):
+        """
+        Without arguments the primary comes from the [DATABASE] section, the
+        replicas from [DB_REPLICAS] and the conversation shards from [SHARDS].
+        Passing the URLs directly (e.g. several SQLite files) bypasses the
+        config, which is how routing and sharding are exercised locally.
+        """
+        try:
+            if database_url is None:
+                self.__db_param = cfg.get_env_config(Constants.DATABASE)
+
+                user = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_USER)).strip()
+                password = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_PASSWORD))
+                password_encoded = quote_plus(password)
+                host = decrypt(cfg.get_value_config(self.__db_param, Constants.DB_HOST))
+                db_name = decrypt(cfg.get_value_config(self.__db_param, Constants.DATABASE_NAME))
+                port = int(decrypt(cfg.get_value_config(self.__db_param, Constants.DB_PORT)))
+                self.__pool_recycle = int(decrypt(cfg.get_value_config(self.__db_param, Constants.POOL_RECYCLE)))
+
+                database_url = f"mysql+aiomysql://{user}:{password_encoded}@{host}:{port}/{db_name}"
+
+                logger.info(f"Initializing DB engine: user={user}, host={host}, port={port}, db={db_name}")
+            else:
+                self.__pool_recycle = Constants.DEFAULT_POOL_RECYCLE
+
+            self.database_url = database_url
+
+            if replica_urls is None:
+                replica_urls = [
+                    decrypt(dsn.strip())
+                    for dsn in cfg.get_value_config_or_default(
+                        Constants.DB_REPLICAS, Constants.REPLICA_DSNS, ""
+                    ).split(",")
+                    if dsn.strip()
+                ]
+            if shard_urls is None:
+                shard_urls = [
+                    decrypt(dsn.strip())
+                    for dsn in cfg.get_value_config_or_default(
+                        Constants.SHARDS, Constants.SHARD_DSNS, ""
+                    ).split(",")
+                    if dsn.strip()
+                ]
+            self.shard_strategy = cfg.get_value_config_or_default(
+                Constants.SHARDS, Constants.SHARD_STRATEGY, Constants.SHARD_STRATEGY_HASH).lower()
+            self.recent_write_window = int(cfg.get_value_config_or_default(
+                Constants.DB_REPLICAS, Constants.RECENT_WRITE_WINDOW_MS, Constants.DEFAULT_RECENT_WRITE_WINDOW_MS)) / 1000
+            self.health_check_interval = int(cfg.get_value_config_or_default(
+                Constants.DB_REPLICAS, Constants.HEALTH_CHECK_INTERVAL_MS, Constants.DEFAULT_HEALTH_CHECK_INTERVAL_MS)) / 1000
+            # Connections are validated in the background instead of with a
+            # SELECT 1 on every checkout (pool_pre_ping), unless PRE_PING is on.
+            self.pre_ping = cfg.get_value_config_or_default(
+                Constants.DB_POOL, Constants.PRE_PING, Constants.NO).lower() == Constants.YES
+            self.min_idle = int(cfg.get_value_config_or_default(
+                Constants.DB_POOL, Constants.MIN_IDLE, Constants.DEFAULT_MIN_IDLE))
+            self.validation_interval = int(cfg.get_value_config_or_default(
+                Constants.DB_POOL, Constants.VALIDATION_INTERVAL_MS, Constants.DEFAULT_VALIDATION_INTERVAL_MS)) / 1000
+            self.retry_attempts = int(cfg.get_value_config_or_default(
+                Constants.DB_RETRY, Constants.RETRY_MAX_ATTEMPTS, Constants.DEFAULT_RETRY_MAX_ATTEMPTS))
+            self.retry_base_delay = int(cfg.get_value_config_or_default(
+                Constants.DB_RETRY, Constants.RETRY_BASE_DELAY_MS, Constants.DEFAULT_RETRY_BASE_DELAY_MS)) / 1000
+            self.retry_max_delay = int(cfg.get_value_config_or_default(
+                Constants.DB_RETRY, Constants.RETRY_MAX_DELAY_MS, Constants.DEFAULT_RETRY_MAX_DELAY_MS)) / 1000
+
+            # One engine (and pool) per workload so that long inbox/directory reads
+            # cannot starve the latency-critical message writes of connections.
+            self.engines = {}
+            self.session_factories = {}
+            for workload in Constants.POOL_WORKLOADS:
+                self._add_engine(workload, self.database_url, _pool_options(workload))
+
+            # Replicas get the read pool sizing; routing only uses the healthy ones.
+            self.replicas = []
+            self.replica_health = {}
+            for index, url in enumerate(replica_urls):
+                name = Constants.REPLICA_WORKLOAD.format(index)
+                engine = self._add_engine(name, url, _pool_options(Constants.POOL_READ))
+                event.listen(engine.sync_engine, "handle_error", self._replica_error_handler(name))
+                self.replicas.append(name)
+                self.replica_health[name] = True
+
+            # With shards configured the primary keeps the users, devices and the
+            # conversation directory; everything keyed by conversation_id lives
+            # on the shard the conversation was placed on.
+            self.shards = []
+            self.reference_shards = []
+            for index, url in enumerate(shard_urls):
+                name = Constants.SHARD_WORKLOAD.format(index)
+                self._add_engine(name, url, _pool_options(Constants.SHARD))
+                self.shards.append(name)
+                # A shard on the primary itself (the usual shard 0 of a migrated
+                # deployment) has the real user table, not a copy.
+                if url != self.database_url:
+                    self.reference_shards.append(name)
+            self._shard_directory = {}
+
+            self.engine = self.engines[Constants.POOL_DEFAULT]
+            self.AsyncSessionLocal = self.session_factories[Constants.POOL_DEFAULT]
+
+            # email -> end of its read-your-writes window, oldest first. The pin
+            # is per worker process: a read landing on another worker may still
+            # go to a replica (route a user's requests to one worker for strict
+            # read-your-writes).
+            self._recent_writes = OrderedDict()
+            self._next_replica = 0
+            self._health_task = None
+            self._maintenance_task = None
 
             self.meta_data = MetaData()
             self.tables = {}
             self.models = {}
+            # Reflecting the same table twice at once would map it twice on the shared metadata.
+            self._reflect_lock = asyncio.Lock()
 
         except Exception as e:
             logger.error(f"DB Initialization Failed: {e}")
             raise
 
+    def _add_engine(self, name: str, url: str, options: dict):
+        engine = create_async_engine(
+            url,
+            poolclass=_timed_pool_class(name),
+            pool_pre_ping=self.pre_ping,
+            pool_recycle=self.__pool_recycle,
+            echo=False,
+            **options,
+        )
+        sql_instrumentation.attach(engine)
+        query_budget.attach(engine)
+        self.engines[name] = engine
+        self.session_factories[name] = sessionmaker(
+            bind=engine, class_=AsyncSession, expire_on_commit=False
+        )
+        logger.info(f"DB pool '{name}': {options}")
+        return engine
+
+    # -------------------------------------------------------------------------
+    def session(self, workload: str = Constants.POOL_DEFAULT, shard: str = None) -> AsyncSession:
+        """
+        Open a session on the pool of the given workload (default / write / read),
+        or on `shard` when one is given (see conversation_shard).
+        """
+        return self.session_factories[shard or workload]()
+
+    # -------------------------------------------------------------------------
+    async def run_transaction(self, work, workload: str = Constants.POOL_DEFAULT, label: str = None,
+                              shard: str = None):
+        """
+        Run `work(session)` inside a transaction and return its result.
+
+        On a deadlock or lock wait timeout the transaction is rolled back and the
+        whole unit of work replayed on a fresh session, after a full-jitter
+        exponential backoff, up to [DB_RETRY] MAX_ATTEMPTS times. `work` must
+        therefore only touch the database through the session it is given.
+        """
+        label = label or getattr(work, "__name__", "transaction")
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                async with self.session(workload, shard) as session:
+                    async with session.begin():
+                        result = await work(session)
+                if attempt > 1:
+                    metrics.incr(Constants.METRIC_TX_RECOVERED.format(label))
+                return result
+
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt == self.retry_attempts:
+                    metrics.incr(Constants.METRIC_TX_EXHAUSTED.format(label))
+                    logger.error(f"{label}: giving up after {attempt} attempts: {e.orig}")
+                    raise
+                metrics.incr(Constants.METRIC_TX_RETRIES.format(label))
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+                logger.warning(f"{label}: {e.orig}; retry {attempt}/{self.retry_attempts - 1} in {delay * 1000:.0f} ms")
+                await asyncio.sleep(delay)
+
+    def transactional(self, workload: str = Constants.POOL_DEFAULT, sharded: bool = False):
+        """
+        Decorator form of run_transaction: the wrapped coroutine receives the
+        session as its first argument, callers pass only the remaining ones.
+        With `sharded` the first of those is a conversation_id and the
+        transaction runs on that conversation's shard.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                shard = await self.conversation_shard(args[0]) if sharded else None
+                return await self.run_transaction(
+                    lambda session: func(session, *args, **kwargs), workload, func.__name__, shard
+                )
+            return wrapper
+        return decorator
+
+    # -------------------------------------------------------------------------
+    def _hash_shard(self, conversation_id: int) -> int:
+        return (conversation_id - 1) % len(self.shards)
+
+    async def conversation_shard(self, conversation_id) -> str:
+        """
+        Name of the shard holding a conversation's rows, None when sharding is off.
+
+        The hash strategy places ids round robin. The directory strategy reads
+        the conversation_shard table (cached once found), so a conversation can
+        be moved to another shard by copying its rows and updating its entry.
+        """
+        if not self.shards:
+            return None
+        conversation_id = int(conversation_id)
+        if self.shard_strategy != Constants.SHARD_STRATEGY_DIRECTORY:
+            return self.shards[self._hash_shard(conversation_id)]
+
+        shard = self._shard_directory.get(conversation_id)
+        if shard is None:
+            directory = await self.set_up_table(Constants.CONVERSATION_SHARD_TABLE)
+            async with self.session(Constants.POOL_READ) as session:
+                index = await session.scalar(
+                    select(directory.shard_index).where(directory.conversation_id == conversation_id)
+                )
+            if index is None:
+                # Unknown ids are not cached: the id may be registered later.
+                return self.shards[self._hash_shard(conversation_id)]
+            shard = self._shard_directory[conversation_id] = self.shards[index]
+        return shard
+
+    async def register_conversation(self, pair_key: str = None) -> int:
+        """
+        Allocate a conversation id in the global directory and place it on a
+        shard. A private chat's `pair_key` is unique in the directory, so the
+        id already registered for the pair is returned instead.
+        """
+        directory = await self.set_up_table(Constants.CONVERSATION_SHARD_TABLE)
+
+        async def register(session):
+            if pair_key:
+                existing = await session.scalar(
+                    select(directory.conversation_id).where(directory.pair_key == pair_key)
+                )
+                if existing is not None:
+                    return existing
+            result = await session.execute(
+                insert(directory).values(pair_key=pair_key, shard_index=0, created_on=utc_now())
+            )
+            conversation_id = result.inserted_primary_key[0]
+            await session.execute(
+                update(directory)
+                .where(directory.conversation_id == conversation_id)
+                .values(shard_index=self._hash_shard(conversation_id))
+            )
+            return conversation_id
+
+        try:
+            return await self.run_transaction(register, Constants.POOL_WRITE)
+        except IntegrityError:
+            # A concurrent request registered the same pair first.
+            return await self.run_transaction(register, Constants.POOL_WRITE)
+
+    async def gather_shards(self, work) -> list:
+        """
+        Run `work(shard)` on every shard concurrently and return the results in
+        shard order; unsharded, `work(None)` runs once on the primary.
+        """
+        return list(await asyncio.gather(*(work(shard) for shard in self.shards or [None])))
+
+    # -------------------------------------------------------------------------
+    def mark_write(self, email: str):
+        """Pin the user's reads to this worker's primary read pool for the recent-write window."""
+        if self.replicas and email:
+            now = time.monotonic()
+            email = email.lower()
+            self._recent_writes[email] = now + self.recent_write_window
+            self._recent_writes.move_to_end(email)
+            # Every window has the same length, so expired pins are at the front.
+            while self._recent_writes:
+                oldest, until = next(iter(self._recent_writes.items()))
+                if until >= now:
+                    break
+                del self._recent_writes[oldest]
+
+    def _wrote_recently(self, email: str) -> bool:
+        until = self._recent_writes.get(email.lower()) if email else None
+        if until is None:
+            return False
+        if until < time.monotonic():
+            self._recent_writes.pop(email.lower(), None)
+            return False
+        return True
+
+    def read_session(self, email: str = None, shard: str = None) -> AsyncSession:
+        """
+        Session for a read-only request. Served by a healthy replica (round robin)
+        unless the user wrote within the recent-write window or no replica is
+        healthy, in which case the primary read pool answers. Reads of a shard
+        always go to the shard itself.
+        """
+        if shard:
+            return self.session(shard=shard)
+        healthy = [name for name in self.replicas if self.replica_health[name]]
+        if not healthy or self._wrote_recently(email):
+            metrics.incr(Constants.METRIC_READS_PRIMARY)
+            return self.session(Constants.POOL_READ)
+
+        self._next_replica = (self._next_replica + 1) % len(healthy)
+        metrics.incr(Constants.METRIC_READS_REPLICA)
+        return self.session(healthy[self._next_replica])
+
+    # -------------------------------------------------------------------------
+    def _set_replica_health(self, name: str, healthy: bool):
+        if self.replica_health[name] != healthy:
+            logger.warning(f"Replica '{name}' is now {'healthy' if healthy else 'unavailable'}")
+        self.replica_health[name] = healthy
+        metrics.set_gauge(Constants.METRIC_REPLICA_HEALTHY.format(name), int(healthy))
+
+    def _replica_error_handler(self, name: str):
+        def handle_error(context):
+            # Lost or refused connections take the replica out of rotation
+            # until the next successful health check.
+            if context.is_disconnect or context.connection is None:
+                self._set_replica_health(name, False)
+        return handle_error
+
+    async def check_replicas(self):
+        """Probe every replica once and update its health."""
+        for name in self.replicas:
+            try:
+                async with self.engines[name].connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), self.health_check_interval)
+                self._set_replica_health(name, True)
+            except Exception as e:
+                logger.debug(f"Replica '{name}' health check failed: {e}")
+                self._set_replica_health(name, False)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_replicas()
+
+    async def start_health_checks(self):
+        if self.replicas and self._health_task is None:
+            await self.check_replicas()
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    # -------------------------------------------------------------------------
+    async def _validate_pool(self, name: str):
+        """
+        Check out the idle connections of a pool (at least MIN_IDLE of them,
+        never more than its size) and run SELECT 1 on each. Broken connections
+        are invalidated so the pool replaces them; the fresh ones keep the pool
+        warm for the next requests.
+        """
+        engine = self.engines[name]
+        count = min(max(engine.pool.checkedin(), self.min_idle), engine.pool.size())
+        if not count:
+            return
+
+        async def touch():
+            async with engine.connect() as conn:
+                try:
+                    await conn.execute(text("SELECT 1"))
+                except Exception as e:
+                    logger.warning(f"Discarding broken connection of pool '{name}': {e}")
+                    metrics.incr(Constants.METRIC_POOL_INVALIDATED.format(name))
+                    await conn.invalidate()
+
+        results = await asyncio.gather(*(touch() for _ in range(count)), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"Pool '{name}': {len(failures)} of {count} connections could not be opened: {failures[0]}")
+
+    async def validate_pools(self):
+        """Validate (and warm) every pool; replicas already out of rotation are skipped."""
+        for name in self.engines:
+            if self.replica_health.get(name, True):
+                await self._validate_pool(name)
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.validation_interval)
+            try:
+                await self.validate_pools()
+            except Exception as e:
+                logger.warning(f"Pool validation failed: {e}")
+
+    async def start_pool_maintenance(self):
+        """Pre-warm every pool to MIN_IDLE connections, then keep validating idle ones."""
+        if self._maintenance_task is None:
+            await self.validate_pools()
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    # -------------------------------------------------------------------------
+    def pool_status(self) -> dict:
+        """Current size, in-use and overflow per pool; also published as gauges."""
+        status = {}
+        for workload, engine in self.engines.items():
+            pool = engine.pool
+            status[workload] = {
+                Constants.POOL_SIZE_KEY: pool.size(),
+                Constants.POOL_IN_USE_KEY: pool.checkedout(),
+                Constants.POOL_OVERFLOW_KEY: max(pool.overflow(), 0),
+                Constants.POOL_IDLE_KEY: pool.checkedin(),
+            }
+            for key, value in status[workload].items():
+                metrics.set_gauge(Constants.METRIC_POOL_GAUGE.format(workload, key), value)
+        return status
+
+    # -------------------------------------------------------------------------
+    async def dispose(self):
+        """Stop the background checks and close every pooled connection."""
+        for task in (self._health_task, self._maintenance_task):
+            if task is not None:
+                task.cancel()
+        self._health_task = self._maintenance_task = None
+        for engine in self.engines.values():
+            await engine.dispose()
+
     # -------------------------------------------------------------------------
     async def set_up_table(self, table_name: str):
         """Reflect and cache table structure."""
@@ -65,15 +515,24 @@ class AsyncDBConnect:
             if table_name in self.models:
                 return self.models[table_name]
 
-            async with self.engine.begin() as conn:
-                def reflect(sync_conn):
-                    return Table(table_name, self.meta_data, autoload_with=sync_conn)
+            async with self._reflect_lock:
+                if table_name in self.models:
+                    return self.models[table_name]
 
-                table_obj = await conn.run_sync(reflect)
+                # Conversation tables only exist on the shards when sharding is on.
+                engine = self.engine
+                if self.shards and table_name in Constants.SHARDED_TABLES:
+                    engine = self.engines[self.shards[0]]
 
-            self.tables[table_name] = table_obj
-            model = type(table_name.capitalize(), (Base,), {"__table__": table_obj})
-            self.models[table_name] = model
+                async with engine.begin() as conn:
+                    def reflect(sync_conn):
+                        return Table(table_name, self.meta_data, autoload_with=sync_conn)
+
+                    table_obj = await conn.run_sync(reflect)
+
+                self.tables[table_name] = table_obj
+                model = type(table_name.capitalize(), (Base,), {"__table__": table_obj})
+                self.models[table_name] = model
 
             logger.info(f"Loaded table: {table_name}")
             return model
@@ -83,12 +542,15 @@ class AsyncDBConnect:
             raise DBException(f"Table reflection failed for {table_name}")
 
     # -------------------------------------------------------------------------
-    async def get_data(self, table_name: str, **filters):
-        """Retrieve data based on filters or return all."""
+    async def get_data(self, table_name: str, reader: str = None, **filters):
+        """
+        Retrieve data based on filters or return all.
+        Passing `reader` (the requester's email) lets the read go to a replica.
+        """
         try:
             model = await self.set_up_table(table_name)
 
-            async with self.AsyncSessionLocal() as session:
+            async with (self.read_session(reader) if reader else self.AsyncSessionLocal()) as session:
                 query = select(model)
                 if filters:
                     query = query.filter_by(**filters)
@@ -123,6 +585,11 @@ class AsyncDBConnect:
                     obj = model(**values)
                     session.add(obj)
 
+            if table_name == Constants.USER_TABLE and self.reference_shards:
+                await self._replicate_user(
+                    {name: getattr(obj, name) for name in Constants.REFERENCE_USER_COLUMNS}
+                )
+
             logger.info(f"Inserted into {table_name}: {values}")
 
         except Exception as e:
@@ -143,6 +610,12 @@ class AsyncDBConnect:
                     )
                     await session.execute(stmt)
 
+            reference_values = {
+                name: value for name, value in values.items() if name in Constants.REFERENCE_USER_COLUMNS
+            }
+            if table_name == Constants.USER_TABLE and self.reference_shards and reference_values:
+                await self._replicate_user(reference_values, filter_field, filter_value)
+
             logger.info(f"Updated {table_name} where {filter_field}={filter_value}: {values}")
 
         except Exception as e:
@@ -171,75 +644,173 @@ class AsyncDBConnect:
             raise DBException(f"Database deletion error: {e}")
         
     # -------------------------------------------------------------------------
-    async def get_all_user_data(self, exclude_email: str = None):
+    async def _replicate_user(self, values: dict, filter_field: str = None, filter_value=None):
+        """
+        Copy a user's reference columns (uid, email, names) to the shards, so
+        conversation queries can keep joining the user table locally. Without
+        a filter `values` is a new user's full projection and is inserted.
+        """
+        users = await self.set_up_table(Constants.USER_TABLE)
+
+        async def write(shard):
+            async def apply(session):
+                if filter_field is None:
+                    await session.execute(insert(users.__table__).values(**values))
+                else:
+                    await session.execute(
+                        update(users.__table__)
+                        .where(users.__table__.c[filter_field] == filter_value)
+                        .values(**values)
+                    )
+            try:
+                await self.run_transaction(apply, label="replicate_user", shard=shard)
+            except Exception as e:
+                # The primary row is committed; the next sync_reference_tables repairs the shard.
+                metrics.incr(Constants.METRIC_REFERENCE_SYNC_FAILURES)
+                logger.warning(f"User reference write to '{shard}' failed: {e}")
+
+        await asyncio.gather(*(write(shard) for shard in self.reference_shards))
+
+    async def sync_reference_tables(self):
+        """
+        Bring the user projection of every shard in line with the primary:
+        missing or stale rows are rewritten, rows of deleted users removed.
+        Runs at startup to repair writes lost by _replicate_user.
+        """
+        if not self.reference_shards:
+            return
+        users = await self.set_up_table(Constants.USER_TABLE)
+        columns = [users.__table__.c[name] for name in Constants.REFERENCE_USER_COLUMNS]
+        async with self.session(Constants.POOL_READ) as session:
+            primary = {row[0]: tuple(row) for row in (await session.execute(select(*columns))).all()}
+
+        async def sync(shard):
+            async with self.session(shard=shard) as session:
+                local = {row[0]: tuple(row) for row in (await session.execute(select(*columns))).all()}
+            stale = [uid for uid, row in primary.items() if local.get(uid) != row]
+            removed = [uid for uid in local if uid not in primary]
+            for start in range(0, len(stale) + len(removed), Constants.STREAM_BATCH_SIZE):
+                batch = (stale + removed)[start:start + Constants.STREAM_BATCH_SIZE]
+                rows = [dict(zip(Constants.REFERENCE_USER_COLUMNS, primary[uid])) for uid in batch if uid in primary]
+
+                async def rewrite(session):
+                    await session.execute(delete(users.__table__).where(users.__table__.c.uid.in_(batch)))
+                    if rows:
+                        await session.execute(insert(users.__table__), rows)
+
+                await self.run_transaction(rewrite, label="sync_reference_tables", shard=shard)
+            return len(stale) + len(removed)
+
+        changed = await asyncio.gather(*(sync(shard) for shard in self.reference_shards))
+        logger.info(
+            f"User reference tables synced on {len(self.reference_shards)} shards ({sum(changed)} rows rewritten)"
+        )
+
+    # -------------------------------------------------------------------------
+    async def allocate_sequence(self, session, conversation_id: int, count: int = 1):
+        """
+        Reserve `count` consecutive sequence numbers for a conversation and return the first.
+
+        Must run inside the caller's transaction: the UPDATE row lock on the
+        conversation serialises concurrent allocators, so numbers never repeat.
+        """
+        try:
+            conv = await self.set_up_table(Constants.CONVERSATION_TABLE)
+            await session.execute(
+                update(conv)
+                .where(conv.conversation_id == conversation_id)
+                .values(last_seq=conv.last_seq + count)
+            )
+            last_seq = await session.scalar(
+                select(conv.last_seq).where(conv.conversation_id == conversation_id)
+            )
+            return last_seq - count + 1
+
+        except Exception as e:
+            logger.error(f"DB Error in allocate_sequence ({conversation_id}): {e}")
+            raise DBException(f"Sequence allocation failed: {e}")
+
+    # -------------------------------------------------------------------------
+    async def get_all_user_data(self, exclude_email: str = None, exclude_uids=None, session: AsyncSession = None):
+        """
+        Every user except `exclude_email`; users whose uid is in `exclude_uids`
+        (e.g. the requester's contact-graph partners) are dropped in memory.
+        Reads through `session` when given (e.g. to stay on the replica an
+        ETag version was read from).
+        """
         try:
             model = await self.set_up_table(Constants.USER_TABLE)
 
-            async with self.AsyncSessionLocal() as session:
-                query = select(model.email, model.first_name, model.last_name)
+            async with (nullcontext(session) if session else self.read_session(exclude_email)) as session:
+                query = select(model.uid, model.email, model.first_name, model.last_name)
 
                 if exclude_email:
                     query = query.where(model.email != exclude_email)
 
                 rows = (await session.execute(query)).all()
 
+            exclude_uids = exclude_uids or ()
             return {
                 email: {"first_name": fname, "last_name": lname}
-                for email, fname, lname in rows
+                for uid, email, fname, lname in rows
+                if uid not in exclude_uids
             }
 
         except Exception as e:
             logger.error(f"DB Error in get_all_user_data: {e}")
             raise DBException(f"User fetch failed: {e}")
-        
+
     # -------------------------------------------------------------------------
-    async def get_user_data(self, current_user_email: str):
+    async def _directory_query(self, requester_email: str, exclude_uids=None):
+        """
+        Users visible to the requester, ordered by email for keyset paging,
+        minus `exclude_uids` (the requester's direct-chat partners, if any).
+        """
+        users = await self.set_up_table(Constants.USER_TABLE)
+        query = select(users.email, users.first_name, users.last_name).where(users.email != requester_email)
+        if exclude_uids:
+            query = query.where(users.uid.notin_(exclude_uids))
+        return query.order_by(users.email), users
+
+    async def get_directory_page(self, requester_email: str, exclude_uids=None,
+                                 after_email: str = None, limit: int = Constants.DEFAULT_PAGE_SIZE):
+        """
+        One page of the user directory after the `after_email` cursor.
+        Returns (users_dict, next_cursor); next_cursor is None on the last page.
+        """
         try:
-            users = await self.set_up_table(Constants.USER_TABLE)
-            conv = await self.set_up_table(Constants.CONVERSATION_TABLE)
-            conv_part = await self.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
-
-            async with self.AsyncSessionLocal() as session:
-
-                uid_row = await session.execute(
-                    select(users.uid).where(users.email == current_user_email)
-                )
-                current_uid = uid_row.scalar_one_or_none()
-
-                if not current_uid:
-                    logger.warning(f"User not found: {current_user_email}")
-                    return {}
-
-                direct_conv_ids = (
-                    await session.execute(
-                        select(conv.conversation_id)
-                        .join(conv_part, conv.conversation_id == conv_part.conversation_id)
-                        .where(conv.conversation_type == "private")
-                        .where(conv_part.uid == current_uid)
-                    )
-                ).scalars().all()
-
-                partners = set()
-                if direct_conv_ids:
-                    partners = set(
-                        (await session.execute(
-                            select(conv_part.uid)
-                            .where(conv_part.conversation_id.in_(direct_conv_ids))
-                            .where(conv_part.uid != current_uid)
-                        )).scalars().all()
-                    )
+            query, users = await self._directory_query(requester_email, exclude_uids)
+            if after_email:
+                query = query.where(users.email > after_email)
 
-                query = select(users.email, users.first_name, users.last_name).where(users.uid != current_uid)
-                if partners:
-                    query = query.where(users.uid.notin_(partners))
+            async with self.read_session(requester_email) as session:
+                rows = (await session.execute(query.limit(limit + 1))).all()
 
-                rows = (await session.execute(query)).all()
-
-                return {email: {"first_name": fn, "last_name": ln} for email, fn, ln in rows}
+            next_cursor = rows[limit - 1].email if len(rows) > limit else None
+            return {
+                email: {"first_name": fn, "last_name": ln} for email, fn, ln in rows[:limit]
+            }, next_cursor
 
         except Exception as e:
-            logger.error(f"DB Error in get_user_data: {e}")
-            raise DBException(f"User data retrieval failed: {e}")
+            logger.error(f"DB Error in get_directory_page: {e}")
+            raise DBException(f"User directory page failed: {e}")
+
+    async def stream_directory(self, requester_email: str, exclude_uids=None, after_email: str = None):
+        """
+        Async generator over the whole directory through a server-side cursor,
+        fetched in batches of STREAM_BATCH_SIZE rows, so memory stays flat.
+        """
+        query, users = await self._directory_query(requester_email, exclude_uids)
+        if after_email:
+            query = query.where(users.email > after_email)
+
+        async with self.read_session(requester_email) as session:
+            result = await session.stream(
+                query.execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+            )
+            async for partition in result.partitions():
+                for email, fn, ln in partition:
+                    yield {Constants.EMAIL: email, "first_name": fn, "last_name": ln}
+
 
 db_connect = AsyncDBConnect()
-    
\ No newline at end of file
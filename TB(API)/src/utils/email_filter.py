@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import math
+
+from sqlalchemy import func, select
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.cache_backend import cache_backends
+from src.utils.db_utils import db_connect
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
+class _BloomFilter:
+    """Fixed-size Bloom filter of strings, sized for `capacity` items."""
+
+    def __init__(self, capacity: int, false_positive_rate: float, max_bytes: int):
+        bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self.size = max(min(bits, max_bytes * 8), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def bytes(self) -> int:
+        return len(self._bits)
+
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class EmailFilter:
+    """
+    Bloom filter of every registered email, so signin and forgot-password can
+    tell an unknown email apart without a MySQL round trip.
+
+    A miss means "not a user as far as this worker knows"; a hit still goes to
+    the database. A miss is trusted when the app runs as a single worker
+    (SINGLE_WORKER), where every signup goes through this filter, or when a
+    Redis client is configured in [CACHE], which brings signups on other
+    workers to this filter right away. Otherwise a user who just signed up
+    elsewhere would be missing until the next catch-up scan, so misses are
+    reported as possible and checked in the database too. Signup always checks
+    the database.
+    The filter is built at startup by streaming the user table and sized for
+    max(EXPECTED_USERS, twice the current users) at FALSE_POSITIVE_RATE, but
+    never larger than MAX_BYTES. Signups add their email here and, when a Redis
+    client is configured in [CACHE], on every other worker through the cache
+    invalidation channel. Every REFRESH_MS a catch-up scan over the newest uids
+    picks up signups the channel did not deliver; once the filter holds more
+    users than it was sized for, it is rebuilt.
+    Until the first build completes, every email passes.
+    """
+
+    def __init__(self):
+        section = Constants.EMAIL_FILTER
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.EMAIL_FILTER_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.expected_users = int(cfg.get_value_config_or_default(
+            section, Constants.EMAIL_FILTER_EXPECTED_USERS, Constants.DEFAULT_EMAIL_FILTER_EXPECTED_USERS))
+        self.false_positive_rate = float(cfg.get_value_config_or_default(
+            section, Constants.EMAIL_FILTER_FALSE_POSITIVE_RATE, Constants.DEFAULT_EMAIL_FILTER_FALSE_POSITIVE_RATE))
+        self.max_bytes = int(cfg.get_value_config_or_default(
+            section, Constants.EMAIL_FILTER_MAX_BYTES, Constants.DEFAULT_EMAIL_FILTER_MAX_BYTES))
+        self.interval = int(cfg.get_value_config_or_default(
+            section, Constants.EMAIL_FILTER_REFRESH_MS, Constants.DEFAULT_EMAIL_FILTER_REFRESH_MS)) / 1000
+        self.single_worker = (
+            cfg.get_value_config_or_default(section, Constants.EMAIL_FILTER_SINGLE_WORKER, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.namespace = Constants.EMAIL_FILTER_NAMESPACE
+        self.ready = False
+
+        self._filter = None
+        self._pending = None
+        self._high_water = 0
+        self._task = None
+        self._resync = None
+        self._bus = cache_backends.bus if self.enabled else None
+        if self._bus is not None:
+            self._bus.register(self)
+
+    # -------------------------------------------------------------------------
+    def might_exist(self, email: str, endpoint: str) -> bool:
+        """False only when `email` is not registered and every signup reaches this filter."""
+        if not self.ready:
+            return True
+        if email.lower() in self._filter:
+            metrics.incr(Constants.METRIC_EMAIL_FILTER_PASSES.format(endpoint))
+            return True
+        if self._bus is None and not self.single_worker:
+            metrics.incr(Constants.METRIC_EMAIL_FILTER_UNVERIFIED.format(endpoint))
+            return True
+        metrics.incr(Constants.METRIC_EMAIL_FILTER_REJECTS.format(endpoint))
+        return False
+
+    async def add(self, email: str):
+        """Record a signup on every worker; call after the user row has committed."""
+        if not self.enabled:
+            return
+        email = email.lower()
+        self._add(email)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [email])
+
+    def _add(self, email: str):
+        if self._filter is not None:
+            self._filter.add(email)
+        if self._pending is not None:
+            self._pending.add(email)
+
+    # InvalidationBus listener: a signup on another worker invalidates the
+    # "not a user" answer for its email.
+    def evict(self, emails):
+        for email in emails:
+            self._add(email)
+
+    def clear(self):
+        """Signups published while the channel was down were missed: scan for them now."""
+        if self.ready:
+            self._resync = asyncio.create_task(self._refresh())
+
+    # -------------------------------------------------------------------------
+    async def build(self):
+        """Fill a new filter from the user table, streamed in batches, and swap it in."""
+        users = await db_connect.set_up_table(Constants.USER_TABLE)
+        # Signups during the scan may be missing from it; they are replayed before the swap.
+        self._pending = set()
+        try:
+            async with db_connect.session(Constants.POOL_READ) as session:
+                total = await session.scalar(select(func.count()).select_from(users))
+                bloom = _BloomFilter(
+                    max(self.expected_users, total * Constants.EMAIL_FILTER_GROWTH, 1),
+                    self.false_positive_rate,
+                    self.max_bytes,
+                )
+                high_water = 0
+                result = await session.stream(
+                    select(users.uid, users.email).execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+                )
+                async for uid, email in result:
+                    bloom.add(email.lower())
+                    high_water = max(high_water, uid)
+            for email in self._pending:
+                bloom.add(email)
+        finally:
+            self._pending = None
+        self._filter = bloom
+        self._high_water = max(self._high_water, high_water)
+        self.ready = True
+        logger.info(
+            f"Email filter built with {len(bloom)} users "
+            f"({bloom.bytes} bytes, {bloom.hashes} hashes, "
+            f"estimated false positive rate {bloom.false_positive_rate():.6f})"
+        )
+
+    async def _catch_up(self):
+        users = await db_connect.set_up_table(Constants.USER_TABLE)
+        async with db_connect.session(Constants.POOL_READ) as session:
+            rows = await session.execute(
+                select(users.uid, users.email)
+                .where(users.uid > self._high_water - Constants.EMAIL_FILTER_UID_OVERLAP)
+            )
+            for uid, email in rows:
+                self._add(email.lower())
+                self._high_water = max(self._high_water, uid)
+        if len(self._filter) > self._filter.capacity:
+            logger.info(f"Email filter holds more than its {self._filter.capacity} users, rebuilding")
+            await self.build()
+
+    async def _refresh(self):
+        try:
+            await self._catch_up()
+        except Exception as e:
+            logger.warning(f"Email filter refresh failed, will retry: {e}")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._refresh()
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await self.build()
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        if not self.ready:
+            return {Constants.EMAIL_FILTER_READY: False}
+        return {
+            Constants.EMAIL_FILTER_READY: True,
+            Constants.EMAIL_FILTER_USERS: len(self._filter),
+            Constants.EMAIL_FILTER_CAPACITY: self._filter.capacity,
+            Constants.CACHE_BYTES: self._filter.bytes,
+            Constants.EMAIL_FILTER_HASHES: self._filter.hashes,
+            Constants.EMAIL_FILTER_ESTIMATED_FPR: round(self._filter.false_positive_rate(), 6),
+        }
+
+
+email_filter = EmailFilter()
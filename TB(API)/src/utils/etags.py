@@ -0,0 +1,81 @@
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select, update
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.db_utils import db_connect
+from src.utils.metrics import metrics
+
+
+class ETags:
+    """
+    Conditional responses for /user/conversations, /user/get_messages and
+    /user/get_all_users.
+
+    A tag is a short digest of the version numbers the response depends on,
+    never of the payload: conversation `last_seq` (bumped by every message and
+    clear), the per-participant `receipt_version` (bumped by every delivery and
+    read of that participant) and the counters of the `data_versions` table, which
+    `bump` advances after writes that seq does not cover (profile updates,
+    signups, archiving, history imports). Versions are read before the data,
+    from the same database, so a response is never tagged newer than its
+    content. A request whose If-None-Match holds the current tag gets 304
+    before the endpoint runs its queries.
+    """
+
+    def __init__(self):
+        self.enabled = (
+            cfg.get_value_config_or_default(Constants.ETAG, Constants.ETAG_ENABLED, Constants.NO).lower()
+            == Constants.YES
+        )
+
+    async def bump(self, name: str):
+        """Advance a `data_versions` counter; call after the write it covers has committed."""
+        if not self.enabled:
+            return
+        versions_model = await db_connect.set_up_table(Constants.DATA_VERSIONS_TABLE)
+
+        async def advance(session):
+            await session.execute(
+                update(versions_model)
+                .where(versions_model.name == name)
+                .values(version=versions_model.version + 1)
+            )
+
+        await db_connect.run_transaction(advance, Constants.POOL_WRITE, label="bump_data_version")
+
+    async def versions(self, session=None) -> dict:
+        """Every `data_versions` counter, read through `session` (primary read pool by default)."""
+        versions_model = await db_connect.set_up_table(Constants.DATA_VERSIONS_TABLE)
+        query = select(versions_model.name, versions_model.version)
+        if session is None:
+            async with db_connect.session(Constants.POOL_READ) as session:
+                return dict((await session.execute(query)).all())
+        return dict((await session.execute(query)).all())
+
+    @staticmethod
+    def make(*parts) -> str:
+        """Strong entity tag of the version numbers and request parameters in `parts`."""
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=Constants.ETAG_DIGEST_SIZE).hexdigest()
+        return f'"{digest}"'
+
+    @staticmethod
+    def matches(request: Request, etag: str) -> bool:
+        header = request.headers.get(Constants.IF_NONE_MATCH_HEADER)
+        if not header:
+            return False
+        candidates = [candidate.strip() for candidate in header.split(",")]
+        return Constants.ETAG_ANY in candidates or any(
+            candidate.removeprefix(Constants.WEAK_ETAG_PREFIX) == etag for candidate in candidates
+        )
+
+    @staticmethod
+    def not_modified(endpoint: str, etag: str) -> Response:
+        metrics.incr(Constants.METRIC_ETAG_NOT_MODIFIED.format(endpoint))
+        return Response(status_code=Constants.NOT_MODIFIED, headers={Constants.ETAG_HEADER: etag})
+
+
+etags = ETags()
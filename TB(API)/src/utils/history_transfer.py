@@ -0,0 +1,332 @@
+"""
+NDJSON export and bulk import of conversation history.
+
+Export, run from the project root:
+    python -m src.utils.history_transfer export --conversation 42 --output history.ndjson
+    python -m src.utils.history_transfer export --email user@example.com > history.ndjson
+Writes one JSON object per line: every message of the conversation (or of
+every conversation the user belongs to), archived ones included, followed by
+their receipts. Rows are read through server-side cursors in batches, so
+memory stays flat whatever the size of the history.
+
+Import:
+    python -m src.utils.history_transfer import history.ndjson [--batch-size 1000]
+Inserts the records of an export with multi-row INSERTs, one transaction per
+batch; rows that already exist are skipped, so an interrupted import can be
+re-run. Users and conversations must already exist on the target database:
+a record referencing a missing one aborts the import.
+
+With [SHARDS] configured, export reads the shard of the conversation (or
+every shard for --email) and import writes each record to the shard of its
+conversation, which is also how a conversation is moved between shards.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import DateTime, insert, literal_column, select, tuple_, update
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import IntegrityError
+
+from src.constants.constants import Constants
+from src.utils.contact_graph import contact_graph
+from src.utils.db_utils import db_connect
+from src.utils.etags import etags
+from src.utils.logger import Logger
+from src.utils.lookup_cache import membership_cache
+from src.utils.message_archiver import message_archiver
+from src.utils.response_cache import response_cache
+from src.utils.time_utils import from_iso, to_iso
+
+logger = Logger.get_logger()
+
+
+def _record(kind: str, model, row, extra_columns=()) -> str:
+    record = {Constants.RECORD: kind}
+    for column in model.__table__.columns:
+        value = row[column.name]
+        record[column.name] = to_iso(value) if isinstance(column.type, DateTime) else value
+    for name in extra_columns:
+        record[name] = row[name]
+    return json.dumps(record) + "\n"
+
+
+async def _conversation_scope(conversation_id: int = None, email: str = None):
+    """Select of the exported conversation ids."""
+    conv_part_model = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+    users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+    if conversation_id is not None:
+        return select(conv_part_model.conversation_id).where(
+            conv_part_model.conversation_id == int(conversation_id)
+        )
+    return (
+        select(conv_part_model.conversation_id)
+        .join(users_model, users_model.uid == conv_part_model.uid)
+        .where(users_model.email == email.lower())
+    )
+
+
+async def export_history(conversation_id: int = None, email: str = None):
+    """Async generator of NDJSON lines for one conversation or for a user's conversations."""
+    if conversation_id is not None:
+        shards = [await db_connect.conversation_shard(conversation_id)]
+    else:
+        shards = db_connect.shards or [None]
+    for shard in shards:
+        async for chunk in _export_shard(shard, conversation_id, email):
+            yield chunk
+
+
+async def _export_shard(shard: str, conversation_id: int = None, email: str = None):
+    scope = await _conversation_scope(conversation_id, email)
+    receipts_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+    message_tables = [(Constants.MESSAGE_RECORD, Constants.MESSAGE_TABLE)]
+    if message_archiver.enabled:
+        message_tables.append((Constants.ARCHIVED_MESSAGE_RECORD, Constants.MESSAGES_ARCHIVE_TABLE))
+
+    # Long exports go to a replica when one is healthy.
+    async with db_connect.read_session(shard=shard) as session:
+        for kind, table_name in message_tables:
+            model = await db_connect.set_up_table(table_name)
+            result = await session.stream(
+                select(model.__table__)
+                .where(model.conversation_id.in_(scope))
+                .order_by(model.message_id)
+                .execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+            )
+            async for partition in result.mappings().partitions():
+                yield "".join(_record(kind, model, row) for row in partition)
+
+        msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+        # Receipts carry their conversation so the importer can route them to its shard.
+        result = await session.stream(
+            select(receipts_model.__table__, msg_model.conversation_id)
+            .join(msg_model, msg_model.message_id == receipts_model.message_id)
+            .where(msg_model.conversation_id.in_(scope))
+            .order_by(receipts_model.message_id)
+            .execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+        )
+        async for partition in result.mappings().partitions():
+            yield "".join(
+                _record(Constants.RECEIPT_RECORD, receipts_model, row, (Constants.CONVERSATION_ID,))
+                for row in partition
+            )
+
+
+class HistoryImporter:
+    """
+    Batched loader for exported records.
+
+    Records are buffered per kind and shard and inserted BATCH_SIZE at a
+    time; pending messages are always written before receipts so receipts
+    never precede their message. At the end every conversation's sequence
+    counter is moved past the highest imported seq so new messages do not
+    reuse numbers, the conversations are queued for the message search index
+    (imported messages keep ids below the ones it has already scanned), and
+    the cached data of the conversations and their participants is
+    invalidated. The invalidations reach the running workers only through a
+    shared [CACHE] backend or its Redis invalidation channel.
+    """
+
+    TABLES = {
+        Constants.MESSAGE_RECORD: Constants.MESSAGE_TABLE,
+        Constants.ARCHIVED_MESSAGE_RECORD: Constants.MESSAGES_ARCHIVE_TABLE,
+        Constants.RECEIPT_RECORD: Constants.RECEIPTS_TABLE,
+    }
+
+    def __init__(self, batch_size: int = Constants.DEFAULT_IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.counts = {kind: 0 for kind in self.TABLES}
+        self._pending = {}
+        self._max_seq = {}
+
+    async def _flush(self, kind: str, shard: str = None):
+        rows = self._pending.get((kind, shard))
+        if not rows:
+            return
+        model = await db_connect.set_up_table(self.TABLES[kind])
+        columns = {column.name: column for column in model.__table__.columns}
+        values = [
+            {
+                name: from_iso(value) if value is not None and isinstance(columns[name].type, DateTime) else value
+                for name, value in row.items()
+                if name in columns
+            }
+            for row in rows
+        ]
+
+        table = model.__table__
+        keys = list(table.primary_key.columns)
+
+        async def insert_batch(session):
+            # Rows already there (re-run of an interrupted import) are left out,
+            # so the affected row count is the number of rows imported.
+            existing = set(await session.execute(
+                select(*keys).where(tuple_(*keys).in_([tuple(row[key.name] for key in keys) for row in values]))
+            ))
+            new_rows = [row for row in values if tuple(row[key.name] for key in keys) not in existing]
+            if not new_rows:
+                return 0
+            if session.get_bind().dialect.name == Constants.MYSQL_DIALECT:
+                # A plain INSERT, so foreign key failures still raise; only a row
+                # inserted concurrently since the check above is skipped.
+                statement = mysql.insert(table).values(new_rows).on_duplicate_key_update(
+                    {keys[0].name: literal_column(keys[0].name)}
+                )
+            else:
+                statement = insert(table).values(new_rows)
+            return (await session.execute(statement)).rowcount
+
+        try:
+            inserted = await db_connect.run_transaction(
+                insert_batch, Constants.POOL_WRITE, label="import_history", shard=shard
+            )
+        except IntegrityError as e:
+            raise ValueError(
+                f"{kind} records reference a user, conversation or message missing on the target: {e.orig}"
+            ) from e
+        self.counts[kind] += inserted
+        self._pending[(kind, shard)] = []
+
+    async def add(self, record: dict):
+        kind = record.get(Constants.RECORD)
+        if kind not in self.TABLES:
+            raise ValueError(f"Unknown record type: {kind!r}")
+        conversation_id = record.get(Constants.CONVERSATION_ID)
+        if conversation_id is None and db_connect.shards:
+            raise ValueError("Record without conversation_id cannot be routed to a shard")
+        shard = await db_connect.conversation_shard(conversation_id) if db_connect.shards else None
+
+        if kind == Constants.RECEIPT_RECORD:
+            for message_kind in (Constants.MESSAGE_RECORD, Constants.ARCHIVED_MESSAGE_RECORD):
+                await self._flush(message_kind, shard)
+        else:
+            seq = record.get(Constants.SEQ) or 0
+            self._max_seq[conversation_id] = max(self._max_seq.get(conversation_id, 0), seq)
+
+        pending = self._pending.setdefault((kind, shard), [])
+        pending.append(record)
+        if len(pending) >= self.batch_size:
+            await self._flush(kind, shard)
+
+    async def finish(self) -> dict:
+        # TABLES lists the message kinds before receipts.
+        for kind in self.TABLES:
+            for pending_kind, shard in list(self._pending):
+                if pending_kind == kind:
+                    await self._flush(kind, shard)
+
+        conv_model = await db_connect.set_up_table(Constants.CONVERSATION_TABLE)
+        by_shard = {}
+        for conversation_id, seq in self._max_seq.items():
+            by_shard.setdefault(await db_connect.conversation_shard(conversation_id), {})[conversation_id] = seq
+
+        for shard, max_seq in by_shard.items():
+            async def advance_sequences(session, max_seq=max_seq):
+                for conversation_id, seq in max_seq.items():
+                    await session.execute(
+                        update(conv_model)
+                        .where(conv_model.conversation_id == conversation_id)
+                        .where(conv_model.last_seq < seq)
+                        .values(last_seq=seq)
+                    )
+
+            await db_connect.run_transaction(advance_sequences, Constants.POOL_WRITE, shard=shard)
+        # Imported messages below last_seq would not change the conversation ETags.
+        await etags.bump(Constants.HISTORY_VERSION)
+        await self._request_indexing()
+        await self._invalidate_caches(by_shard)
+        return self.counts
+
+    async def _request_indexing(self):
+        conversation_ids = sorted(c for c in self._max_seq if c is not None)
+        if not conversation_ids:
+            return
+        requests = await db_connect.set_up_table(Constants.MESSAGE_INDEX_REQUESTS_TABLE)
+
+        async def add_requests(session):
+            await session.execute(
+                insert(requests), [{Constants.CONVERSATION_ID: c} for c in conversation_ids]
+            )
+
+        await db_connect.run_transaction(add_requests, Constants.POOL_WRITE, label="import_history")
+
+    async def _invalidate_caches(self, by_shard: dict):
+        conv_part_model = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+        users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        participants = set()
+        for shard, max_seq in by_shard.items():
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                rows = await session.execute(
+                    select(conv_part_model.uid)
+                    .where(conv_part_model.conversation_id.in_(list(max_seq)))
+                    .distinct()
+                )
+                participants.update(uid for (uid,) in rows)
+        emails = []
+        if participants:
+            async with db_connect.session(Constants.POOL_READ) as session:
+                emails = (
+                    await session.scalars(select(users_model.email).where(users_model.uid.in_(participants)))
+                ).all()
+
+        conversation_ids = [c for max_seq in by_shard.values() for c in max_seq]
+        await response_cache.invalidate(
+            *(Constants.CACHE_TAG_CONVERSATION.format(c) for c in conversation_ids),
+            *(Constants.CACHE_TAG_USER.format(email.lower()) for email in emails),
+        )
+        await membership_cache.invalidate(*conversation_ids)
+        if participants:
+            await contact_graph.invalidate(*participants)
+
+
+async def import_history(lines, batch_size: int = Constants.DEFAULT_IMPORT_BATCH_SIZE) -> dict:
+    """Import NDJSON lines produced by `export_history`; returns the number of rows per record type."""
+    importer = HistoryImporter(batch_size)
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            await importer.add(json.loads(line))
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+    counts = await importer.finish()
+    logger.info(f"History import finished: {counts}")
+    return counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export or import conversation history as NDJSON.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export")
+    scope = export_parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--conversation", type=int)
+    scope.add_argument("--email")
+    export_parser.add_argument("--output", help="File to write (default: stdout)")
+
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=Constants.DEFAULT_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            output = open(args.output, "w", encoding=Constants.UTF_8_ENCODING) if args.output else sys.stdout
+            try:
+                async for chunk in export_history(args.conversation, args.email):
+                    output.write(chunk)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        else:
+            with open(args.path, encoding=Constants.UTF_8_ENCODING) as lines:
+                counts = await import_history(lines, args.batch_size)
+            print(json.dumps(counts), file=sys.stderr)
+    finally:
+        await db_connect.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
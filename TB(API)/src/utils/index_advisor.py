@@ -0,0 +1,161 @@
+"""
+Index verification and EXPLAIN-based advisor for the hot query shapes.
+
+Startup check (called from validate_db_connection):
+    Compares the reflected indexes with Constants.REQUIRED_INDEXES and warns
+    or fails depending on [INDEX_CHECK] MODE.
+
+CLI, run from the project root:
+    python -m src.utils.index_advisor
+Runs EXPLAIN on a representative query of each endpoint and reports the ones
+that fall back to a full table scan.
+"""
+import asyncio
+
+from sqlalchemy import inspect, text
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.exceptions.db_exception import DBException
+from src.utils.db_utils import db_connect
+from src.utils.logger import Logger
+
+logger = Logger.get_logger()
+
+# Representative statement per endpoint; literal values only need to be plausible.
+ENDPOINT_QUERIES = {
+    "get_direct_users.contact_graph": (
+        "SELECT theirs.uid FROM conversation_participants mine "
+        "JOIN conversation c ON c.conversation_id = mine.conversation_id "
+        "JOIN conversation_participants theirs ON theirs.conversation_id = mine.conversation_id "
+        "WHERE c.conversation_type = 'private' AND mine.uid = 1 AND theirs.uid <> mine.uid"
+    ),
+    "get_all_users": "SELECT email, first_name, last_name FROM `user` WHERE email > '' ORDER BY email LIMIT 100",
+    "signin": "SELECT * FROM `user` WHERE email = 'probe@example.com'",
+    "conversations": (
+        "SELECT c.conversation_id FROM conversation c "
+        "JOIN conversation_participants cp ON c.conversation_id = cp.conversation_id WHERE cp.uid = 1"
+    ),
+    "conversations.last_message": (
+        "SELECT body, sent_at FROM messages WHERE conversation_id = 1 "
+        "AND sent_at > '2000-01-01' ORDER BY sent_at DESC LIMIT 1"
+    ),
+    "conversations.unread": (
+        "SELECT r.message_id FROM receipts r JOIN messages m ON r.message_id = m.message_id "
+        "WHERE r.uid = 1 AND r.status <> 'read' AND m.conversation_id = 1"
+    ),
+    "conversations.cleared": "SELECT cleared_at FROM conversation_cleared WHERE uid = 1 AND conversation_id = 1",
+    "get_messages": (
+        "SELECT m.message_id FROM messages m JOIN `user` u ON u.uid = m.uid "
+        "WHERE m.conversation_id = 1 ORDER BY m.seq"
+    ),
+    "message_read": (
+        "SELECT r.message_id FROM receipts r JOIN messages m ON r.message_id = m.message_id "
+        "WHERE r.uid = 1 AND r.status <> 'read' AND m.conversation_id = 1"
+    ),
+    "send_message_ws.participants": "SELECT uid FROM conversation_participants WHERE conversation_id = 1",
+    "send_message_ws.devices": "SELECT device_id FROM devices WHERE uid IN (1, 2)",
+    "list_favorites": (
+        "SELECT c.conversation_id FROM conversation c "
+        "JOIN conversation_participants cp ON cp.conversation_id = c.conversation_id "
+        "WHERE cp.uid = 1 AND cp.is_favorite = 'yes'"
+    ),
+}
+
+
+def _covers(index_columns, required_columns) -> bool:
+    """An index serves the predicate when the required columns are its leftmost prefix."""
+    return list(index_columns[:len(required_columns)]) == list(required_columns)
+
+
+def _table_locations():
+    """(engine, tables) pairs: with [SHARDS] the conversation tables are checked on every shard."""
+    tables = {table for table, _ in Constants.REQUIRED_INDEXES}
+    if not db_connect.shards:
+        return [(db_connect.engine, tables)]
+    sharded = tables & set(Constants.SHARDED_TABLES)
+    return [(db_connect.engine, tables - sharded)] + [
+        (db_connect.engines[shard], sharded) for shard in db_connect.shards
+    ]
+
+
+async def find_missing_indexes():
+    """Return the (table, columns) entries of REQUIRED_INDEXES that no index covers."""
+    def collect(sync_conn, tables):
+        inspector = inspect(sync_conn)
+        existing = {}
+        for table in tables:
+            columns = [index["column_names"] for index in inspector.get_indexes(table)]
+            columns += [unique["column_names"] for unique in inspector.get_unique_constraints(table)]
+            columns.append(inspector.get_pk_constraint(table)["constrained_columns"])
+            existing[table] = columns
+        return existing
+
+    existing_per_database = []
+    for engine, tables in _table_locations():
+        async with engine.connect() as conn:
+            existing_per_database.append(await conn.run_sync(collect, tables))
+
+    # Sharded tables must carry the index on every shard.
+    return [
+        (table, columns)
+        for table, columns in Constants.REQUIRED_INDEXES
+        if any(
+            not any(_covers(index_columns, columns) for index_columns in existing[table])
+            for existing in existing_per_database
+            if table in existing
+        )
+    ]
+
+
+async def verify_required_indexes():
+    """Warn about (or, in fail mode, refuse to start without) the required indexes."""
+    mode = cfg.get_value_config_or_default(
+        Constants.INDEX_CHECK, Constants.INDEX_CHECK_MODE, Constants.INDEX_CHECK_WARN
+    ).lower()
+    if mode == Constants.INDEX_CHECK_OFF:
+        return
+
+    missing = await find_missing_indexes()
+    for table, columns in missing:
+        logger.warning(f"Missing index on {table}({', '.join(columns)})")
+
+    if missing and mode == Constants.INDEX_CHECK_FAIL:
+        raise DBException(f"Required indexes missing: {missing}")
+    if not missing:
+        logger.info("All required indexes are present.")
+
+
+async def explain_endpoints():
+    """EXPLAIN every representative query; returns {endpoint: [full-scan tables]}."""
+    report = {}
+    # The queries touch the conversation tables, which live on the shards when sharded.
+    engine = db_connect.engines[db_connect.shards[0]] if db_connect.shards else db_connect.engine
+    async with engine.connect() as conn:
+        for endpoint, sql in ENDPOINT_QUERIES.items():
+            rows = (await conn.execute(text(f"EXPLAIN {sql}"))).mappings().all()
+            report[endpoint] = [
+                row["table"] for row in rows if row["type"] == Constants.EXPLAIN_FULL_SCAN
+            ]
+    return report
+
+
+async def main():
+    missing = await find_missing_indexes()
+    print("Required indexes:")
+    for table, columns in Constants.REQUIRED_INDEXES:
+        state = "MISSING" if (table, columns) in missing else "ok"
+        print(f"  {state:8} {table}({', '.join(columns)})")
+
+    print("\nEXPLAIN per endpoint:")
+    for endpoint, full_scans in (await explain_endpoints()).items():
+        if full_scans:
+            print(f"  FULL SCAN {endpoint}: {', '.join(full_scans)}")
+        else:
+            print(f"  ok        {endpoint}")
+
+    await db_connect.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
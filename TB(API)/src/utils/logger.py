@@ -66,3 +66,27 @@ class Logger(object):
             logger.error(error)
             raise Exception()
         return logger
+
+    @staticmethod
+    def get_slow_query_logger():
+        """
+            This method returns a logger object that writes only to the slow query
+            log file, next to the application log of the day
+        Return:
+            logger: It returns logger object.
+        """
+        logger = logging.getLogger(c.SLOW_QUERY_LOGGER_NAME)
+        if not logger.handlers:
+            current_timestamp = datetime.datetime.now()
+            root_path = os.path.join(c.ROOT_DIR_PATH, c.LOGGER_ROOT_FOLDER_NAME)
+            day_folder_path = os.path.dirname(Logger().__check_log_exists(root_path, current_timestamp))
+            slow_query_file_path = os.path.join(
+                day_folder_path, c.SLOW_QUERY_LOG_FILE_NAME.format(current_timestamp.date())
+            )
+            handler = RotatingFileHandler(filename=slow_query_file_path, maxBytes=c.MAX_BYTES,
+                                          backupCount=c.BACKUP_COUNT, encoding="utf-8")
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+        return logger
@@ -0,0 +1,88 @@
+import json
+
+from sqlalchemy import select
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.cache_backend import cache_backends
+from src.utils.db_utils import db_connect
+from src.utils.metrics import metrics
+
+
+def _lookup_backend(namespace: str):
+    max_bytes = int(cfg.get_value_config_or_default(
+        Constants.CACHE, Constants.CACHE_LOOKUP_MAX_BYTES, Constants.DEFAULT_CACHE_LOOKUP_MAX_BYTES))
+    ttl = int(cfg.get_value_config_or_default(
+        Constants.CACHE, Constants.CACHE_LOOKUP_TTL_MS, Constants.DEFAULT_CACHE_LOOKUP_TTL_MS)) / 1000
+    return cache_backends.create(namespace, max_bytes, ttl)
+
+
+class IdentityCache:
+    """
+    email -> uid of registered users, read on every message send and receipt
+    update. A user's uid never changes, so entries only expire; unknown
+    emails are not cached.
+    """
+
+    def __init__(self):
+        self.backend = _lookup_backend(Constants.IDENTITY_CACHE_NAMESPACE)
+
+    async def uid(self, session, email: str):
+        """uid of `email`, read through `session` on a miss; None when no such user."""
+        cached = await self.backend.get(email)
+        if cached is not None:
+            metrics.incr(Constants.METRIC_CACHE_HITS.format(Constants.IDENTITY_CACHE_NAMESPACE))
+            return int(cached)
+        metrics.incr(Constants.METRIC_CACHE_MISSES.format(Constants.IDENTITY_CACHE_NAMESPACE))
+        token = await self.backend.token()
+        users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        uid = await session.scalar(select(users_model.uid).where(users_model.email == email))
+        if uid:
+            await self.backend.put(email, str(uid).encode(), (), token)
+        return uid
+
+
+class MembershipCache:
+    """
+    conversation_id -> (uid, email) of every participant, read on every
+    message send and history page. start_conversation invalidates the
+    conversations it creates; conversations without participants are not
+    cached.
+    """
+
+    def __init__(self):
+        self.backend = _lookup_backend(Constants.MEMBERSHIP_CACHE_NAMESPACE)
+
+    async def participants(self, session, conversation_id: int) -> list:
+        """(uid, email) pairs of the participants, read through `session` (on the conversation's shard) on a miss."""
+        key = str(int(conversation_id))
+        cached = await self.backend.get(key)
+        if cached is not None:
+            metrics.incr(Constants.METRIC_CACHE_HITS.format(Constants.MEMBERSHIP_CACHE_NAMESPACE))
+            return [tuple(row) for row in json.loads(cached)]
+        metrics.incr(Constants.METRIC_CACHE_MISSES.format(Constants.MEMBERSHIP_CACHE_NAMESPACE))
+        token = await self.backend.token()
+        users_model = await db_connect.set_up_table(Constants.USER_TABLE)
+        conv_part_model = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+        rows = [
+            (uid, email)
+            for uid, email in await session.execute(
+                select(conv_part_model.uid, users_model.email)
+                .join(users_model, users_model.uid == conv_part_model.uid)
+                .where(conv_part_model.conversation_id == conversation_id)
+            )
+        ]
+        if rows:
+            await self.backend.put(
+                key, json.dumps(rows).encode(), [Constants.CACHE_TAG_CONVERSATION.format(key)], token
+            )
+        return rows
+
+    async def invalidate(self, *conversation_ids):
+        await self.backend.invalidate(
+            *(Constants.CACHE_TAG_CONVERSATION.format(int(cid)) for cid in conversation_ids)
+        )
+
+
+identity_cache = IdentityCache()
+membership_cache = MembershipCache()
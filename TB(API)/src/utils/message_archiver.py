@@ -0,0 +1,172 @@
+import asyncio
+import datetime
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.db_utils import db_connect
+from src.utils.etags import etags
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+from src.utils.time_utils import utc_now
+
+logger = Logger.get_logger()
+
+
+class MessageArchiver:
+    """
+    Background retention job for the `messages` table.
+
+    Every INTERVAL_MS it moves cold messages into `messages_archive` in
+    batches of BATCH_SIZE: messages older than RETENTION_DAYS, and messages
+    every participant of their conversation has cleared. Each batch is copied,
+    its receipts are purged and the rows are deleted in one transaction.
+    get_messages reads the archive when a page reaches past the live rows.
+
+    The batch is locked with two range reads, so FOR UPDATE SKIP LOCKED only
+    touches the rows it returns: the age cutoff on messages(sent_at), and per
+    fully cleared conversation the messages up to its earliest clear on
+    messages(conversation_id, sent_at). The fully cleared conversations are
+    found once per run, without locks, from conversation_cleared and
+    conversation_participants.
+    """
+
+    def __init__(self):
+        section = Constants.ARCHIVE
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.ARCHIVE_ENABLED, Constants.NO).lower()
+            == Constants.YES
+        )
+        self.retention_days = int(cfg.get_value_config_or_default(
+            section, Constants.ARCHIVE_RETENTION_DAYS, Constants.DEFAULT_ARCHIVE_RETENTION_DAYS))
+        self.interval = int(cfg.get_value_config_or_default(
+            section, Constants.ARCHIVE_INTERVAL_MS, Constants.DEFAULT_ARCHIVE_INTERVAL_MS)) / 1000
+        self.batch_size = int(cfg.get_value_config_or_default(
+            section, Constants.ARCHIVE_BATCH_SIZE, Constants.DEFAULT_ARCHIVE_BATCH_SIZE))
+        self._task = None
+
+    async def _fully_cleared(self, shard: str = None) -> list:
+        """(conversation_id, earliest cleared_at) of the conversations every participant has cleared."""
+        conv_part_model = await db_connect.set_up_table(Constants.CONVERSATION_PARTICIPANTS_TABLE)
+        cleared_model = await db_connect.set_up_table(Constants.CONVERSATION_CLEARED_TABLE)
+        # A participant still sees the messages sent after their clear (see
+        # get_messages), so only those up to the earliest clear are hidden from all.
+        query = (
+            select(conv_part_model.conversation_id, func.min(cleared_model.cleared_at))
+            .outerjoin(
+                cleared_model,
+                and_(
+                    cleared_model.uid == conv_part_model.uid,
+                    cleared_model.conversation_id == conv_part_model.conversation_id,
+                ),
+            )
+            .where(conv_part_model.conversation_id.in_(select(cleared_model.conversation_id)))
+            .group_by(conv_part_model.conversation_id)
+            .having(func.count(cleared_model.cleared_at) == func.count())
+        )
+        async with db_connect.session(Constants.POOL_WRITE, shard) as session:
+            return (await session.execute(query)).all()
+
+    async def archive_batch(self, shard: str = None, cleared: list = None) -> int:
+        """
+        Move one batch of cold messages of `shard` to the archive; returns how
+        many were moved. `cleared` is the result of _fully_cleared, read here when not given.
+        """
+        msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+        archive_model = await db_connect.set_up_table(Constants.MESSAGES_ARCHIVE_TABLE)
+        receipts_model = await db_connect.set_up_table(Constants.RECEIPTS_TABLE)
+        if cleared is None:
+            cleared = await self._fully_cleared(shard)
+        cutoff = utc_now() - datetime.timedelta(days=self.retention_days)
+        columns = [column.name for column in msg_model.__table__.columns]
+
+        async def move_batch(session):
+            message_ids = (
+                await session.scalars(
+                    select(msg_model.message_id)
+                    .where(msg_model.sent_at < cutoff)
+                    .order_by(msg_model.sent_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            for start in range(0, len(cleared), Constants.ARCHIVE_CLEARED_CHUNK):
+                if len(message_ids) >= self.batch_size:
+                    break
+                chunk = cleared[start:start + Constants.ARCHIVE_CLEARED_CHUNK]
+                message_ids += (
+                    await session.scalars(
+                        select(msg_model.message_id)
+                        .where(
+                            or_(*(
+                                and_(msg_model.conversation_id == conversation_id, msg_model.sent_at <= cleared_at)
+                                for conversation_id, cleared_at in chunk
+                            ))
+                        )
+                        .where(msg_model.sent_at >= cutoff)
+                        .limit(self.batch_size - len(message_ids))
+                        .with_for_update(skip_locked=True)
+                    )
+                ).all()
+            if not message_ids:
+                return 0
+            await session.execute(
+                insert(archive_model).from_select(
+                    columns,
+                    select(*(getattr(msg_model, name) for name in columns))
+                    .where(msg_model.message_id.in_(message_ids)),
+                )
+            )
+            await session.execute(
+                delete(receipts_model).where(receipts_model.message_id.in_(message_ids))
+            )
+            await session.execute(
+                delete(msg_model).where(msg_model.message_id.in_(message_ids))
+            )
+            return len(message_ids)
+
+        moved = await db_connect.run_transaction(move_batch, Constants.POOL_WRITE, shard=shard)
+        metrics.incr(Constants.METRIC_ARCHIVED_MESSAGES, moved)
+        return moved
+
+    async def run_once(self) -> int:
+        """Archive batches until no cold message is left, one shard after the other."""
+        total = 0
+        for shard in db_connect.shards or [None]:
+            cleared = await self._fully_cleared(shard)
+            while True:
+                moved = await self.archive_batch(shard, cleared)
+                total += moved
+                if moved < self.batch_size:
+                    break
+                # Let the request handlers in between batches.
+                await asyncio.sleep(0)
+        if total:
+            await etags.bump(Constants.HISTORY_VERSION)
+            logger.info(f"Archived {total} messages")
+        return total
+
+    async def _archive_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                metrics.incr(Constants.METRIC_ARCHIVE_FAILURES)
+                logger.warning(f"Message archiving failed, will retry: {e}")
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._archive_loop())
+            logger.info(
+                f"Message archiver started (retention {self.retention_days} days, every {self.interval:.0f} s)"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+message_archiver = MessageArchiver()
@@ -0,0 +1,507 @@
+import asyncio
+import glob
+import json
+import os
+import re
+import struct
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, a single worker uses the first slot
+    fcntl = None
+
+from sqlalchemy import select
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.db_utils import db_connect
+from src.utils.logger import Logger
+from src.utils.message_archiver import message_archiver
+from src.utils.message_journal import lock_folder
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_ID_BYTES = 8
+# Conversation table entry: conversation_id, byte offset of its ids, id count.
+_ENTRY = struct.Struct("<QQI")
+
+
+def tokenize(text: str) -> set:
+    """Distinct lower-cased word tokens of a message body or search query."""
+    return {
+        token
+        for token in _TOKEN_PATTERN.findall((text or "").lower())
+        if len(token) >= Constants.MIN_TOKEN_LENGTH
+    }
+
+
+def _merge_watermarks(*watermarks) -> dict:
+    merged = {}
+    for marks in watermarks:
+        for shard, message_id in marks.items():
+            merged[shard] = max(merged.get(shard, 0), message_id)
+    return merged
+
+
+class Segment:
+    """
+    One immutable segment file. For every term, the message ids of each
+    conversation it occurs in (little-endian uint64s), followed by the term's
+    conversation table: one (conversation_id, byte offset, id count) entry per
+    conversation, sorted by conversation_id. Then a dictionary line (term ->
+    offset and length of its table, the postings count and the highest message
+    id covered on each shard) and the byte offset of the dictionary line.
+
+    Only the dictionary is kept in memory. A search reads the table entries of
+    the requester's conversations (binary searching large tables) and their
+    ids, never the postings of other conversations.
+    """
+
+    def __init__(self, index: int, path: str, terms: dict, max_message_ids: dict, size: int):
+        self.index = index
+        self.path = path
+        self.terms = terms
+        self.max_message_ids = max_message_ids
+        self.size = size
+
+    @classmethod
+    def load(cls, index: int, path: str):
+        """Read a segment's dictionary; ValueError for a file of another format version."""
+        with open(path, "rb") as segment_file:
+            segment_file.seek(-Constants.SEGMENT_FOOTER_BYTES, os.SEEK_END)
+            segment_file.seek(int(segment_file.read()))
+            data = json.loads(segment_file.readline())
+        if data.get(Constants.SEGMENT_VERSION) != Constants.SEGMENT_FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {data.get(Constants.SEGMENT_VERSION)}")
+        return cls(
+            index,
+            path,
+            data[Constants.SEGMENT_TERMS],
+            data[Constants.SEGMENT_MAX_MESSAGE_ID],
+            data[Constants.SEGMENT_SIZE],
+        )
+
+    @classmethod
+    def write(cls, index: int, path: str, postings, max_message_ids: dict):
+        """
+        Write `postings`, an iterable of (term, {conversation_id: sorted ids}),
+        to a temporary file and rename it, so a crash never leaves half a segment.
+        """
+        terms, size = {}, 0
+        tmp_path = f"{path}{Constants.TMP_SUFFIX}"
+        with open(tmp_path, "wb") as segment_file:
+            offset = 0
+            for term, by_conv in postings:
+                table = []
+                for conv_id in sorted(by_conv):
+                    ids = by_conv[conv_id]
+                    segment_file.write(struct.pack(f"<{len(ids)}Q", *ids))
+                    table.append(_ENTRY.pack(conv_id, offset, len(ids)))
+                    offset += len(ids) * _ID_BYTES
+                    size += len(ids)
+                segment_file.write(b"".join(table))
+                terms[term] = [offset, len(table)]
+                offset += len(table) * _ENTRY.size
+            dictionary = {
+                Constants.SEGMENT_VERSION: Constants.SEGMENT_FORMAT_VERSION,
+                Constants.SEGMENT_MAX_MESSAGE_ID: max_message_ids,
+                Constants.SEGMENT_SIZE: size,
+                Constants.SEGMENT_TERMS: terms,
+            }
+            segment_file.write(json.dumps(dictionary, separators=(",", ":")).encode() + b"\n")
+            segment_file.write(Constants.SEGMENT_FOOTER.format(offset).encode())
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        os.replace(tmp_path, path)
+        return cls(index, path, terms, max_message_ids, size)
+
+    @staticmethod
+    def _table_entries(segment_file, table_offset: int, count: int, conversation_ids) -> list:
+        """Entries of a term's conversation table for `conversation_ids` (all of them when None)."""
+        if conversation_ids is None or count * _ENTRY.size <= Constants.SEGMENT_TABLE_READ_BYTES:
+            segment_file.seek(table_offset)
+            return [
+                entry
+                for entry in _ENTRY.iter_unpack(segment_file.read(count * _ENTRY.size))
+                if conversation_ids is None or entry[0] in conversation_ids
+            ]
+        entries = []
+        for conv_id in sorted(conversation_ids):
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                segment_file.seek(table_offset + middle * _ENTRY.size)
+                entry = _ENTRY.unpack(segment_file.read(_ENTRY.size))
+                if entry[0] < conv_id:
+                    low = middle + 1
+                elif entry[0] > conv_id:
+                    high = middle
+                else:
+                    entries.append(entry)
+                    break
+        return entries
+
+    def postings(self, term: str, conversation_ids, segment_file) -> dict:
+        """
+        conversation_id -> message ids of `term` in `conversation_ids` (every
+        conversation when None), read from the open `segment_file`. Blocking:
+        call off the event loop.
+        """
+        location = self.terms.get(term)
+        if location is None:
+            return {}
+        postings = {}
+        for conv_id, offset, count in self._table_entries(segment_file, *location, conversation_ids):
+            segment_file.seek(offset)
+            postings[conv_id] = struct.unpack(f"<{count}Q", segment_file.read(count * _ID_BYTES))
+        return postings
+
+    @classmethod
+    def merge(cls, index: int, path: str, segments: list):
+        """Write the union of `segments` as a new segment, one term at a time."""
+        files = [open(segment.path, "rb") for segment in segments]
+        try:
+            def merged_postings():
+                for term in sorted(set().union(*(segment.terms for segment in segments))):
+                    merged = {}
+                    for segment, segment_file in zip(segments, files):
+                        for conv_id, ids in segment.postings(term, None, segment_file).items():
+                            merged.setdefault(conv_id, set()).update(ids)
+                    yield term, {conv_id: sorted(ids) for conv_id, ids in merged.items()}
+
+            return cls.write(
+                index, path, merged_postings(), _merge_watermarks(*(s.max_message_ids for s in segments))
+            )
+        finally:
+            for segment_file in files:
+                segment_file.close()
+
+
+def _read_matches(segments: list, files: list, terms, conversation_ids) -> dict:
+    """term -> ids in `conversation_ids` found in `segments`; closes `files`."""
+    matches = {term: set() for term in terms}
+    try:
+        for segment, segment_file in zip(segments, files):
+            for term in terms:
+                for ids in segment.postings(term, conversation_ids, segment_file).values():
+                    matches[term].update(ids)
+    finally:
+        for segment_file in files:
+            segment_file.close()
+    return matches
+
+
+class MessageIndex:
+    """
+    Incrementally maintained inverted index over message bodies.
+
+    Messages are added to an in-memory buffer of postings keyed by term and
+    conversation. The buffer is written out as an immutable segment file once
+    it holds FLUSH_DOCS messages or every FLUSH_INTERVAL_MS; a background task
+    merges the smallest segments whenever there are more than MERGE_FACTOR.
+
+    Every worker process keeps its own index in DIRECTORY/slot-<n>, the first
+    slot whose lock it can take, so workers never write or merge each other's
+    segments and a restarted worker picks up the index of the slot it gets.
+    Each worker indexes every message by reading MySQL (every shard, each with
+    its own watermark, when [SHARDS] is set) for ids above the last indexed
+    one: at startup in the background, which builds the index from scratch
+    on first run, and then every FLUSH_INTERVAL_MS. The scan rereads the last
+    INDEX_MESSAGE_ID_OVERLAP ids so rows committed out of id order are not
+    skipped. send_message_ws (and journal replay) also add their messages
+    directly, so they are searchable on the sending worker at once.
+    History imports keep the original message ids, below the scanned ones:
+    the importer records the conversations it wrote in the
+    message_index_requests table, and every worker indexes all messages of
+    each request it has not applied yet (the highest applied request id is
+    kept with the watermarks).
+    Until the first scan completes, `ready` is False and searches fall back
+    to MySQL.
+    """
+
+    def __init__(self):
+        section = Constants.MESSAGE_INDEX
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.MESSAGE_INDEX_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.root = os.path.join(
+            Constants.ROOT_DIR_PATH,
+            cfg.get_value_config_or_default(
+                section, Constants.MESSAGE_INDEX_DIRECTORY, Constants.DEFAULT_MESSAGE_INDEX_DIRECTORY),
+        )
+        # Set by _claim, in the worker process itself.
+        self.directory = None
+        self.flush_docs = int(cfg.get_value_config_or_default(
+            section, Constants.MESSAGE_INDEX_FLUSH_DOCS, Constants.DEFAULT_MESSAGE_INDEX_FLUSH_DOCS))
+        self.flush_interval = int(cfg.get_value_config_or_default(
+            section, Constants.MESSAGE_INDEX_FLUSH_INTERVAL_MS, Constants.DEFAULT_MESSAGE_INDEX_FLUSH_INTERVAL_MS)) / 1000
+        self.merge_factor = int(cfg.get_value_config_or_default(
+            section, Constants.MESSAGE_INDEX_MERGE_FACTOR, Constants.DEFAULT_MESSAGE_INDEX_MERGE_FACTOR))
+        self.ready = False
+
+        self._segments = []
+        self._buffer = {}
+        self._flushing = {}
+        self._buffered_docs = 0
+        self._buffer_watermarks = {}
+        self._watermarks = {}
+        # Per shard, the ids above (watermark - overlap) already indexed, so
+        # the overlap of the next scan is not indexed again.
+        self._recent = {}
+        self._next_segment = 0
+        self._task = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        self._claim_handle = None
+
+    # -------------------------------------------------------------------------
+    def _claim(self):
+        """Lock the first free slot folder and make it this worker's index."""
+        slot = 0
+        while self._claim_handle is None:
+            folder = os.path.join(self.root, Constants.INDEX_SLOT_DIR.format(slot))
+            os.makedirs(folder, exist_ok=True)
+            self._claim_handle = lock_folder(folder, blocking=fcntl is None)
+            if self._claim_handle is not None:
+                self.directory = folder
+            slot += 1
+
+    def _release(self):
+        if self._claim_handle is not None:
+            self._claim_handle.close()
+            self._claim_handle = None
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, Constants.INDEX_SEGMENT_NAME.format(index))
+
+    def _load_segments(self):
+        for path in glob.glob(os.path.join(self.directory, f"*{Constants.TMP_SUFFIX}")):
+            os.remove(path)
+        paths = sorted(glob.glob(os.path.join(self.directory, Constants.INDEX_SEGMENT_GLOB)))
+        segments = []
+        try:
+            for path in paths:
+                index = int(os.path.basename(path).split("-")[1].split(".")[0])
+                segments.append(Segment.load(index, path))
+        except ValueError as e:
+            # Written by an older version: the watermarks of the remaining
+            # segments would skip its messages, so the index is rebuilt.
+            logger.warning(f"Message index in {self.directory} is rebuilt: {e}")
+            for path in paths:
+                os.remove(path)
+            return []
+        return segments
+
+    def add(self, conversation_id: int, message_id: int, body: str, shard: str = None):
+        """
+        Index a message stored on `shard` (None when unsharded). Adding the
+        same message twice is harmless.
+        """
+        if not self.enabled:
+            return
+        self._recent.setdefault(shard or Constants.POOL_DEFAULT, set()).add(message_id)
+        self._add(conversation_id, message_id, body)
+
+    def _add(self, conversation_id: int, message_id: int, body: str):
+        for term in tokenize(body):
+            self._buffer.setdefault(term, {}).setdefault(conversation_id, set()).add(message_id)
+        self._buffered_docs += 1
+        metrics.incr(Constants.METRIC_MESSAGE_INDEX_ADDS)
+        if self._buffered_docs >= self.flush_docs and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """Write the buffer out as a new segment file."""
+        async with self._lock:
+            if not self._buffered_docs:
+                return
+            # Messages added during the write go to a fresh buffer; searches keep
+            # reading the old one until its segment is in place.
+            buffer, docs, watermarks = self._buffer, self._buffered_docs, self._buffer_watermarks
+            self._flushing = buffer
+            self._buffer, self._buffered_docs, self._buffer_watermarks = {}, 0, {}
+            postings = (
+                (term, {conv_id: sorted(ids) for conv_id, ids in buffer[term].items()})
+                for term in sorted(buffer)
+            )
+            try:
+                segment = await asyncio.get_running_loop().run_in_executor(
+                    None, Segment.write, self._next_segment, self._segment_path(self._next_segment),
+                    postings, watermarks,
+                )
+            except Exception:
+                for term, by_conv in buffer.items():
+                    for conv_id, ids in by_conv.items():
+                        self._buffer.setdefault(term, {}).setdefault(conv_id, set()).update(ids)
+                self._buffered_docs += docs
+                self._buffer_watermarks = _merge_watermarks(self._buffer_watermarks, watermarks)
+                raise
+            finally:
+                self._flushing = {}
+            self._next_segment += 1
+            self._segments.append(segment)
+            self._watermarks = _merge_watermarks(self._watermarks, watermarks)
+            metrics.incr(Constants.METRIC_MESSAGE_INDEX_FLUSHES)
+            logger.debug(f"Message index segment {segment.index} written ({segment.size} postings)")
+
+    async def merge(self):
+        """Merge the MERGE_FACTOR smallest segments once there are more than MERGE_FACTOR."""
+        async with self._lock:
+            if len(self._segments) <= self.merge_factor:
+                return
+            inputs = sorted(self._segments, key=lambda s: s.size)[:self.merge_factor]
+            merged = await asyncio.get_running_loop().run_in_executor(
+                None, Segment.merge, self._next_segment, self._segment_path(self._next_segment), inputs
+            )
+            self._next_segment += 1
+            self._segments = [s for s in self._segments if s not in inputs] + [merged]
+            # A crash before the removals only leaves duplicate postings behind.
+            # Searches still reading an input hold it open.
+            for segment in inputs:
+                os.remove(segment.path)
+            metrics.incr(Constants.METRIC_MESSAGE_INDEX_MERGES)
+            logger.info(f"Message index merged {len(inputs)} segments into {merged.index}")
+
+    async def _catch_up(self):
+        """Index the messages stored after the last indexed id of every shard."""
+        msg_model = await db_connect.set_up_table(Constants.MESSAGE_TABLE)
+        for shard in db_connect.shards or [None]:
+            key = shard or Constants.POOL_DEFAULT
+            watermark = _merge_watermarks(self._watermarks, self._buffer_watermarks).get(key, 0)
+            recent = self._recent.setdefault(key, set())
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                result = await session.stream(
+                    select(msg_model.message_id, msg_model.conversation_id, msg_model.body)
+                    .where(msg_model.message_id > watermark - Constants.INDEX_MESSAGE_ID_OVERLAP)
+                    .order_by(msg_model.message_id)
+                    .execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+                )
+                async for message_id, conversation_id, body in result:
+                    if message_id not in recent:
+                        recent.add(message_id)
+                        self._add(conversation_id, message_id, body)
+                    # Rows arrive in id order, so everything up to here is in the buffer.
+                    self._buffer_watermarks[key] = max(self._buffer_watermarks.get(key, 0), message_id)
+                    watermark = max(watermark, message_id)
+                    if len(recent) > 2 * Constants.INDEX_MESSAGE_ID_OVERLAP:
+                        floor = watermark - Constants.INDEX_MESSAGE_ID_OVERLAP
+                        recent = self._recent[key] = {i for i in recent if i > floor}
+                    if self._buffered_docs >= self.flush_docs:
+                        await self.flush()
+        await self.flush()
+
+    async def _apply_requests(self):
+        """Index every message of the conversations imported since the last applied request."""
+        requests = await db_connect.set_up_table(Constants.MESSAGE_INDEX_REQUESTS_TABLE)
+        key = Constants.INDEX_REQUESTS_WATERMARK
+        applied = _merge_watermarks(self._watermarks, self._buffer_watermarks).get(key, 0)
+        async with db_connect.session(Constants.POOL_READ) as session:
+            pending = (
+                await session.execute(
+                    select(requests.request_id, requests.conversation_id)
+                    .where(requests.request_id > applied)
+                    .order_by(requests.request_id)
+                )
+            ).all()
+        if not pending:
+            return
+        models = [await db_connect.set_up_table(Constants.MESSAGE_TABLE)]
+        if message_archiver.enabled:
+            models.append(await db_connect.set_up_table(Constants.MESSAGES_ARCHIVE_TABLE))
+        for request_id, conversation_id in pending:
+            shard = await db_connect.conversation_shard(conversation_id)
+            async with db_connect.session(Constants.POOL_READ, shard) as session:
+                for model in models:
+                    result = await session.stream(
+                        select(model.message_id, model.body)
+                        .where(model.conversation_id == conversation_id)
+                        .execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+                    )
+                    async for message_id, body in result:
+                        self._add(conversation_id, message_id, body)
+            self._buffer_watermarks[key] = max(self._buffer_watermarks.get(key, 0), request_id)
+            if self._buffered_docs >= self.flush_docs:
+                await self.flush()
+        await self.flush()
+        logger.info(f"Message index applied {len(pending)} import request(s)")
+
+    async def _maintain(self):
+        while not self.ready:
+            try:
+                await self._catch_up()
+                self.ready = True
+                logger.info(f"Message index ready with {len(self._segments)} segments in {self.directory}")
+            except Exception as e:
+                logger.warning(f"Message index catch-up failed, will retry: {e}")
+                await asyncio.sleep(self.flush_interval)
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._catch_up()
+                await self.merge()
+                await self._apply_requests()
+            except Exception as e:
+                logger.warning(f"Message index maintenance failed, will retry: {e}")
+
+    async def start(self):
+        """Open this worker's index; the catch-up with MySQL runs in the background."""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._claim)
+        self._segments = await loop.run_in_executor(None, self._load_segments)
+        self._next_segment = max([s.index for s in self._segments], default=0) + 1
+        self._watermarks = _merge_watermarks(*(s.max_message_ids for s in self._segments))
+        self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._claim_handle is not None:
+            try:
+                await self.flush()
+            finally:
+                self._release()
+
+    # -------------------------------------------------------------------------
+    def _buffered_matches(self, term: str, conversation_ids) -> set:
+        matches = set()
+        for by_conv in (self._flushing.get(term), self._buffer.get(term)):
+            if not by_conv:
+                continue
+            for conv_id in conversation_ids:
+                matches.update(by_conv.get(conv_id, ()))
+        return matches
+
+    async def search(self, query: str, conversation_ids) -> list:
+        """
+        Ids of messages in `conversation_ids` containing every term of `query`,
+        newest first. Segment files are read in the default executor.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        metrics.incr(Constants.METRIC_MESSAGE_SEARCHES)
+        conversation_ids = set(conversation_ids)
+        # Every message is in one of these segments, the flushing buffer or
+        # the buffer right now; the files are opened before a merge can
+        # remove them.
+        buffered = {term: self._buffered_matches(term, conversation_ids) for term in terms}
+        segments = list(self._segments)
+        files = [open(segment.path, "rb") for segment in segments]
+        on_disk = await asyncio.get_running_loop().run_in_executor(
+            None, _read_matches, segments, files, terms, conversation_ids
+        )
+        matches = None
+        for term_matches in sorted((on_disk[t] | buffered[t] for t in terms), key=len):
+            matches = term_matches if matches is None else matches & term_matches
+            if not matches:
+                return []
+        return sorted(matches, reverse=True)
+
+
+message_index = MessageIndex()
@@ -0,0 +1,333 @@
+import asyncio
+import glob
+import json
+import os
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, folders of exited workers are not adopted
+    fcntl = None
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.db_utils import is_unavailable
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
+def lock_folder(folder: str, blocking: bool):
+    """
+    Open and lock `folder`'s lock file; returns the open file holding the
+    lock, or None when another process holds it or the folder is gone.
+    Without advisory locks (Windows) a blocking call always gets the file
+    and a non-blocking one never does.
+    """
+    path = os.path.join(folder, Constants.JOURNAL_LOCK_NAME)
+    while True:
+        try:
+            handle = open(path, "a", encoding=Constants.UTF_8_ENCODING)
+        except FileNotFoundError:
+            return None
+        if fcntl is None:
+            if blocking:
+                return handle
+            handle.close()
+            return None
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            handle.close()
+            return None
+        # The previous holder may have removed the lock file before
+        # releasing it: the lock is only good if the path still names our file.
+        try:
+            if os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino:
+                return handle
+        except FileNotFoundError:
+            pass
+        handle.close()
+
+
+class MessageJournal:
+    """
+    Local append-only write-ahead journal for websocket messages.
+
+    When the database stalls, send_message_ws appends the message here and acks
+    the sender with a provisional id. Records are JSON lines in numbered segment
+    files; appends are fsync'ed in small batches (group commit). A background
+    replayer drains closed segments into the database through the handler given
+    to `start`, and deletes a segment once every record in it has been applied.
+
+    Replay progress is checkpointed per record (the byte offset of the next
+    record, in a `.offset` file next to the segment), so a segment interrupted
+    by an outage resumes where it stopped instead of broadcasting its applied
+    records again. A record the database rejects (anything but
+    db_utils.is_unavailable) is moved to the dead-letter file and skipped, so
+    it cannot hold back the records behind it.
+
+    Every worker process writes to its own folder, DIRECTORY/worker-<pid>,
+    and holds an exclusive lock on the folder's lock file while it runs. The
+    replayer of each worker also looks at the other folders: one whose lock
+    can be taken belongs to a process that has exited, and is replayed and
+    removed by whichever worker takes the lock first.
+    """
+
+    def __init__(self):
+        section = Constants.JOURNAL
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.JOURNAL_ENABLED, Constants.NO).lower()
+            == Constants.YES
+        )
+        self.root = os.path.join(
+            Constants.ROOT_DIR_PATH,
+            cfg.get_value_config_or_default(section, Constants.JOURNAL_DIRECTORY, Constants.DEFAULT_JOURNAL_DIRECTORY),
+        )
+        # Set by _claim, in the worker process itself (not at import, which may
+        # happen in a parent that forks the workers).
+        self.directory = None
+        self.segment_max_bytes = int(cfg.get_value_config_or_default(
+            section, Constants.JOURNAL_SEGMENT_MAX_BYTES, Constants.DEFAULT_JOURNAL_SEGMENT_MAX_BYTES))
+        self.fsync_interval = int(cfg.get_value_config_or_default(
+            section, Constants.JOURNAL_FSYNC_INTERVAL_MS, Constants.DEFAULT_JOURNAL_FSYNC_INTERVAL_MS)) / 1000
+        self.db_timeout = int(cfg.get_value_config_or_default(
+            section, Constants.JOURNAL_DB_TIMEOUT_MS, Constants.DEFAULT_JOURNAL_DB_TIMEOUT_MS)) / 1000
+        self.replay_interval = int(cfg.get_value_config_or_default(
+            section, Constants.JOURNAL_REPLAY_INTERVAL_MS, Constants.DEFAULT_JOURNAL_REPLAY_INTERVAL_MS)) / 1000
+
+        self._file = None
+        self._segment_index = 0
+        self._segment_bytes = 0
+        self._waiters = []
+        self._flush_task = None
+        self._replay_task = None
+        self._handler = None
+        self._lock = asyncio.Lock()
+        self._claim_handle = None
+
+    @staticmethod
+    def new_id() -> str:
+        """Provisional id handed to the sender before the row exists in MySQL."""
+        return f"{Constants.PROVISIONAL_ID_PREFIX}{uuid.uuid4().hex}"
+
+    # -------------------------------------------------------------------------
+    def _claim(self):
+        """Create and lock this worker's own folder."""
+        if self._claim_handle is not None:
+            return
+        self.directory = os.path.join(self.root, Constants.JOURNAL_WORKER_DIR.format(os.getpid()))
+        while self._claim_handle is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._claim_handle = lock_folder(self.directory, blocking=True)
+
+    def _release(self):
+        """Unlock this worker's folder, removing it when nothing is left to replay."""
+        if self._claim_handle is None:
+            return
+        for path in self._segments(self.directory):
+            if not os.path.getsize(path):
+                os.remove(path)
+        if not self._segments(self.directory):
+            os.remove(os.path.join(self.directory, Constants.JOURNAL_LOCK_NAME))
+            os.rmdir(self.directory)
+        self._claim_handle.close()
+        self._claim_handle = None
+
+    @staticmethod
+    def _segments(folder: str) -> list:
+        return sorted(glob.glob(os.path.join(folder, Constants.JOURNAL_SEGMENT_GLOB)))
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, Constants.JOURNAL_SEGMENT_NAME.format(index))
+
+    @staticmethod
+    def _offset_path(segment_path: str) -> str:
+        return segment_path + Constants.JOURNAL_OFFSET_SUFFIX
+
+    def _read_offset(self, segment_path: str) -> int:
+        try:
+            with open(self._offset_path(segment_path), encoding=Constants.UTF_8_ENCODING) as checkpoint:
+                return int(checkpoint.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, segment_path: str, offset: int):
+        path = self._offset_path(segment_path)
+        with open(path + Constants.JOURNAL_TMP_SUFFIX, "w", encoding=Constants.UTF_8_ENCODING) as checkpoint:
+            checkpoint.write(str(offset))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(path + Constants.JOURNAL_TMP_SUFFIX, path)
+
+    def _dead_letter(self, record: dict, error: Exception):
+        """Keep a record the database rejected, with the reason, for manual inspection."""
+        entry = {Constants.JOURNAL_RECORD: record, Constants.JOURNAL_ERROR: repr(error)}
+        path = os.path.join(self.root, Constants.JOURNAL_DEAD_LETTER_NAME)
+        with open(path, "a", encoding=Constants.UTF_8_ENCODING) as dead_letters:
+            dead_letters.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            dead_letters.flush()
+            os.fsync(dead_letters.fileno())
+        metrics.incr(Constants.METRIC_JOURNAL_DEAD_LETTERS)
+        logger.error(
+            f"Journal record {record.get(Constants.JOURNAL_ID)} rejected, moved to {path}: {error!r}"
+        )
+
+    def _closed_segments(self):
+        active = self._segment_path(self._segment_index) if self._file else None
+        return [path for path in self._segments(self.directory) if path != active]
+
+    def _open_next_segment(self):
+        existing = self._segments(self.directory)
+        indexes = [int(os.path.basename(p).split("-")[1].split(".")[0]) for p in existing]
+        self._segment_index = max(indexes + [self._segment_index]) + 1
+        self._file = open(self._segment_path(self._segment_index), "a", encoding=Constants.UTF_8_ENCODING)
+        self._segment_bytes = 0
+
+    @staticmethod
+    async def _fsync(file, waiters):
+        """Flush and fsync `file`, then release `waiters`, whose lines are all in it."""
+        try:
+            if file is not None:
+                file.flush()
+                await asyncio.get_running_loop().run_in_executor(None, os.fsync, file.fileno())
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _sync(self):
+        """Flush and fsync everything written so far, then release the waiting appenders."""
+        async with self._lock:
+            waiters, self._waiters = self._waiters, []
+            await self._fsync(self._file, waiters)
+
+    async def _sync_after_interval(self):
+        await asyncio.sleep(self.fsync_interval)
+        await self._sync()
+
+    async def _rotate(self):
+        """
+        Switch appends to a new segment, then fsync and close the old one.
+        The switch and the hand-over of the waiters happen without yielding,
+        so every line written to the old segment is fsynced before its
+        appender is released.
+        """
+        async with self._lock:
+            old_file, waiters = self._file, self._waiters
+            self._waiters = []
+            self._open_next_segment()
+            await self._fsync(old_file, waiters)
+            if old_file is not None:
+                old_file.close()
+
+    # -------------------------------------------------------------------------
+    async def append(self, record: dict):
+        """Durably append a record; returns once it has been fsync'ed."""
+        if self._file is None:
+            self._claim()
+            self._open_next_segment()
+
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._segment_bytes += len(line.encode(Constants.UTF_8_ENCODING))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._sync_after_interval())
+        await waiter
+        metrics.incr(Constants.METRIC_JOURNAL_APPENDS)
+
+        if self._segment_bytes >= self.segment_max_bytes:
+            await self._rotate()
+
+    async def _replay_segment(self, path: str):
+        offset = self._read_offset(path)
+        with open(path, "rb") as segment:
+            segment.seek(offset)
+            for line in segment:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping torn journal record in {path}")
+                    record = None
+                if record is not None:
+                    try:
+                        await self._handler(record)
+                        metrics.incr(Constants.METRIC_JOURNAL_REPLAYED)
+                    except Exception as e:
+                        if is_unavailable(e):
+                            raise
+                        self._dead_letter(record, e)
+                offset += len(line)
+                self._write_offset(path, offset)
+        os.remove(path)
+        if os.path.exists(self._offset_path(path)):
+            os.remove(self._offset_path(path))
+        logger.info(f"Journal segment replayed and removed: {path}")
+
+    async def replay(self):
+        """
+        Apply every closed segment in order. Stops, to be retried, at the first
+        record that fails because the database is unavailable.
+        """
+        if self._file is not None and self._segment_bytes:
+            await self._rotate()
+
+        for path in self._closed_segments():
+            await self._replay_segment(path)
+        await self._adopt_orphans()
+
+    async def _adopt_orphans(self):
+        """Replay and remove the folders of worker processes that have exited."""
+        folders = glob.glob(os.path.join(self.root, Constants.JOURNAL_WORKER_GLOB))
+        for folder in sorted(folders):
+            if folder == self.directory:
+                continue
+            handle = lock_folder(folder, blocking=False)
+            if handle is None:
+                continue
+            try:
+                for path in self._segments(folder):
+                    await self._replay_segment(path)
+                os.remove(os.path.join(folder, Constants.JOURNAL_LOCK_NAME))
+                os.rmdir(folder)
+                logger.info(f"Journal folder of an exited worker replayed and removed: {folder}")
+            finally:
+                handle.close()
+
+    async def _replay_loop(self):
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                await self.replay()
+            except Exception as e:
+                metrics.incr(Constants.METRIC_JOURNAL_REPLAY_FAILURES)
+                logger.warning(f"Journal replay paused, will retry: {e}")
+
+    async def start(self, handler):
+        """Start the background replayer; `handler(record)` must be idempotent."""
+        if not self.enabled:
+            return
+        self._claim()
+        self._handler = handler
+        self._replay_task = asyncio.create_task(self._replay_loop())
+        logger.info(f"Message journal started in {self.directory}")
+
+    async def stop(self):
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+        await self._sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._release()
+
+
+message_journal = MessageJournal()
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from threading import Lock
+
+
+class Metrics:
+    """
+    In-process counters, gauges and timing summaries shared across the API.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.timings = {}
+
+    def incr(self, name: str, value: int = 1):
+        """Increment a counter by `value`."""
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value):
+        """Set a gauge to its latest observed value."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Fold one observation into the count / total / max summary of `name`."""
+        with self._lock:
+            summary = self.timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["total"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self):
+        """Return a copy of all counters, gauges and timing summaries."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": {name: dict(summary) for name, summary in self.timings.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event, text
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+_current_budget = ContextVar("query_budget", default=None)
+
+
+class QueryBudget:
+    """Time budget of one request and the statements currently running for it."""
+
+    def __init__(self, route: str, seconds: float):
+        self.route = route
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.active = {}
+        self.expired = False
+
+    def remaining_ms(self) -> int:
+        return max(int((self.deadline - time.monotonic()) * 1000), 1)
+
+
+class QueryBudgetManager:
+    """
+    Per-route statement time budgets, configured in [QUERY_TIMEOUT].
+
+    Only the read-only routes of Constants.QUERY_BUDGET_ROUTES get a budget;
+    routes that write (and their transactions) are never interrupted. On MySQL
+    every SELECT carries a MAX_EXECUTION_TIME hint equal to what is left of the
+    request budget, so the server aborts it by itself. When the budget runs out
+    (or the client disconnects) while SELECTs are still running, they are
+    cancelled with KILL QUERY on their server thread, the handler gets a short
+    grace period to unwind, and the client receives a structured 504.
+
+    A streamed (NDJSON) response is budgeted until the handler returns it; the
+    rows it streams afterwards are read without a budget.
+    """
+
+    def __init__(self):
+        section = Constants.QUERY_TIMEOUT
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.QUERY_TIMEOUT_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.default_ms = int(cfg.get_value_config_or_default(
+            section, Constants.QUERY_TIMEOUT_DEFAULT_MS, Constants.DEFAULT_QUERY_TIMEOUT_MS))
+        self.grace = int(cfg.get_value_config_or_default(
+            section, Constants.QUERY_TIMEOUT_GRACE_MS, Constants.DEFAULT_QUERY_TIMEOUT_GRACE_MS)) / 1000
+
+    def budget_for(self, path: str) -> float:
+        """Budget in seconds for a route path such as /user/conversations (0 for no budget)."""
+        if path not in Constants.QUERY_BUDGET_ROUTES:
+            return 0
+        return int(cfg.get_value_config_or_default(Constants.QUERY_TIMEOUT, path, self.default_ms)) / 1000
+
+    # -------------------------------------------------------------------------
+    def attach(self, engine):
+        """Register the hint / tracking hooks on an AsyncEngine."""
+        if not self.enabled:
+            return
+        sync_engine = engine.sync_engine
+        is_mysql = sync_engine.dialect.name == Constants.MYSQL_DIALECT
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            budget = _current_budget.get()
+            if budget is None or statement.lstrip()[:6].upper() != "SELECT":
+                # Only SELECTs are tracked, so cancel() never kills a write.
+                return statement, parameters
+            thread_id = getattr(conn.connection.driver_connection, "thread_id", None)
+            budget.active[id(conn)] = (engine, thread_id() if callable(thread_id) else None)
+            if is_mysql:
+                statement = (
+                    f"SELECT /*+ MAX_EXECUTION_TIME({budget.remaining_ms()}) */"
+                    f"{statement.lstrip()[6:]}"
+                )
+            return statement, parameters
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            budget = _current_budget.get()
+            if budget is not None:
+                budget.active.pop(id(conn), None)
+
+        def handle_error(context):
+            budget = _current_budget.get()
+            if budget is None:
+                return
+            if context.connection is not None:
+                budget.active.pop(id(context.connection), None)
+            code = getattr(context.original_exception, "args", (None,))[0]
+            if code in Constants.QUERY_INTERRUPTED_ERROR_CODES:
+                budget.expired = True
+
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute, retval=True)
+        event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(sync_engine, "handle_error", handle_error)
+
+    async def cancel(self, budget: QueryBudget):
+        """KILL QUERY every SELECT still running for the request."""
+        budget.expired = True
+        for engine, thread_id in list(budget.active.values()):
+            if thread_id is None or engine.sync_engine.dialect.name != Constants.MYSQL_DIALECT:
+                continue
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text(f"KILL QUERY {int(thread_id)}"))
+                metrics.incr(Constants.METRIC_QUERIES_KILLED)
+            except Exception as e:
+                logger.warning(f"KILL QUERY {thread_id} failed: {e}")
+
+    # -------------------------------------------------------------------------
+    async def run(self, request, handler):
+        """Run `handler(request)` within the budget of its route."""
+        seconds = self.budget_for(request.url.path.removeprefix(Constants.API_PREFIX))
+        if not self.enabled or seconds <= 0:
+            return await handler(request)
+
+        budget = QueryBudget(request.url.path, seconds)
+        token = _current_budget.set(budget)
+        try:
+            # Read the body first so the disconnect watcher cannot consume it.
+            await request.body()
+            task = asyncio.create_task(handler(request))
+        finally:
+            _current_budget.reset(token)
+        watcher = asyncio.create_task(self._wait_for_disconnect(request))
+
+        done, _ = await asyncio.wait({task, watcher}, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+        disconnected = watcher in done
+        watcher.cancel()
+
+        if task not in done:
+            await self.cancel(budget)
+            done, _ = await asyncio.wait({task}, timeout=self.grace)
+            if task not in done:
+                # Client-side cancellation; SQLAlchemy discards the interrupted connection.
+                task.cancel()
+                metrics.incr(Constants.METRIC_QUERIES_CANCELLED)
+
+        if not budget.expired and task.done() and not task.cancelled():
+            return task.result()
+
+        metrics.incr(Constants.METRIC_QUERY_TIMEOUTS)
+        reason = Constants.CLIENT_DISCONNECTED if disconnected else Constants.BUDGET_EXCEEDED
+        logger.warning(f"Query budget: {request.url.path} {reason} after {int(seconds * 1000)} ms")
+        return JSONResponse(
+            status_code=Constants.GATEWAY_TIMEOUT,
+            content={
+                Constants.STATUS_CODE_KEY: Constants.GATEWAY_TIMEOUT,
+                Constants.MESSAGE_KEY: Constants.QUERY_TIMEOUT_MESSAGE,
+                Constants.ROUTE: request.url.path,
+                Constants.BUDGET_MS: int(seconds * 1000),
+                Constants.REASON: reason,
+            },
+        )
+
+    @staticmethod
+    async def _wait_for_disconnect(request):
+        while not await request.is_disconnected():
+            await asyncio.sleep(Constants.DISCONNECT_POLL_INTERVAL)
+
+
+query_budget = QueryBudgetManager()
+
+
+class BudgetedRoute(APIRoute):
+    """APIRoute whose handler runs under the query time budget of its path."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def budgeted_handler(request):
+            return await query_budget.run(request, handler)
+
+        return budgeted_handler
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from typing import Dict
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens/second up to `burst` tokens.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available (0 when available now)."""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens: float = 1):
+        self.tokens -= tokens
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """
+    Per-connection and per-user token buckets for the websocket receive loop.
+    Limits are read from the RATE_LIMIT section of config.ini.
+
+    A user's bucket outlives their sockets until it has refilled, so
+    reconnecting does not reset the limit; idle buckets are swept once per
+    refill period.
+    """
+
+    def __init__(self):
+        section = Constants.RATE_LIMIT
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.RATE_LIMIT_ENABLED, Constants.NO).lower()
+            == Constants.YES
+        )
+        self.connection_rate = float(cfg.get_value_config_or_default(
+            section, Constants.RATE_LIMIT_CONNECTION_RATE, Constants.DEFAULT_CONNECTION_RATE))
+        self.connection_burst = float(cfg.get_value_config_or_default(
+            section, Constants.RATE_LIMIT_CONNECTION_BURST, Constants.DEFAULT_CONNECTION_BURST))
+        self.user_rate = float(cfg.get_value_config_or_default(
+            section, Constants.RATE_LIMIT_USER_RATE, Constants.DEFAULT_USER_RATE))
+        self.user_burst = float(cfg.get_value_config_or_default(
+            section, Constants.RATE_LIMIT_USER_BURST, Constants.DEFAULT_USER_BURST))
+        self.pause_on_limit = (
+            cfg.get_value_config_or_default(
+                section, Constants.RATE_LIMIT_ON_LIMIT, Constants.RATE_LIMIT_MODE_THROTTLE).lower()
+            == Constants.RATE_LIMIT_MODE_PAUSE
+        )
+
+        if self.enabled:
+            for name, rate, burst in (
+                (Constants.RATE_LIMIT_CONNECTION_RATE, self.connection_rate, self.connection_burst),
+                (Constants.RATE_LIMIT_USER_RATE, self.user_rate, self.user_burst),
+            ):
+                # A zero rate never refills, a burst below one token never admits a message.
+                if rate <= 0 or burst < 1:
+                    raise ValueError(f"[{section}] {name} must be > 0 and its burst >= 1, got {rate} / {burst}")
+
+        self._connection_buckets: Dict[int, TokenBucket] = {}
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._user_connections: Dict[str, int] = {}
+        self._next_sweep = 0.0
+
+        logger.info(
+            f"Rate limiter: enabled={self.enabled}, connection={self.connection_rate}/s "
+            f"burst {self.connection_burst}, user={self.user_rate}/s burst {self.user_burst}, "
+            f"pause_on_limit={self.pause_on_limit}"
+        )
+
+    def register(self, connection_key: int, user_key: str):
+        """Create buckets for a newly attached socket."""
+        if not self.enabled:
+            return
+        self._connection_buckets[connection_key] = TokenBucket(self.connection_rate, self.connection_burst)
+        self._user_bucket(user_key)
+        self._user_connections[user_key] = self._user_connections.get(user_key, 0) + 1
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_key)
+        if bucket is None:
+            bucket = self._user_buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def release(self, connection_key: int, user_key: str):
+        """Drop the socket's bucket; user buckets go once they are unused and refilled."""
+        if not self.enabled:
+            return
+        self._connection_buckets.pop(connection_key, None)
+        remaining = self._user_connections.get(user_key, 1) - 1
+        if remaining > 0:
+            self._user_connections[user_key] = remaining
+        else:
+            self._user_connections.pop(user_key, None)
+        self._sweep_idle()
+
+    def _sweep_idle(self):
+        """
+        Drop the user buckets without sockets that have refilled (a new bucket
+        would be identical). Runs at most once per refill period, after which
+        every bucket unused for that long is full.
+        """
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.user_burst / self.user_rate
+        idle = [
+            user_key for user_key, bucket in self._user_buckets.items()
+            if user_key not in self._user_connections and bucket.is_full()
+        ]
+        for user_key in idle:
+            del self._user_buckets[user_key]
+
+    def acquire(self, connection_key: int, user_key: str) -> float:
+        """
+        Take one token from both the connection and the user bucket.
+
+        Returns:
+            0 when the message may proceed, otherwise the seconds to wait.
+        """
+        if not self.enabled:
+            return 0.0
+
+        connection_bucket = self._connection_buckets.get(connection_key)
+        if connection_bucket is None:
+            self.register(connection_key, user_key)
+            connection_bucket = self._connection_buckets[connection_key]
+        user_bucket = self._user_bucket(user_key)
+
+        connection_wait = connection_bucket.wait_time()
+        user_wait = user_bucket.wait_time()
+
+        if connection_wait:
+            metrics.incr(Constants.METRIC_RATE_LIMIT_CONNECTION_HITS)
+        if user_wait:
+            metrics.incr(Constants.METRIC_RATE_LIMIT_USER_HITS)
+        if connection_wait or user_wait:
+            return max(connection_wait, user_wait)
+
+        connection_bucket.consume()
+        user_bucket.consume()
+        return 0.0
+
+    async def wait_for_token(self, connection_key: int, user_key: str):
+        """Block (without reading from the socket) until both buckets allow a message."""
+        while True:
+            wait_seconds = self.acquire(connection_key, user_key)
+            if not wait_seconds:
+                return
+            metrics.incr(Constants.METRIC_RATE_LIMIT_PAUSES)
+            await asyncio.sleep(wait_seconds)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,97 @@
+from threading import Lock
+
+from fastapi.responses import Response
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.cache_backend import cache_backends
+from src.utils.metrics import metrics
+
+
+class ResponseCache:
+    """
+    Cache of rendered JSON responses of read endpoints.
+
+    Entries are keyed by (endpoint, user, params) and hold the response body
+    as bytes, so a hit skips both the queries and the serialization. They live
+    in the [CACHE] backend, bounded by MAX_BYTES (memory backend) and TTL_MS.
+    Every entry carries tags naming the data it was built from
+    (Constants.CACHE_TAG_*); mutating endpoints invalidate those tags.
+    Only successful responses are cached, so hits are served with status 200.
+
+    A miss hands out a token before running its queries; an invalidation of
+    one of the entry's tags after that token keeps the (possibly stale)
+    result out of the cache.
+    """
+
+    def __init__(self):
+        section = Constants.RESPONSE_CACHE
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.RESPONSE_CACHE_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        max_bytes = int(cfg.get_value_config_or_default(
+            section, Constants.RESPONSE_CACHE_MAX_BYTES, Constants.DEFAULT_RESPONSE_CACHE_MAX_BYTES))
+        ttl = int(cfg.get_value_config_or_default(
+            section, Constants.RESPONSE_CACHE_TTL_MS, Constants.DEFAULT_RESPONSE_CACHE_TTL_MS)) / 1000
+        self.backend = cache_backends.create(Constants.RESPONSE_CACHE_NAMESPACE, max_bytes, ttl)
+
+        self._lock = Lock()
+        self._hits = {}
+        self._misses = {}
+
+    @staticmethod
+    def _key(key: tuple) -> str:
+        return ":".join(str(part) for part in key)
+
+    async def get(self, key: tuple):
+        """Cached response for `key` (its first element is the endpoint), or None."""
+        if not self.enabled:
+            return None
+        endpoint = key[0]
+        body = await self.backend.get(self._key(key))
+        with self._lock:
+            counts = self._misses if body is None else self._hits
+            counts[endpoint] = counts.get(endpoint, 0) + 1
+        if body is None:
+            metrics.incr(Constants.METRIC_RESPONSE_CACHE_MISSES.format(endpoint))
+            return None
+        metrics.incr(Constants.METRIC_RESPONSE_CACHE_HITS.format(endpoint))
+        return Response(content=body, media_type=Constants.JSON_MEDIA_TYPE)
+
+    async def token(self):
+        """Take before reading the data of a response that will be put()."""
+        if not self.enabled:
+            return None
+        return await self.backend.token()
+
+    async def put(self, key: tuple, response: Response, tags, token):
+        """Store a rendered response unless one of its tags was invalidated since `token`."""
+        if not self.enabled:
+            return
+        await self.backend.put(self._key(key), response.body, tags, token)
+
+    async def invalidate(self, *tags):
+        """Evict every entry built from one of `tags`, on every worker."""
+        if not self.enabled:
+            return
+        await self.backend.invalidate(*tags)
+
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        """Backend size, and hits / misses / hit rate per endpoint of this worker."""
+        with self._lock:
+            endpoints = {}
+            for endpoint in set(self._hits) | set(self._misses):
+                hits, misses = self._hits.get(endpoint, 0), self._misses.get(endpoint, 0)
+                endpoints[endpoint] = {
+                    Constants.CACHE_HITS: hits,
+                    Constants.CACHE_MISSES: misses,
+                    Constants.CACHE_HIT_RATE: round(hits / (hits + misses), 4),
+                }
+        stats = self.backend.stats()
+        stats[Constants.CACHE_ENDPOINTS] = endpoints
+        return stats
+
+
+response_cache = ResponseCache()
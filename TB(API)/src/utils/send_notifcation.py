@@ -2,7 +2,7 @@ import json
 import httpx
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
-from logger import Logger
+from src.utils.logger import Logger
 logger = Logger.get_logger()
 SERVICE_ACCOUNT_FILE = "PATH TO YOUR FIREBASE PRIVATE SERVER KEY FOR PUSHING NOTIFICATION"
 PROJECT_ID = "FIREBASE PROJECT ID"
@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+slow_query_logger = Logger.get_slow_query_logger()
+
+_current_scope = ContextVar("sql_scope", default=None)
+
+
+class QueryStats:
+    """Statements executed on behalf of one HTTP request or websocket message."""
+
+    def __init__(self, label: str, keep_slowest: int):
+        self.label = label
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest = []
+        self._keep_slowest = keep_slowest
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.slowest.append((duration, statement))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[self._keep_slowest:]
+
+
+class SQLInstrumentation:
+    """
+    SQLAlchemy engine hooks that attribute every statement to the current scope
+    (request or websocket message), keep count / DB time / slowest statements,
+    write statements above the threshold to the slow-query log and warn when a
+    single scope runs more statements than the N+1 threshold.
+    """
+
+    def __init__(self):
+        section = Constants.SQL_INSTRUMENTATION
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.SQL_INSTRUMENTATION_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.slow_query_seconds = int(cfg.get_value_config_or_default(
+            section, Constants.SLOW_QUERY_MS, Constants.DEFAULT_SLOW_QUERY_MS)) / 1000
+        self.statement_threshold = int(cfg.get_value_config_or_default(
+            section, Constants.N_PLUS_ONE_THRESHOLD, Constants.DEFAULT_N_PLUS_ONE_THRESHOLD))
+        self.keep_slowest = int(cfg.get_value_config_or_default(
+            section, Constants.SLOWEST_KEPT, Constants.DEFAULT_SLOWEST_KEPT))
+
+    def attach(self, engine):
+        """Register the cursor hooks on an AsyncEngine."""
+        if not self.enabled:
+            return
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(Constants.QUERY_START_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info[Constants.QUERY_START_KEY].pop()
+        stats = _current_scope.get()
+        label = stats.label if stats else Constants.UNSCOPED_SQL_LABEL
+
+        if stats is not None:
+            stats.record(statement, duration)
+        metrics.incr(Constants.METRIC_SQL_STATEMENTS)
+
+        if duration >= self.slow_query_seconds:
+            metrics.incr(Constants.METRIC_SQL_SLOW_STATEMENTS)
+            slow_query_logger.warning(
+                f"{duration * 1000:.1f} ms [{label}] {statement} | {self._describe_parameters(parameters, executemany)}"
+            )
+
+    @staticmethod
+    def _describe_parameters(parameters, executemany: bool) -> str:
+        """Number of bound parameters; their values (passwords, message bodies, emails) are never logged."""
+        if not parameters:
+            return "params=0"
+        if executemany:
+            return f"params={len(parameters[0])} x {len(parameters)} rows"
+        return f"params={len(parameters)}"
+
+    @contextmanager
+    def scope(self, label: str):
+        """Attribute the statements executed inside the block to `label`."""
+        stats = QueryStats(label, self.keep_slowest)
+        token = _current_scope.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_scope.reset(token)
+            self._report(stats)
+
+    def _report(self, stats: QueryStats):
+        if not stats.count:
+            return
+        metrics.incr(Constants.METRIC_SQL_TIME_MS, int(stats.total_time * 1000))
+        logger.debug(
+            f"SQL [{stats.label}] statements={stats.count}, db_time={stats.total_time * 1000:.1f} ms"
+        )
+        if stats.count > self.statement_threshold:
+            metrics.incr(Constants.METRIC_SQL_N_PLUS_ONE)
+            slowest = "; ".join(f"{d * 1000:.1f} ms {sql[:200]}" for d, sql in stats.slowest)
+            logger.warning(
+                f"Possible N+1: [{stats.label}] ran {stats.count} statements "
+                f"({stats.total_time * 1000:.1f} ms). Slowest: {slowest}"
+            )
+
+
+sql_instrumentation = SQLInstrumentation()
@@ -0,0 +1,32 @@
+import datetime
+
+from src.constants.constants import Constants
+
+
+def utc_now():
+    """
+    Current time in UTC as a naive datetime with microseconds.
+    All timestamp columns are UTC DATETIME(6); use this instead of datetime.now().
+    """
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def to_iso(value):
+    """Serialise a stored UTC timestamp for API responses, e.g. 2024-01-01T10:00:00.123456Z."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.strftime(Constants.ISO_DATETIME_FORMAT)
+
+
+def from_iso(value: str):
+    """Parse a timestamp produced by `to_iso` back into a naive UTC datetime."""
+    return datetime.datetime.strptime(value, Constants.ISO_DATETIME_FORMAT)
+
+
+def to_epoch_ms(value) -> int:
+    """Milliseconds since the Unix epoch for a naive UTC datetime."""
+    return int(value.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
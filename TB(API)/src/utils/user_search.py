@@ -0,0 +1,293 @@
+import asyncio
+import bisect
+import math
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.cache_backend import cache_backends
+from src.utils.db_utils import db_connect
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
+def _trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class UserSearchIndex:
+    """
+    In-process index over email, first name and last name of every user.
+
+    Prefix search runs on a sorted array of (token, email) pairs with bisect;
+    fuzzy search (typos, infixes) ranks users by the share of the query's
+    trigrams found in their names.
+    The index is built in the background at startup (search_users answers
+    from MySQL until it is ready) and then updated by signup / profile changes.
+    Changes made on other workers arrive through the cache invalidation channel
+    when a Redis client is configured in [CACHE] (the worker re-reads those
+    users), and every REFRESH_MS a catch-up scan re-indexes the users whose
+    updated_at moved (migrations/012_user_updated_at.sql; without it, only
+    the newest uids, i.e. signups).
+    """
+
+    def __init__(self):
+        section = Constants.USER_SEARCH
+        self.enabled = (
+            cfg.get_value_config_or_default(section, Constants.USER_SEARCH_ENABLED, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.fuzzy = (
+            cfg.get_value_config_or_default(section, Constants.USER_SEARCH_FUZZY, Constants.YES).lower()
+            == Constants.YES
+        )
+        self.min_fuzzy_score = float(cfg.get_value_config_or_default(
+            section, Constants.USER_SEARCH_MIN_FUZZY_SCORE, Constants.DEFAULT_MIN_FUZZY_SCORE))
+        self.interval = int(cfg.get_value_config_or_default(
+            section, Constants.USER_SEARCH_REFRESH_MS, Constants.DEFAULT_USER_SEARCH_REFRESH_MS)) / 1000
+        self.namespace = Constants.USER_SEARCH_NAMESPACE
+        self.ready = False
+
+        self._task = None
+        self._reloads = set()
+        # Catch-up scan watermarks: newest uid and newest updated_at indexed.
+        self._high_water = 0
+        self._changed_since = None
+        self._bus = cache_backends.bus if self.enabled else None
+        if self._bus is not None:
+            self._bus.register(self)
+        # Users changed while the build streams the table, applied once it is done.
+        self._pending = None
+        self._users = {}
+        self._tokens = []
+        self._user_tokens = {}
+        self._trigram_postings = {}
+        self._user_trigrams = {}
+
+    @staticmethod
+    def _tokenize(email: str, first_name: str, last_name: str) -> set:
+        first_name, last_name = (first_name or "").lower(), (last_name or "").lower()
+        tokens = {email, email.split("@")[0], first_name, last_name, f"{first_name} {last_name}".strip()}
+        return {token for token in tokens if token}
+
+    # -------------------------------------------------------------------------
+    def _add(self, email: str, first_name: str, last_name: str) -> set:
+        """Index a user that is not in the index yet, except in the sorted token list; returns its tokens."""
+        tokens = self._tokenize(email, first_name, last_name)
+        self._users[email] = (first_name, last_name)
+        self._user_tokens[email] = tokens
+
+        trigrams = set().union(*(_trigrams(token) for token in tokens))
+        self._user_trigrams[email] = trigrams
+        for trigram in trigrams:
+            self._trigram_postings.setdefault(trigram, set()).add(email)
+        return tokens
+
+    def upsert(self, email: str, first_name: str = None, last_name: str = None):
+        """Add a user, or replace the indexed names of an existing one."""
+        if not self.enabled:
+            return
+        email = email.lower()
+        if self._pending is not None:
+            self._pending[email] = (first_name, last_name)
+            return
+        self.remove(email)
+        for token in self._add(email, first_name, last_name):
+            bisect.insort(self._tokens, (token, email))
+
+    async def changed(self, email: str, first_name: str = None, last_name: str = None):
+        """Index a signup or profile change on every worker; call after the user row has committed."""
+        if not self.enabled:
+            return
+        self.upsert(email, first_name, last_name)
+        if self._bus is not None:
+            await self._bus.publish(self.namespace, [email.lower()])
+
+    # InvalidationBus listener: users changed on another worker are re-read.
+    def evict(self, emails):
+        task = asyncio.create_task(self._reload(list(emails)))
+        self._reloads.add(task)
+        task.add_done_callback(self._reloads.discard)
+
+    def clear(self):
+        """Changes published while the channel was down were missed: scan for them now."""
+        if self.ready:
+            self.evict([])
+
+    async def _reload(self, emails):
+        try:
+            if not emails:
+                await self._catch_up()
+                return
+            users = await db_connect.set_up_table(Constants.USER_TABLE)
+            # The primary: a replica may not have the change yet.
+            async with db_connect.session(Constants.POOL_WRITE) as session:
+                rows = await session.execute(self._select(users).where(users.email.in_(emails)))
+                for row in rows:
+                    self._index_row(row)
+        except Exception as e:
+            logger.warning(f"User search index reload failed, left to the catch-up scan: {e}")
+
+    def remove(self, email: str):
+        email = email.lower()
+        if email not in self._users:
+            return
+        for token in self._user_tokens.pop(email):
+            position = bisect.bisect_left(self._tokens, (token, email))
+            if position < len(self._tokens) and self._tokens[position] == (token, email):
+                del self._tokens[position]
+        for trigram in self._user_trigrams.pop(email):
+            postings = self._trigram_postings[trigram]
+            postings.discard(email)
+            if not postings:
+                del self._trigram_postings[trigram]
+        del self._users[email]
+
+    @staticmethod
+    def _select(users):
+        columns = [users.uid, users.email, users.first_name, users.last_name]
+        if hasattr(users, Constants.USER_UPDATED_AT):
+            columns.append(getattr(users, Constants.USER_UPDATED_AT))
+        return select(*columns)
+
+    def _track(self, row):
+        self._high_water = max(self._high_water, row.uid)
+        changed_at = getattr(row, Constants.USER_UPDATED_AT, None)
+        if changed_at is not None and (self._changed_since is None or changed_at > self._changed_since):
+            self._changed_since = changed_at
+
+    def _index_row(self, row):
+        self.upsert(row.email, row.first_name, row.last_name)
+        self._track(row)
+
+    async def build(self):
+        """
+        Load every user once, streaming the table in batches. The token list is
+        sorted once at the end rather than kept sorted row by row.
+        """
+        if not self.enabled:
+            return
+        self._pending = {}
+        self._users, self._user_tokens, self._trigram_postings, self._user_trigrams = {}, {}, {}, {}
+        pairs = []
+        try:
+            users = await db_connect.set_up_table(Constants.USER_TABLE)
+            async with db_connect.session(Constants.POOL_READ) as session:
+                result = await session.stream(
+                    self._select(users).execution_options(yield_per=Constants.STREAM_BATCH_SIZE)
+                )
+                async for row in result:
+                    email = row.email.lower()
+                    pairs.extend((token, email) for token in self._add(email, row.first_name, row.last_name))
+                    self._track(row)
+            pairs.sort()
+            self._tokens = pairs
+        finally:
+            pending, self._pending = self._pending, None
+        for email, (first_name, last_name) in pending.items():
+            self.upsert(email, first_name, last_name)
+        self.ready = True
+        logger.info(f"User search index built with {len(self._users)} users")
+
+    async def _catch_up(self):
+        users = await db_connect.set_up_table(Constants.USER_TABLE)
+        query = self._select(users)
+        if hasattr(users, Constants.USER_UPDATED_AT):
+            if self._changed_since is not None:
+                # The overlap covers rows committed late with an older updated_at.
+                since = self._changed_since - timedelta(seconds=Constants.USER_SEARCH_UPDATE_OVERLAP_SECONDS)
+                query = query.where(getattr(users, Constants.USER_UPDATED_AT) > since)
+        else:
+            query = query.where(users.uid > self._high_water - Constants.USER_SEARCH_UID_OVERLAP)
+        async with db_connect.session(Constants.POOL_READ) as session:
+            for row in await session.execute(query):
+                self._index_row(row)
+
+    async def _run(self):
+        try:
+            await self.build()
+        except Exception as e:
+            logger.error(f"User search index build failed, search_users stays on MySQL: {e!r}")
+            return
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._catch_up()
+            except Exception as e:
+                logger.warning(f"User search index refresh failed, will retry: {e}")
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # -------------------------------------------------------------------------
+    def _prefix_matches(self, query: str, limit: int, exclude: str):
+        matches = []
+        position = bisect.bisect_left(self._tokens, (query, ""))
+        while position < len(self._tokens) and len(matches) < limit:
+            token, email = self._tokens[position]
+            if not token.startswith(query):
+                break
+            if email != exclude and email not in matches:
+                matches.append(email)
+            position += 1
+        return matches
+
+    def _fuzzy_matches(self, query: str, limit: int, exclude: str, skip):
+        """
+        Users sharing at least MIN_FUZZY_SCORE of the query's trigrams.
+
+        A qualifying user must contain one of the (n - needed + 1) rarest query
+        trigrams, so candidates are collected from those short posting lists
+        only and then scored against their own trigram set.
+        """
+        query_trigrams = _trigrams(query)
+        needed = max(math.ceil(self.min_fuzzy_score * len(query_trigrams)), 1)
+        by_rarity = sorted(query_trigrams, key=lambda t: len(self._trigram_postings.get(t, ())))
+
+        candidates = set()
+        for trigram in by_rarity[:len(query_trigrams) - needed + 1]:
+            candidates.update(self._trigram_postings.get(trigram, ()))
+
+        scored = []
+        for email in candidates:
+            if email == exclude or email in skip:
+                continue
+            # Share of the query's trigrams found in the user's names: tolerant
+            # to typos, and not diluted by users with long or many names.
+            shared = len(query_trigrams & self._user_trigrams[email])
+            if shared >= needed:
+                scored.append((shared / len(query_trigrams), email))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [email for _, email in scored[:limit]]
+
+    def search(self, query: str, limit: int, exclude: str = None):
+        """Top `limit` users for `query`: prefix matches first, then fuzzy ones."""
+        query = query.strip().lower()
+        if not query:
+            return []
+        emails = self._prefix_matches(query, limit, exclude)
+        if self.fuzzy and len(emails) < limit:
+            emails += self._fuzzy_matches(query, limit - len(emails), exclude, set(emails))
+        metrics.incr(Constants.METRIC_USER_SEARCHES)
+        return [
+            {
+                Constants.EMAIL: email,
+                "first_name": self._users[email][0],
+                "last_name": self._users[email][1],
+            }
+            for email in emails
+        ]
+
+
+user_search_index = UserSearchIndex()
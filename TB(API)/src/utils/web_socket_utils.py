@@ -1,9 +1,27 @@
-from typing import Dict
+import asyncio
+from typing import Dict, List, Tuple
 from fastapi import WebSocket
 
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils.logger import Logger
+from src.utils.metrics import metrics
+
+logger = Logger.get_logger()
+
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[int, Dict[str, WebSocket]] = {}
+        self.coalesce_window = int(
+            cfg.get_value_config_or_default(
+                Constants.WEBSOCKET, Constants.WS_COALESCE_WINDOW_MS, Constants.DEFAULT_COALESCE_WINDOW_MS
+            )
+        ) / 1000
+        # Events waiting for the coalesced frame of a socket, each with the
+        # future resolved once that frame has been sent (or has failed).
+        self._pending: Dict[int, List[Tuple[dict, asyncio.Future]]] = {}
+        self._flush_tasks = set()
 
     async def connect(self, conversation_id: int, email: str, websocket: WebSocket):
         if conversation_id not in self.active_connections:
@@ -11,38 +29,112 @@ class ConnectionManager:
 
         if email in self.active_connections[conversation_id]:
             old_ws = self.active_connections[conversation_id][email]
+            self._drop_pending(old_ws)
             try:
                 await old_ws.close()
-            except:
-                pass
+            except Exception as e:
+                logger.debug(f"Closing replaced socket of {email} failed: {e!r}")
 
         self.active_connections[conversation_id][email] = websocket
         print(f"[CONNECTED] {email} → conversation {conversation_id}")
 
     async def disconnect(self, conversation_id: int, email: str):
         if conversation_id in self.active_connections:
-            self.active_connections[conversation_id].pop(email, None)
+            ws = self.active_connections[conversation_id].pop(email, None)
+            if ws is not None:
+                self._drop_pending(ws)
             print(f"[DISCONNECTED] {email} from conversation {conversation_id}")
 
+    def _drop_pending(self, ws: WebSocket):
+        """Fail the events still waiting for a socket that is going away."""
+        for _, sent in self._pending.pop(id(ws), []):
+            if not sent.done():
+                sent.set_exception(ConnectionError(Constants.WS_SOCKET_CLOSED_MESSAGE))
+
+    async def _send_frame(self, ws: WebSocket, payload):
+        await ws.send_json(payload)
+        metrics.incr(Constants.METRIC_WS_FRAMES)
+
+    async def _flush_later(self, ws: WebSocket):
+        await asyncio.sleep(self.coalesce_window)
+        await self._flush(ws)
+
+    async def _flush(self, ws: WebSocket):
+        pending = self._pending.pop(id(ws), None)
+        if not pending:
+            return
+        events = [event for event, _ in pending]
+        try:
+            # A lone event keeps the plain object shape; several go out as one array frame.
+            await self._send_frame(ws, events[0] if len(events) == 1 else events)
+        except Exception as e:
+            logger.warning(f"Sending {len(events)} coalesced event(s) failed: {e!r}")
+            for _, sent in pending:
+                if not sent.done():
+                    sent.set_exception(e)
+            return
+        for _, sent in pending:
+            if not sent.done():
+                sent.set_result(None)
+
+    async def _deliver(self, ws: WebSocket, message: dict):
+        """Send an event to a socket; returns once the frame carrying it has been sent, raises if that failed."""
+        metrics.incr(Constants.METRIC_WS_EVENTS)
+        if not self.coalesce_window:
+            await self._send_frame(ws, message)
+            return
+
+        sent = asyncio.get_running_loop().create_future()
+        pending = self._pending.get(id(ws))
+        if pending is None:
+            self._pending[id(ws)] = [(message, sent)]
+            task = asyncio.create_task(self._flush_later(ws))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        else:
+            pending.append((message, sent))
+            if len(pending) >= Constants.WS_COALESCE_MAX_EVENTS:
+                await self._flush(ws)
+        await sent
+
     async def broadcast(self, conversation_id: int, message: dict, exclude_email: str = None):
         """
         Broadcast to all active participants in a conversation.
-        Returns True if at least one recipient received the message.
+        Returns the emails of the recipients whose socket the message was sent
+        to (empty, hence falsy, when nobody received it).
+        With coalescing enabled, events for the same socket that arrive within
+        the configured window are sent together as a single JSON array frame;
+        a recipient counts as reached only once that frame has gone out.
         """
-        delivered = False
+        recipients = [
+            (email, ws)
+            for email, ws in list(self.active_connections.get(conversation_id, {}).items())
+            if not (exclude_email and email == exclude_email)
+        ]
+        results = await asyncio.gather(
+            *(self._deliver(ws, message) for _, ws in recipients), return_exceptions=True
+        )
 
-        if conversation_id in self.active_connections:
-            for email, ws in self.active_connections[conversation_id].items():
-                if exclude_email and email == exclude_email:
-                    continue
-                try:
-                    await ws.send_json(message)
-                    delivered = True   
-                except:
-                    pass  
+        delivered = []
+        for (email, _), result in zip(recipients, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Broadcast to {email} in conversation {conversation_id} failed: {result!r}")
+            else:
+                delivered.append(email)
+        return delivered
 
-        return delivered  
 
+    async def send_personal(self, conversation_id: int, email: str, message: dict):
+        """Send an event to one participant's socket; returns True once it was sent."""
+        ws = self.active_connections.get(conversation_id, {}).get(email)
+        if ws is None:
+            return False
+        try:
+            await self._deliver(ws, message)
+            return True
+        except Exception as e:
+            logger.warning(f"Sending to {email} in conversation {conversation_id} failed: {e!r}")
+            return False
 
     def is_connected(self, conversation_id: int, email: str):
         return email in self.active_connections.get(conversation_id, {})
@@ -0,0 +1,163 @@
+"""
+Shared setup of the test suite. Run from the project root:
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+
+configuration/config.ini ships placeholder database credentials, which the
+module-level AsyncDBConnect cannot decode; they are replaced with
+well-formed dummy values before any module under src is imported. Nothing
+connects to MySQL: tests that need a database get their own SQLite file.
+"""
+import base64
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.commons.config_manager import cfg  # noqa: E402
+from src.constants.constants import Constants  # noqa: E402
+
+
+def _b64(value: str) -> str:
+    return base64.b64encode(value.encode()).decode()
+
+
+_database_section = cfg.get_env_config(Constants.DATABASE)
+for _key, _value in {
+    Constants.DB_USER: "test",
+    Constants.DB_PASSWORD: "test",
+    Constants.DB_HOST: "localhost",
+    Constants.DATABASE_NAME: "test",
+    Constants.DB_PORT: "3306",
+    Constants.POOL_RECYCLE: "3600",
+}.items():
+    cfg.obj_config[_database_section][_key] = _b64(_value)
+
+def pytest_configure(config):
+    # Every AsyncDBConnect of the suite maps the same tables on the shared declarative base.
+    config.addinivalue_line(
+        "filterwarnings", "ignore:This declarative base already contains:sqlalchemy.exc.SAWarning"
+    )
+
+
+SCHEMA = """
+CREATE TABLE user (
+    uid INTEGER PRIMARY KEY,
+    email TEXT UNIQUE,
+    first_name TEXT,
+    last_name TEXT,
+    profile_image TEXT,
+    created_on TEXT,
+    password TEXT,
+    updated_at DATETIME
+);
+CREATE TABLE notes (
+    id INTEGER PRIMARY KEY,
+    body TEXT
+);
+CREATE TABLE conversation (
+    conversation_id INTEGER PRIMARY KEY,
+    conversation_name TEXT,
+    conversation_type TEXT,
+    created_by INTEGER,
+    created_on DATETIME,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    pair_key TEXT UNIQUE
+);
+CREATE TABLE conversation_participants (
+    conversation_id INTEGER,
+    uid INTEGER,
+    joined_on DATETIME,
+    role TEXT,
+    receipt_version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (conversation_id, uid)
+);
+CREATE TABLE messages (
+    message_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER,
+    uid INTEGER,
+    body TEXT,
+    sent_at DATETIME,
+    seq INTEGER,
+    journal_id TEXT UNIQUE
+);
+CREATE TABLE messages_archive (
+    message_id INTEGER PRIMARY KEY,
+    conversation_id INTEGER,
+    uid INTEGER,
+    body TEXT,
+    sent_at DATETIME,
+    seq INTEGER,
+    journal_id TEXT UNIQUE,
+    archived_at DATETIME
+);
+CREATE TABLE receipts (
+    message_id INTEGER,
+    uid INTEGER,
+    status TEXT,
+    updated_at DATETIME,
+    updated_seq INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (message_id, uid)
+);
+CREATE TABLE conversation_cleared (
+    uid INTEGER,
+    conversation_id INTEGER,
+    cleared_at DATETIME,
+    cleared_seq INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (uid, conversation_id)
+);
+CREATE TABLE data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO data_versions (name, version) VALUES ('users', 0), ('history', 0);
+"""
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    AsyncDBConnect on a fresh SQLite file holding `user` (7 users, uid N is
+    userN@example.com), empty conversation tables and a scratch `notes` table.
+    """
+    from src.utils.db_utils import AsyncDBConnect
+
+    path = tmp_path / "test.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO user (email, first_name, last_name) VALUES (?, ?, ?)",
+            [(f"user{i}@example.com", f"First{i}", f"Last{i}") for i in range(1, 8)],
+        )
+    return AsyncDBConnect(f"sqlite+aiosqlite:///{path}", [])
+
+
+class JSONRequest:
+    """The parts of a starlette Request the endpoints read: the JSON body and the headers."""
+
+    def __init__(self, body, headers=None):
+        self.body = body
+        self.headers = headers or {}
+
+    async def json(self):
+        return self.body
+
+
+@pytest.fixture
+def app_db(db, monkeypatch):
+    """`db` in place of the module-level db_connect of every module under src, with empty lookup caches."""
+    import src.commons.fetch_response  # noqa: F401  (imported so its db_connect is replaced too)
+    from src.utils import db_utils
+    from src.utils.lookup_cache import identity_cache, membership_cache
+    from src.utils.response_cache import response_cache
+
+    shared = db_utils.db_connect
+    for name, module in list(sys.modules.items()):
+        if name.startswith("src.") and getattr(module, "db_connect", None) is shared:
+            monkeypatch.setattr(module, "db_connect", db)
+    for backend in (identity_cache.backend, membership_cache.backend, response_cache.backend):
+        backend.clear()
+    return db
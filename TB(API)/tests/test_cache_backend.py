@@ -0,0 +1,107 @@
+import asyncio
+import json
+import time
+
+from src.constants.constants import Constants
+from src.utils.cache_backend import InvalidationBus, MemoryCacheBackend
+
+
+def _backend(max_bytes=1024, ttl=60.0, bus=None) -> MemoryCacheBackend:
+    return MemoryCacheBackend("test", max_bytes, ttl, bus)
+
+
+def test_put_then_get_returns_the_value():
+    async def scenario():
+        backend = _backend()
+        await backend.put("k", b"value", ["user:a"], await backend.token())
+        return await backend.get("k"), await backend.get("missing")
+
+    assert asyncio.run(scenario()) == (b"value", None)
+
+
+def test_invalidate_evicts_every_entry_of_the_tag():
+    async def scenario():
+        backend = _backend()
+        token = await backend.token()
+        await backend.put("a", b"1", ["user:a", "profile:b"], token)
+        await backend.put("b", b"2", ["user:b"], token)
+        await backend.invalidate("profile:b")
+        return await backend.get("a"), await backend.get("b")
+
+    assert asyncio.run(scenario()) == (None, b"2")
+
+
+def test_put_is_refused_after_an_invalidation_of_its_tags():
+    async def scenario():
+        backend = _backend()
+        token = await backend.token()
+        # A write invalidates while the reader is still running its queries.
+        await backend.invalidate("user:a")
+        await backend.put("stale", b"old", ["user:a"], token)
+        await backend.put("other", b"ok", ["user:b"], token)
+        return await backend.get("stale"), await backend.get("other")
+
+    assert asyncio.run(scenario()) == (None, b"ok")
+
+
+def test_clear_refuses_tokens_handed_out_before_it():
+    async def scenario():
+        backend = _backend()
+        token = await backend.token()
+        backend.clear()
+        await backend.put("k", b"v", ["user:a"], token)
+        return await backend.get("k")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_least_recently_used_entries_go_first_when_over_max_bytes():
+    async def scenario():
+        backend = _backend(max_bytes=10)
+        token = await backend.token()
+        await backend.put("a", b"aaaa", [], token)
+        await backend.put("b", b"bbbb", [], token)
+        await backend.get("a")
+        await backend.put("c", b"cccc", [], token)
+        return [await backend.get(key) for key in ("a", "b", "c")], backend.stats()[Constants.CACHE_BYTES]
+
+    values, size = asyncio.run(scenario())
+    assert values == [b"aaaa", None, b"cccc"]
+    assert size == 8
+
+
+def test_entries_expire_after_the_ttl():
+    async def scenario():
+        backend = _backend(ttl=0.01)
+        await backend.put("k", b"v", [], await backend.token())
+        time.sleep(0.02)
+        return await backend.get("k")
+
+    assert asyncio.run(scenario()) is None
+
+
+class _RecordingClient:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+def test_invalidations_are_published_and_applied_by_other_workers():
+    async def scenario():
+        client = _RecordingClient()
+        sender_bus, receiver_bus = InvalidationBus(client, "chan"), InvalidationBus(client, "chan")
+        sender, receiver = _backend(bus=sender_bus), _backend(bus=receiver_bus)
+        sender_bus.register(sender)
+        receiver_bus.register(receiver)
+        await receiver.put("k", b"v", ["conversation:1"], await receiver.token())
+
+        await sender.invalidate("conversation:1")
+        (channel, message), = client.published
+        receiver_bus._apply(json.dumps(message))
+        # A worker ignores its own messages.
+        sender_bus._apply(json.dumps(message))
+        return channel, message[Constants.CACHE_TAGS], await receiver.get("k")
+
+    assert asyncio.run(scenario()) == ("chan", ["conversation:1"], None)
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+
+REQUESTER = "user1@example.com"
+OTHERS = [f"user{i}@example.com" for i in range(2, 8)]
+
+
+async def _all_pages(db, limit, exclude_uids=None):
+    pages, cursor = [], None
+    while True:
+        users, cursor = await db.get_directory_page(REQUESTER, exclude_uids, after_email=cursor, limit=limit)
+        pages.append(list(users))
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_the_directory_once_in_email_order(db):
+    pages = asyncio.run(_all_pages(db, limit=4))
+    assert pages == [OTHERS[:4], OTHERS[4:]]
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    pages = asyncio.run(_all_pages(db, limit=3))
+    assert pages == [OTHERS[:3], OTHERS[3:]]
+
+
+def test_page_carries_names(db):
+    users, _ = asyncio.run(db.get_directory_page(REQUESTER, limit=1))
+    assert users == {"user2@example.com": {"first_name": "First2", "last_name": "Last2"}}
+
+
+def test_excluded_users_are_skipped_without_short_pages(db):
+    # uids follow the insertion order: user2 is uid 2, user3 is uid 3.
+    pages = asyncio.run(_all_pages(db, limit=2, exclude_uids={2, 3}))
+    assert pages == [OTHERS[2:4], OTHERS[4:]]
+
+
+def test_stream_resumes_after_the_cursor(db):
+    async def scenario():
+        return [user["email"] async for user in db.stream_directory(REQUESTER, after_email=OTHERS[1])]
+
+    assert asyncio.run(scenario()) == OTHERS[2:]
+
+
+@pytest.mark.parametrize("paging", [{}, {Constants.LIMIT: 2}, {Constants.STREAM: True}])
+def test_direct_users_of_an_unknown_requester_is_an_error(app_db, paging):
+    from src.commons.fetch_response import get_direct_users
+
+    response = asyncio.run(get_direct_users(JSONRequest({Constants.JWT_PARAM_EMAIL: "stranger@example.com", **paging})))
+    assert response.status_code == Constants.USER_EXISTENCE_ERROR
+    assert Constants.USERS_STRING not in json.loads(response.body)
+
+
+def test_direct_users_page_of_a_known_requester(app_db):
+    from src.commons.fetch_response import get_direct_users
+
+    response = asyncio.run(get_direct_users(JSONRequest({Constants.JWT_PARAM_EMAIL: REQUESTER, Constants.LIMIT: 2})))
+    assert response.status_code == Constants.SUCCESS_CODE
+    assert list(json.loads(response.body)[Constants.USERS_STRING]) == OTHERS[:2]
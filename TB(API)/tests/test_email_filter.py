@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+from src.utils.email_filter import EmailFilter, _BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives_and_keeps_its_rate():
+    bloom = _BloomFilter(10000, 0.01, 1 << 20)
+    for i in range(10000):
+        bloom.add(f"user{i}@example.com")
+
+    assert all(f"user{i}@example.com" in bloom for i in range(10000))
+    false_positives = sum(f"stranger{i}@example.com" in bloom for i in range(10000))
+    assert false_positives < 10000 * 0.02
+    assert len(bloom) <= 10000
+
+
+def test_bloom_filter_is_capped_at_max_bytes():
+    bloom = _BloomFilter(1000000, 0.001, 1024)
+    assert bloom.bytes == 1024
+
+
+def _ready_filter(emails, bus=None, single_worker=False) -> EmailFilter:
+    email_filter = EmailFilter()
+    email_filter._bus = bus
+    email_filter.single_worker = single_worker
+    email_filter._filter = _BloomFilter(1000, 0.001, 1 << 16)
+    for email in emails:
+        email_filter._filter.add(email)
+    email_filter.ready = True
+    return email_filter
+
+
+def test_miss_is_trusted_with_a_single_worker_or_the_invalidation_channel():
+    endpoint = Constants.SIGNIN_ENDPOINT
+    without_channel = _ready_filter(["user1@example.com"])
+    with_channel = _ready_filter(["user1@example.com"], bus=object())
+    single_worker = _ready_filter(["user1@example.com"], single_worker=True)
+
+    assert without_channel.might_exist("USER1@example.com", endpoint)
+    assert with_channel.might_exist("user1@example.com", endpoint)
+    # Without the channel a signup on another worker may be missing here.
+    assert without_channel.might_exist("new@example.com", endpoint)
+    assert not with_channel.might_exist("new@example.com", endpoint)
+    assert not single_worker.might_exist("new@example.com", endpoint)
+
+
+def test_every_email_passes_until_the_filter_is_built():
+    email_filter = EmailFilter()
+    email_filter._bus = object()
+    assert email_filter.might_exist("anyone@example.com", Constants.SIGNIN_ENDPOINT)
+
+
+def test_signin_of_an_unknown_email_skips_the_database_by_default(monkeypatch):
+    from src.commons import fetch_response
+
+    default_filter = EmailFilter()
+    assert default_filter._bus is None
+    default_filter._filter = _BloomFilter(1000, 0.001, 1 << 16)
+    default_filter._filter.add("user1@example.com")
+    default_filter.ready = True
+    lookups = []
+
+    async def get_data(table, **filters):
+        lookups.append(filters)
+        return None
+
+    monkeypatch.setattr(fetch_response, "email_filter", default_filter)
+    monkeypatch.setattr(fetch_response.db_connect, "get_data", get_data)
+
+    async def signin(email):
+        response = await fetch_response.user_signin(JSONRequest({
+            Constants.SIGNIN_PARAM_EMAIL: email, Constants.SIGNIN_PARAM_PWD: "secret",
+        }))
+        return json.loads(response.body)[Constants.STATUS_CODE_KEY]
+
+    assert asyncio.run(signin("stranger@example.com")) == Constants.USER_EXISTENCE_ERROR
+    assert lookups == []
+    asyncio.run(signin("user1@example.com"))
+    assert lookups == [{"email": "user1@example.com"}]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import text
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+from src.utils.etags import etags
+
+REQUESTER = "user1@example.com"
+
+
+@pytest.fixture
+def etag_db(app_db, monkeypatch):
+    monkeypatch.setattr(etags, "enabled", True)
+
+    async def seed():
+        async with app_db.session() as session:
+            async with session.begin():
+                await session.execute(text(
+                    "INSERT INTO conversation (conversation_id, conversation_type, last_seq) VALUES (1, 'private', 1)"
+                ))
+                await session.execute(text(
+                    "INSERT INTO conversation_participants (conversation_id, uid) VALUES (1, 1), (1, 2)"
+                ))
+                await session.execute(text(
+                    "INSERT INTO messages (message_id, conversation_id, uid, body, sent_at, seq)"
+                    " VALUES (1, 1, 2, 'hello', '2024-01-01 00:00:00.000000', 1)"
+                ))
+
+    asyncio.run(seed())
+    return app_db
+
+
+async def _execute(db, statement):
+    async with db.session() as session:
+        async with session.begin():
+            await session.execute(text(statement))
+
+
+async def _get_messages(etag=None):
+    from src.commons.fetch_response import get_messages
+
+    headers = {Constants.IF_NONE_MATCH_HEADER: etag} if etag else {}
+    request = JSONRequest({Constants.JWT_PARAM_EMAIL: REQUESTER, Constants.MESSAGE_CONVERSATION_ID: 1}, headers)
+    response = await get_messages(request)
+    return response.status_code, response.headers.get(Constants.ETAG_HEADER)
+
+
+def test_unchanged_messages_answer_304_with_the_same_tag(etag_db):
+    async def scenario():
+        first = await _get_messages()
+        again = await _get_messages(first[1])
+        weak = await _get_messages(f"W/{first[1]}, \"other\"")
+        return first, again, weak
+
+    (status, etag), again, weak = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE and etag
+    assert again == (Constants.NOT_MODIFIED, etag)
+    assert weak == (Constants.NOT_MODIFIED, etag)
+
+
+@pytest.mark.parametrize("change", [
+    # A new message or clear moves the conversation sequence.
+    "UPDATE conversation SET last_seq = last_seq + 1 WHERE conversation_id = 1",
+    # A delivery or read bumps the recipient's receipt counter.
+    "UPDATE conversation_participants SET receipt_version = receipt_version + 1 WHERE uid = 2",
+    # Profile changes and history imports advance data_versions.
+    "UPDATE data_versions SET version = version + 1 WHERE name = 'users'",
+    "UPDATE data_versions SET version = version + 1 WHERE name = 'history'",
+])
+def test_changes_the_response_depends_on_change_the_tag(etag_db, change):
+    async def scenario():
+        _, etag = await _get_messages()
+        await _execute(etag_db, change)
+        return etag, await _get_messages(etag)
+
+    etag, (status, new_etag) = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE
+    assert new_etag != etag
+
+
+def test_all_users_tag_follows_the_users_version(etag_db):
+    from src.commons.fetch_response import get_all_users
+
+    async def get_all(etag=None):
+        headers = {Constants.IF_NONE_MATCH_HEADER: etag} if etag else {}
+        response = await get_all_users(JSONRequest({Constants.JWT_PARAM_EMAIL: REQUESTER}, headers))
+        return response.status_code, response.headers.get(Constants.ETAG_HEADER), response.body
+
+    async def scenario():
+        status, etag, body = await get_all()
+        not_modified = await get_all(etag)
+        await etags.bump(Constants.USERS_VERSION)
+        return status, body, etag, not_modified, await get_all(etag)
+
+    status, body, etag, not_modified, after_bump = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE and len(json.loads(body)[Constants.USERS_STRING]) == 6
+    assert not_modified[:2] == (Constants.NOT_MODIFIED, etag)
+    assert after_bump[0] == Constants.SUCCESS_CODE and after_bump[1] != etag
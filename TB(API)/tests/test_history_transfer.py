@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from src.constants.constants import Constants
+from src.utils.history_transfer import HistoryImporter
+
+
+def _message(message_id, journal_id=None):
+    return {
+        Constants.RECORD: Constants.MESSAGE_RECORD, "message_id": message_id, "conversation_id": 1,
+        "uid": 1, "body": f"message {message_id}", "sent_at": "2026-01-01T10:00:00.000000Z",
+        "seq": message_id, "journal_id": journal_id or f"j{message_id}",
+    }
+
+
+def _receipt(message_id, uid):
+    return {
+        Constants.RECORD: Constants.RECEIPT_RECORD, "message_id": message_id, "uid": uid,
+        "status": "read", "updated_at": "2026-01-01T10:00:00.000000Z", "conversation_id": 1,
+    }
+
+
+async def _import(records):
+    importer = HistoryImporter(batch_size=2)
+    for record in records:
+        await importer.add(record)
+    for kind in HistoryImporter.TABLES:
+        await importer._flush(kind)
+    return importer.counts
+
+
+def test_counts_only_the_rows_inserted(app_db):
+    records = [_message(1), _message(2), _message(3), _receipt(1, 2), _receipt(2, 2)]
+    first = asyncio.run(_import(records))
+    # A re-run after an interruption inserts, and counts, only what is missing.
+    second = asyncio.run(_import(records + [_message(4), _receipt(4, 2)]))
+
+    assert first[Constants.MESSAGE_RECORD] == 3 and first[Constants.RECEIPT_RECORD] == 2
+    assert second[Constants.MESSAGE_RECORD] == 1 and second[Constants.RECEIPT_RECORD] == 1
+
+
+def test_rejected_rows_fail_the_import(app_db):
+    asyncio.run(_import([_message(1)]))
+    with pytest.raises(ValueError, match=Constants.MESSAGE_RECORD):
+        # Same journal_id under a new message id: the database rejects the row.
+        asyncio.run(_import([_message(2, journal_id="j1")]))
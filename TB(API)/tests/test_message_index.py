@@ -0,0 +1,103 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+from src.utils.message_index import MessageIndex, Segment, tokenize
+
+
+def _postings(segment, term, conversation_ids=None):
+    with open(segment.path, "rb") as segment_file:
+        return {conv_id: list(ids) for conv_id, ids in segment.postings(term, conversation_ids, segment_file).items()}
+
+
+def test_tokenize_lowercases_and_drops_short_tokens():
+    assert tokenize("Dinner on Friday, a DINNER!") == {"dinner", "on", "friday"}
+
+
+def test_segment_round_trip_reads_postings_from_disk(tmp_path):
+    path = str(tmp_path / Constants.INDEX_SEGMENT_NAME.format(1))
+    postings = [("dinner", {1: [10, 12], 2: [20]}), ("friday", {1: [12]})]
+    written = Segment.write(1, path, iter(postings), {Constants.POOL_DEFAULT: 20})
+    loaded = Segment.load(1, path)
+    assert loaded.max_message_ids == {Constants.POOL_DEFAULT: 20}
+    assert loaded.size == written.size == 4
+    assert _postings(loaded, "dinner") == {1: [10, 12], 2: [20]}
+    assert _postings(loaded, "missing") == {}
+
+
+def test_postings_only_cover_the_requested_conversations(tmp_path, monkeypatch):
+    path = str(tmp_path / "a.idx")
+    by_conv = {conv_id: [conv_id * 10] for conv_id in range(1, 501)}
+    segment = Segment.write(1, path, iter([("hello", by_conv)]), {})
+    assert _postings(segment, "hello", {7, 250, 999}) == {7: [70], 250: [2500]}
+    # Large conversation tables are binary searched instead of read whole.
+    monkeypatch.setattr(Constants, "SEGMENT_TABLE_READ_BYTES", 0)
+    assert _postings(segment, "hello", {1, 7, 500, 999}) == {1: [10], 7: [70], 500: [5000]}
+
+
+def test_merge_unions_postings_and_watermarks(tmp_path):
+    first = Segment.write(
+        1, str(tmp_path / "a.idx"), iter([("dinner", {1: [10]})]), {Constants.POOL_DEFAULT: 10, "shard0": 5}
+    )
+    second = Segment.write(
+        2, str(tmp_path / "b.idx"), iter([("dinner", {1: [10, 11]}), ("party", {3: [30]})]),
+        {Constants.POOL_DEFAULT: 11},
+    )
+    merged = Segment.merge(3, str(tmp_path / "c.idx"), [first, second])
+    assert _postings(merged, "dinner") == {1: [10, 11]}
+    assert _postings(merged, "party") == {3: [30]}
+    assert merged.max_message_ids == {Constants.POOL_DEFAULT: 11, "shard0": 5}
+
+
+def test_search_intersects_terms_across_segments_and_buffer(tmp_path):
+    async def scenario():
+        index = MessageIndex()
+        index.directory = str(tmp_path)
+        index.flush_docs = 1000
+        index.add(1, 10, "dinner on friday")
+        index.add(1, 11, "dinner plans")
+        await index.flush()
+        index.add(1, 12, "Friday dinner again")
+        index.add(2, 13, "friday dinner elsewhere")
+        return await index.search("friday dinner", [1]), await index.search("plans", [2])
+
+    assert asyncio.run(scenario()) == ([12, 10], [])
+
+
+def test_segments_of_an_older_format_are_dropped(tmp_path):
+    old = tmp_path / Constants.INDEX_SEGMENT_NAME.format(1)
+    old.write_bytes(b'{"terms":{},"size":0,"max_message_id":{"default":99}}\n' + Constants.SEGMENT_FOOTER.format(0).encode())
+    index = MessageIndex()
+    index.directory = str(tmp_path)
+    assert index._load_segments() == []
+    assert not old.exists()
+
+
+def test_search_before_the_index_is_ready_includes_archived_messages(app_db, monkeypatch):
+    from src.commons import fetch_response
+
+    monkeypatch.setattr(fetch_response.message_index, "ready", False)
+    monkeypatch.setattr(fetch_response.message_archiver, "enabled", True)
+
+    async def scenario():
+        sent_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        async with app_db.session() as session:
+            async with session.begin():
+                await session.execute(text("INSERT INTO conversation (conversation_id, last_seq) VALUES (1, 2)"))
+                await session.execute(text("INSERT INTO conversation_participants (conversation_id, uid) VALUES (1, 1), (1, 2)"))
+                for table, message_id in (("messages_archive", 1), ("messages", 2)):
+                    await session.execute(text(
+                        f"INSERT INTO {table} (message_id, conversation_id, uid, body, sent_at, seq)"
+                        " VALUES (:m, 1, 2, 'dinner on friday', :t, :m)"
+                    ), {"m": message_id, "t": sent_at})
+        response = await fetch_response.search_messages(JSONRequest({
+            Constants.JWT_PARAM_EMAIL: "user1@example.com", Constants.SEARCH_QUERY: "Friday dinner",
+        }))
+        return json.loads(response.body)
+
+    body = asyncio.run(scenario())
+    assert [m[Constants.MESSAGE_ID] for m in body[Constants.MESSAGES_STRING_LOWER]] == [2, 1]
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.constants.constants import Constants
+from src.utils.message_journal import MessageJournal, fcntl, lock_folder
+
+
+def _journal(root) -> MessageJournal:
+    journal = MessageJournal()
+    journal.root = str(root)
+    journal.fsync_interval = 0
+    return journal
+
+
+def _lost_connection():
+    return OperationalError("INSERT INTO messages ...", {}, Exception(2013, "Lost connection"))
+
+
+def _foreign_key_violation():
+    return IntegrityError("INSERT INTO messages ...", {}, Exception(1452, "Cannot add a child row"))
+
+
+async def _append(journal, *journal_ids):
+    for journal_id in journal_ids:
+        await journal.append({Constants.JOURNAL_ID: journal_id})
+
+
+def test_replay_applies_records_in_order_and_removes_segments(tmp_path):
+    applied = []
+
+    async def handler(record):
+        applied.append(record[Constants.JOURNAL_ID])
+
+    async def scenario():
+        journal = _journal(tmp_path)
+        journal._handler = handler
+        await _append(journal, "m1", "m2", "m3")
+        await journal.replay()
+        segments = journal._closed_segments()
+        await journal.stop()
+        return segments
+
+    assert asyncio.run(scenario()) == []
+    assert applied == ["m1", "m2", "m3"]
+    # The worker folder goes away with its last segment.
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("worker-")]
+
+
+def test_rejected_record_is_dead_lettered_and_skipped(tmp_path):
+    applied = []
+
+    async def handler(record):
+        if record[Constants.JOURNAL_ID] == "poison":
+            raise _foreign_key_violation()
+        applied.append(record[Constants.JOURNAL_ID])
+
+    async def scenario():
+        journal = _journal(tmp_path)
+        journal._handler = handler
+        await _append(journal, "m1", "poison", "m2")
+        await journal.replay()
+        await journal.stop()
+
+    asyncio.run(scenario())
+    assert applied == ["m1", "m2"]
+    with open(tmp_path / Constants.JOURNAL_DEAD_LETTER_NAME, encoding=Constants.UTF_8_ENCODING) as dead_letters:
+        entries = [json.loads(line) for line in dead_letters]
+    assert [entry[Constants.JOURNAL_RECORD][Constants.JOURNAL_ID] for entry in entries] == ["poison"]
+    assert "1452" in entries[0][Constants.JOURNAL_ERROR]
+
+
+def test_outage_pauses_replay_and_resumes_without_reapplying(tmp_path):
+    applied = []
+    database_down = True
+
+    async def handler(record):
+        if database_down and record[Constants.JOURNAL_ID] == "m3":
+            raise _lost_connection()
+        applied.append(record[Constants.JOURNAL_ID])
+
+    async def scenario():
+        nonlocal database_down
+        journal = _journal(tmp_path)
+        journal._handler = handler
+        await _append(journal, "m1", "m2", "m3", "m4")
+        with pytest.raises(OperationalError):
+            await journal.replay()
+        assert applied == ["m1", "m2"]
+
+        database_down = False
+        await journal.replay()
+        await journal.stop()
+
+    asyncio.run(scenario())
+    assert applied == ["m1", "m2", "m3", "m4"]
+    assert not os.path.exists(tmp_path / Constants.JOURNAL_DEAD_LETTER_NAME)
+
+
+@pytest.mark.skipif(fcntl is None, reason="folder locks need fcntl")
+def test_folder_of_exited_worker_is_adopted_and_live_one_left_alone(tmp_path):
+    applied = []
+
+    async def handler(record):
+        applied.append(record[Constants.JOURNAL_ID])
+
+    def orphan_folder(name, journal_id):
+        folder = tmp_path / Constants.JOURNAL_WORKER_DIR.format(name)
+        folder.mkdir()
+        (folder / Constants.JOURNAL_LOCK_NAME).touch()
+        segment = folder / Constants.JOURNAL_SEGMENT_NAME.format(1)
+        segment.write_text(json.dumps({Constants.JOURNAL_ID: journal_id}) + "\n")
+        return folder
+
+    exited = orphan_folder("exited", "from-exited")
+    live = orphan_folder("live", "from-live")
+    live_lock = lock_folder(str(live), blocking=False)
+
+    async def scenario():
+        journal = _journal(tmp_path)
+        journal._claim()
+        journal._handler = handler
+        await journal.replay()
+        await journal.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        live_lock.close()
+    assert applied == ["from-exited"]
+    assert not exited.exists()
+    assert (live / Constants.JOURNAL_SEGMENT_NAME.format(1)).exists()
+
+
+def test_every_released_append_is_fsynced_across_rotations(tmp_path, monkeypatch):
+    synced = {}
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        fsync(fd)
+        status = os.fstat(fd)
+        synced[status.st_ino] = status.st_size
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+
+    async def scenario():
+        journal = _journal(tmp_path)
+        journal.segment_max_bytes = 60
+        await asyncio.gather(*(_append(journal, *(f"m{i}-{j}" for j in range(5))) for i in range(8)))
+        segments = journal._segments(journal.directory)
+        stats = [os.stat(path) for path in segments]
+        await journal.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert len(stats) > 2
+    # Whatever an appender was told is durable is within the fsynced size of its segment.
+    assert all(synced.get(status.st_ino) == status.st_size for status in stats if status.st_size)
+
+
+def test_segment_size_counts_bytes(tmp_path):
+    async def scenario():
+        journal = _journal(tmp_path)
+        await journal.append({Constants.JOURNAL_ID: "m1", "body": "héllo ✓"})
+        size = journal._segment_bytes, os.path.getsize(journal._segment_path(journal._segment_index))
+        await journal.stop()
+        return size
+
+    counted, on_disk = asyncio.run(scenario())
+    assert counted == on_disk
@@ -0,0 +1,83 @@
+import asyncio
+
+from sqlalchemy import text
+
+from src.constants.constants import Constants
+from src.utils.metrics import metrics
+
+
+def test_validation_warms_every_pool_to_min_idle(db):
+    db.min_idle = 3
+
+    async def scenario():
+        await db.validate_pools()
+        idle = {name: engine.pool.checkedin() for name, engine in db.engines.items()}
+        await db.dispose()
+        return idle
+
+    idle = asyncio.run(scenario())
+    assert set(idle) == set(Constants.POOL_WORKLOADS)
+    assert all(count == 3 for count in idle.values())
+
+
+def test_validation_never_opens_more_than_the_pool_size(db):
+    db.min_idle = 50
+
+    async def scenario():
+        await db.validate_pools()
+        engine = db.engines[Constants.POOL_DEFAULT]
+        idle, size = engine.pool.checkedin(), engine.pool.size()
+        await db.dispose()
+        return idle, size
+
+    idle, size = asyncio.run(scenario())
+    assert idle == size
+
+
+def test_broken_idle_connection_is_replaced(db):
+    name = Constants.POOL_DEFAULT
+    counter = Constants.METRIC_POOL_INVALIDATED.format(name)
+    db.min_idle = 1
+
+    async def scenario():
+        engine = db.engines[name]
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            # The server side of this pooled connection goes away while it is idle.
+            await raw.driver_connection.close()
+        before = metrics.counters[counter]
+        await db._validate_pool(name)
+        invalidated = metrics.counters[counter] - before
+        async with engine.connect() as conn:
+            answer = await conn.scalar(text("SELECT 1"))
+        await db.dispose()
+        return invalidated, answer
+
+    invalidated, answer = asyncio.run(scenario())
+    assert invalidated == 1
+    assert answer == 1
+
+
+def test_maintenance_validates_periodically_and_starts_once(db, monkeypatch):
+    runs = []
+
+    async def validate_pools():
+        runs.append(1)
+
+    monkeypatch.setattr(db, "validate_pools", validate_pools)
+    db.validation_interval = 0.01
+
+    async def scenario():
+        await db.start_pool_maintenance()
+        task = db._maintenance_task
+        await db.start_pool_maintenance()
+        await asyncio.sleep(0.05)
+        same_task = db._maintenance_task is task
+        await db.dispose()
+        await asyncio.sleep(0)
+        return same_task, task.cancelled() or task.done(), db._maintenance_task
+
+    same_task, stopped, remaining = asyncio.run(scenario())
+    assert same_task and stopped and remaining is None
+    # One pre-warm at startup, then the periodic validations.
+    assert len(runs) >= 3
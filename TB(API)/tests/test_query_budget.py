@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from src.constants.constants import Constants
+from src.utils.query_budget import QueryBudgetManager
+
+
+class _URL:
+    def __init__(self, path):
+        self.path = path
+
+
+class _Request:
+    def __init__(self, path):
+        self.url = _URL(path)
+
+    async def body(self):
+        return b"{}"
+
+    async def is_disconnected(self):
+        return False
+
+
+def _manager(default_ms):
+    manager = QueryBudgetManager()
+    manager.enabled = True
+    manager.default_ms = default_ms
+    manager.grace = 0.01
+    return manager
+
+
+def test_only_read_only_routes_have_a_budget():
+    manager = QueryBudgetManager()
+    assert manager.budget_for("/user/conversations") > 0
+    for path in ("/user/conversation_start", "/user/message_read", "/user/clear_chat", "/user/signup"):
+        assert manager.budget_for(path) == 0
+
+
+def test_write_route_runs_past_the_budget_untouched():
+    manager = _manager(default_ms=10)
+    cancelled = []
+
+    async def cancel(budget):
+        cancelled.append(budget)
+
+    manager.cancel = cancel
+
+    async def slow_write(request):
+        await asyncio.sleep(0.05)
+        return "written"
+
+    assert asyncio.run(manager.run(_Request("/api/user/message_read"), slow_write)) == "written"
+    assert cancelled == []
+
+
+def test_read_route_past_its_budget_gets_a_504():
+    # No [QUERY_TIMEOUT] entry of its own: DEFAULT_MS applies.
+    manager = _manager(default_ms=10)
+
+    async def slow_read(request):
+        await asyncio.sleep(1)
+
+    response = asyncio.run(manager.run(_Request("/api/user/fetch_profile"), slow_read))
+    body = json.loads(response.body)
+    assert response.status_code == Constants.GATEWAY_TIMEOUT
+    assert body[Constants.REASON] == Constants.BUDGET_EXCEEDED
+    assert body[Constants.BUDGET_MS] == 10
@@ -0,0 +1,64 @@
+import pytest
+
+from src.commons.config_manager import cfg
+from src.constants.constants import Constants
+from src.utils import rate_limiter as rate_limiter_module
+from src.utils.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _limiter(monkeypatch, **settings):
+    values = {
+        Constants.RATE_LIMIT_ENABLED: Constants.YES,
+        Constants.RATE_LIMIT_CONNECTION_RATE: "10", Constants.RATE_LIMIT_CONNECTION_BURST: "10",
+        Constants.RATE_LIMIT_USER_RATE: "1", Constants.RATE_LIMIT_USER_BURST: "2",
+        **settings,
+    }
+    monkeypatch.setattr(
+        cfg, "get_value_config_or_default",
+        lambda section, key, default: values.get(key, default) if section == Constants.RATE_LIMIT else default,
+    )
+    return RateLimiter()
+
+
+def test_idle_user_buckets_are_swept_once_refilled(monkeypatch, clock):
+    limiter = _limiter(monkeypatch)
+    for i in range(100):
+        limiter.register(i, f"user{i}")
+        assert limiter.acquire(i, f"user{i}") == 0
+        limiter.release(i, f"user{i}")
+
+    # Drained buckets survive the socket, so reconnecting does not reset the limit.
+    assert len(limiter._user_buckets) == 100
+    clock[0] += 2
+    limiter.register(100, "user100")
+    limiter.release(100, "user100")
+    assert limiter._user_buckets == {}
+
+
+def test_bucket_of_a_connected_user_is_kept(monkeypatch, clock):
+    limiter = _limiter(monkeypatch)
+    limiter.register(1, "user1")
+    limiter.register(2, "user1")
+    limiter.release(1, "user1")
+    clock[0] += 10
+    limiter.release(3, "user3")
+    assert "user1" in limiter._user_buckets
+    assert limiter.acquire(2, "user1") == 0
+
+
+@pytest.mark.parametrize("settings", [
+    {Constants.RATE_LIMIT_USER_RATE: "0"},
+    {Constants.RATE_LIMIT_CONNECTION_RATE: "-1"},
+    {Constants.RATE_LIMIT_USER_BURST: "0.5"},
+])
+def test_invalid_limits_are_rejected(monkeypatch, settings):
+    with pytest.raises(ValueError):
+        _limiter(monkeypatch, **settings)
+    _limiter(monkeypatch, **settings, **{Constants.RATE_LIMIT_ENABLED: Constants.NO})
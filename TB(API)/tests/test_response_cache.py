@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi.responses import JSONResponse
+
+from src.constants.constants import Constants
+from src.utils.cache_backend import MemoryCacheBackend
+from src.utils.response_cache import ResponseCache
+
+
+def _cache() -> ResponseCache:
+    cache = ResponseCache()
+    cache.enabled = True
+    cache.backend = MemoryCacheBackend(Constants.RESPONSE_CACHE_NAMESPACE, 1 << 20, 60.0)
+    return cache
+
+
+def test_cached_response_is_served_until_a_tag_is_invalidated():
+    key = (Constants.LIST_FAVORITES_ENDPOINT, "user1@example.com")
+    tags = [Constants.CACHE_TAG_USER.format("user1@example.com"), Constants.CACHE_TAG_PROFILE.format("user2@example.com")]
+
+    async def scenario():
+        cache = _cache()
+        miss = await cache.get(key)
+        token = await cache.token()
+        await cache.put(key, JSONResponse(content={"favorites": [1, 2]}), tags, token)
+        hit = await cache.get(key)
+        # The other participant renames themselves.
+        await cache.invalidate(Constants.CACHE_TAG_PROFILE.format("user2@example.com"))
+        return miss, hit, await cache.get(key), cache.stats()
+
+    miss, hit, after_invalidation, stats = asyncio.run(scenario())
+    assert miss is None
+    assert hit.status_code == 200
+    assert hit.body == b'{"favorites":[1,2]}'
+    assert after_invalidation is None
+    endpoint_stats = stats[Constants.CACHE_ENDPOINTS][Constants.LIST_FAVORITES_ENDPOINT]
+    assert endpoint_stats[Constants.CACHE_HITS] == 1
+    assert endpoint_stats[Constants.CACHE_MISSES] == 2
+
+
+def test_entries_are_kept_per_user():
+    async def scenario():
+        cache = _cache()
+        token = await cache.token()
+        await cache.put(
+            (Constants.FETCH_PROFILE_ENDPOINT, "user1@example.com"),
+            JSONResponse(content={"email": "user1@example.com"}),
+            [Constants.CACHE_TAG_PROFILE.format("user1@example.com")],
+            token,
+        )
+        return await cache.get((Constants.FETCH_PROFILE_ENDPOINT, "user2@example.com"))
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_disabled_cache_stores_nothing():
+    async def scenario():
+        cache = _cache()
+        cache.enabled = False
+        key = (Constants.FETCH_PROFILE_ENDPOINT, "user1@example.com")
+        await cache.put(key, JSONResponse(content={}), [], await cache.token())
+        return await cache.get(key)
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.constants.constants import Constants
+
+
+def _deadlock():
+    return OperationalError("UPDATE receipts ...", {}, Exception(1213, "Deadlock found when trying to get lock"))
+
+
+def _lock_wait_timeout():
+    return OperationalError("UPDATE receipts ...", {}, Exception(1205, "Lock wait timeout exceeded"))
+
+
+@pytest.fixture
+def retrying_db(db):
+    db.retry_attempts = 3
+    db.retry_base_delay = 0
+    db.retry_max_delay = 0
+    return db
+
+
+async def _notes(db):
+    async with db.session() as session:
+        return (await session.execute(text("SELECT body FROM notes"))).scalars().all()
+
+
+def test_deadlock_replays_the_whole_unit_of_work(retrying_db):
+    sessions = []
+
+    async def work(session):
+        sessions.append(session)
+        await session.execute(text("INSERT INTO notes (body) VALUES ('attempt')"))
+        if len(sessions) == 1:
+            raise _deadlock()
+        if len(sessions) == 2:
+            raise _lock_wait_timeout()
+        return "done"
+
+    async def scenario():
+        result = await retrying_db.run_transaction(work, label="test_retry")
+        return result, await _notes(retrying_db)
+
+    result, notes = asyncio.run(scenario())
+    assert result == "done"
+    assert len(sessions) == 3
+    assert len(set(map(id, sessions))) == 3
+    # The inserts of the failed attempts were rolled back.
+    assert notes == ["attempt"]
+
+
+def test_gives_up_after_max_attempts(retrying_db):
+    attempts = []
+
+    async def work(session):
+        attempts.append(1)
+        raise _deadlock()
+
+    with pytest.raises(OperationalError):
+        asyncio.run(retrying_db.run_transaction(work, label="test_exhausted"))
+    assert len(attempts) == 3
+
+
+def test_other_errors_are_not_retried(retrying_db):
+    attempts = []
+
+    async def work(session):
+        attempts.append(1)
+        raise IntegrityError("INSERT ...", {}, Exception(1062, "Duplicate entry"))
+
+    with pytest.raises(IntegrityError):
+        asyncio.run(retrying_db.run_transaction(work, label="test_not_retryable"))
+    assert attempts == [1]
+
+
+def test_retryable_codes_are_deadlock_and_lock_wait_timeout():
+    assert set(Constants.RETRYABLE_DB_ERROR_CODES) == {1213, 1205}
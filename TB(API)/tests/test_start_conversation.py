@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from sqlalchemy import text
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+
+
+async def _start(creator, participants, conversation_type=Constants.CONVERSATION_TYPE_DIRECT):
+    from src.commons.fetch_response import start_conversation
+
+    response = await start_conversation(JSONRequest({
+        Constants.CREATED_BY_EMAIL: creator,
+        Constants.PARTICIPANTS: participants,
+        Constants.CONVERSATION_TYPE: conversation_type,
+    }))
+    body = json.loads(response.body)
+    assert response.status_code == Constants.SUCCESS_CODE, body
+    return body[Constants.CONVERSATION_ID]
+
+
+async def _count(db, statement):
+    async with db.session() as session:
+        return await session.scalar(text(statement))
+
+
+def test_private_chat_of_a_pair_is_created_once(app_db):
+    async def scenario():
+        first = await _start("user1@example.com", ["user2@example.com"])
+        # The same pair from the other side, and with different casing.
+        reverse = await _start("USER2@example.com", ["user1@example.com"])
+        return first, reverse, await _count(app_db, "SELECT COUNT(*) FROM conversation")
+
+    first, reverse, conversations = asyncio.run(scenario())
+    assert first == reverse
+    assert conversations == 1
+
+
+def test_private_chats_with_several_users_reuse_the_existing_pairs(app_db):
+    async def scenario():
+        existing = await _start("user1@example.com", ["user3@example.com"])
+        ids = await _start(
+            "user1@example.com", ["user2@example.com", "user3@example.com", "user4@example.com"], Constants.PRIVATE
+        )
+        participants = await _count(app_db, "SELECT COUNT(*) FROM conversation_participants")
+        keys = await _count(app_db, "SELECT group_concat(pair_key, ' ') FROM conversation ORDER BY pair_key")
+        return existing, ids, participants, keys
+
+    existing, ids, participants, keys = asyncio.run(scenario())
+    assert len(set(ids)) == 3 and ids[1] == existing[0]
+    assert participants == 6
+    assert sorted(keys.split()) == ["1:2", "1:3", "1:4"]
+
+
+def test_concurrent_requests_for_a_pair_share_one_chat(app_db):
+    async def scenario():
+        results = await asyncio.gather(*(
+            _start(f"user{a}@example.com", [f"user{b}@example.com"]) for a, b in ((5, 6), (6, 5), (5, 6))
+        ))
+        return results, await _count(app_db, "SELECT COUNT(*) FROM conversation")
+
+    results, conversations = asyncio.run(scenario())
+    assert results[0] == results[1] == results[2]
+    assert conversations == 1
+
+
+def test_groups_are_not_deduplicated(app_db):
+    async def scenario():
+        group = ["user2@example.com", "user3@example.com"]
+        return await _start("user1@example.com", group, Constants.GROUP), await _start("user1@example.com", group, Constants.GROUP)
+
+    first, second = asyncio.run(scenario())
+    assert first != second
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from conftest import JSONRequest
+from src.constants.constants import Constants
+
+REQUESTER = "user1@example.com"
+SENT_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+async def _seed(db):
+    """Conversation 1 (user1, user2) with three messages from user2, conversation 2 (user1, user3) with one."""
+    async with db.session() as session:
+        async with session.begin():
+            for conversation_id, partner, messages in ((1, 2, 3), (2, 3, 1)):
+                await session.execute(text(
+                    "INSERT INTO conversation (conversation_id, conversation_type, last_seq) VALUES (:c, 'private', :n)"
+                ), {"c": conversation_id, "n": messages})
+                await session.execute(text(
+                    "INSERT INTO conversation_participants (conversation_id, uid) VALUES (:c, 1), (:c, :p)"
+                ), {"c": conversation_id, "p": partner})
+                for seq in range(1, messages + 1):
+                    message_id = conversation_id * 100 + seq
+                    await session.execute(text(
+                        "INSERT INTO messages (message_id, conversation_id, uid, body, sent_at, seq)"
+                        " VALUES (:m, :c, :p, :b, :t, :s)"
+                    ), {"m": message_id, "c": conversation_id, "p": partner, "b": f"hello {seq}", "t": SENT_AT, "s": seq})
+                    await session.execute(text(
+                        "INSERT INTO receipts (message_id, uid, status, updated_seq) VALUES (:m, 1, 'sent', :s)"
+                    ), {"m": message_id, "s": seq})
+
+
+async def _sync(watermarks):
+    from src.commons.fetch_response import sync_changes
+
+    response = await sync_changes(JSONRequest({Constants.JWT_PARAM_EMAIL: REQUESTER, Constants.WATERMARKS: watermarks}))
+    return response.status_code, json.loads(response.body)
+
+
+async def _last_seq(db, conversation_id):
+    async with db.session() as session:
+        return await session.scalar(
+            text("SELECT last_seq FROM conversation WHERE conversation_id = :c"), {"c": conversation_id}
+        )
+
+
+def test_allocate_sequence_is_monotonic_and_reserves_blocks(app_db):
+    async def scenario():
+        await _seed(app_db)
+        allocated = []
+        for count in (1, 1, 5, 1):
+            async def allocate(session, count=count):
+                return await app_db.allocate_sequence(session, 1, count)
+            allocated.append(await app_db.run_transaction(allocate))
+        return allocated, await _last_seq(app_db, 1)
+
+    allocated, last_seq = asyncio.run(scenario())
+    assert allocated == [4, 5, 6, 11]
+    assert last_seq == 11
+
+
+def test_sync_returns_changes_past_the_watermark_only(app_db):
+    async def scenario():
+        await _seed(app_db)
+        return await _sync({"1": 1, "2": 1})
+
+    status, body = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE
+    [conversation] = body[Constants.CONVERSATIONS_STRING_LOWER]
+    assert conversation[Constants.CONVERSATION_ID] == 1
+    assert conversation[Constants.SEQ] == 3
+    assert [m[Constants.SEQ] for m in conversation[Constants.MESSAGES_STRING_LOWER]] == [2, 3]
+    assert [c[Constants.MESSAGE_ID] for c in conversation[Constants.STATUS_CHANGES]] == [102, 103]
+    assert body[Constants.NEW_CONVERSATIONS] == []
+
+
+def test_unlisted_conversations_come_back_as_new(app_db):
+    async def scenario():
+        await _seed(app_db)
+        return await _sync({"1": 3})
+
+    status, body = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE
+    assert body[Constants.CONVERSATIONS_STRING_LOWER] == []
+    assert body[Constants.NEW_CONVERSATIONS] == [{Constants.CONVERSATION_ID: 2, Constants.SEQ: 1}]
+
+
+@pytest.mark.parametrize("watermarks", [
+    {"1": "abc"},
+    {"one": 1},
+    {"1": 1.5},
+    {"1": -1},
+    {"1": True},
+    [1, 2],
+])
+def test_malformed_watermarks_are_a_bad_request(app_db, watermarks):
+    status, body = asyncio.run(_sync(watermarks))
+    assert status == Constants.BAD_REQUEST
+    assert body[Constants.STATUS_CODE_KEY] == Constants.BAD_REQUEST
+
+
+def test_reads_bump_the_reader_counter_not_the_conversation_sequence(app_db):
+    from src.commons.fetch_response import mark_messages_read
+
+    async def scenario():
+        await _seed(app_db)
+        response = await mark_messages_read(JSONRequest({
+            Constants.JWT_PARAM_EMAIL: REQUESTER, Constants.MESSAGE_CONVERSATION_ID: 1,
+        }))
+        async with app_db.session() as session:
+            versions = dict((await session.execute(text(
+                "SELECT uid, receipt_version FROM conversation_participants WHERE conversation_id = 1"
+            ))).all())
+            statuses = (await session.execute(text(
+                "SELECT DISTINCT status, updated_seq FROM receipts WHERE message_id = 101"
+            ))).all()
+        return response.status_code, await _last_seq(app_db, 1), versions, statuses
+
+    status, last_seq, versions, statuses = asyncio.run(scenario())
+    assert status == Constants.SUCCESS_CODE
+    assert last_seq == 3
+    assert versions == {1: 1, 2: 0}
+    assert statuses == [(Constants.READ, 1)]
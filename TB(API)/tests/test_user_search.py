@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import text
+
+from src.utils.user_search import UserSearchIndex
+
+
+async def _execute(db, statement, **params):
+    async with db.session() as session:
+        await session.execute(text(statement), params)
+        await session.commit()
+
+
+def _emails(index, query):
+    index.fuzzy = False
+    return [user["email"] for user in index.search(query, 10)]
+
+
+def test_catch_up_indexes_changes_made_on_other_workers(app_db):
+    async def scenario():
+        await _execute(app_db, "UPDATE user SET updated_at = :at", at=datetime(2026, 1, 1))
+        index = UserSearchIndex()
+        index._bus = None
+        await index.build()
+        assert _emails(index, "first1") == ["user1@example.com"]
+
+        # Another worker renames user1 and signs up user8.
+        await _execute(
+            app_db,
+            "UPDATE user SET first_name = 'Renamed', updated_at = :at WHERE uid = 1",
+            at=datetime(2026, 1, 2),
+        )
+        await _execute(
+            app_db,
+            "INSERT INTO user (email, first_name, last_name, updated_at) VALUES ('user8@example.com', 'Newcomer', 'Eight', :at)",
+            at=datetime(2026, 1, 2),
+        )
+        await index._catch_up()
+        return index
+
+    index = asyncio.run(scenario())
+    assert _emails(index, "renamed") == ["user1@example.com"]
+    assert _emails(index, "newcomer") == ["user8@example.com"]
+    assert "user1@example.com" not in _emails(index, "first1")
+
+
+def test_invalidation_reloads_the_published_users(app_db):
+    published = []
+
+    class Bus:
+        def register(self, listener):
+            pass
+
+        async def publish(self, namespace, items):
+            published.append((namespace, items))
+
+    async def scenario():
+        writer, reader = UserSearchIndex(), UserSearchIndex()
+        writer._bus, reader._bus = Bus(), None
+        await writer.build()
+        await reader.build()
+
+        await _execute(app_db, "UPDATE user SET last_name = 'Moved' WHERE uid = 2")
+        await writer.changed("USER2@example.com", "First2", "Moved")
+        # The channel delivers the writer's message to the reader.
+        for namespace, emails in published:
+            assert namespace == reader.namespace
+            reader.evict(emails)
+        await asyncio.gather(*reader._reloads)
+        return writer, reader
+
+    writer, reader = asyncio.run(scenario())
+    assert published == [(writer.namespace, ["user2@example.com"])]
+    assert _emails(writer, "moved") == _emails(reader, "moved") == ["user2@example.com"]
@@ -0,0 +1,59 @@
+import asyncio
+
+from src.utils.web_socket_utils import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self, fail=False):
+        self.frames = []
+        self.fail = fail
+
+    async def send_json(self, payload):
+        if self.fail:
+            raise ConnectionError("socket gone")
+        self.frames.append(payload)
+
+
+def _manager(window_ms=20) -> ConnectionManager:
+    manager = ConnectionManager()
+    manager.coalesce_window = window_ms / 1000
+    return manager
+
+
+def test_events_within_the_window_go_out_as_one_frame():
+    async def scenario():
+        manager = _manager()
+        alice, bob = FakeSocket(), FakeSocket()
+        await manager.connect(1, "alice@example.com", alice)
+        await manager.connect(1, "bob@example.com", bob)
+        results = await asyncio.gather(*(manager.broadcast(1, {"n": n}) for n in range(3)))
+        return results, alice, bob
+
+    results, alice, bob = asyncio.run(scenario())
+    # Every caller is released, and counts both recipients as reached.
+    assert all(sorted(delivered) == ["alice@example.com", "bob@example.com"] for delivered in results)
+    assert alice.frames == bob.frames == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+
+
+def test_lone_event_keeps_the_object_shape_and_no_window_sends_at_once():
+    async def scenario():
+        coalesced, direct = _manager(), _manager(0)
+        first, second = FakeSocket(), FakeSocket()
+        await coalesced.connect(1, "alice@example.com", first)
+        await direct.connect(1, "alice@example.com", second)
+        await coalesced.send_personal(1, "alice@example.com", {"n": 0})
+        await asyncio.gather(*(direct.broadcast(1, {"n": n}) for n in range(2)))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.frames == [{"n": 0}]
+    assert second.frames == [{"n": 0}, {"n": 1}]
+
+
+def test_failed_frame_fails_every_coalesced_caller():
+    async def scenario():
+        manager = _manager()
+        await manager.connect(1, "alice@example.com", FakeSocket(fail=True))
+        return await asyncio.gather(*(manager.broadcast(1, {"n": n}) for n in range(3)))
+
+    assert asyncio.run(scenario()) == [[], [], []]